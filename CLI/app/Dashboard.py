@@ -6,7 +6,7 @@ import sys
 sys.path.insert(0,os.path.abspath(os.path.join(os.path.dirname(__file__),'..', '..')))
 
 # Initialize the session states
-from CLI.app.streamlit_setup import init_st, sync_data, BACKEND_URL, USE_LOCAL_BACKEND
+from CLI.app.streamlit_setup import init_st, sync_data, export_bytes, BACKEND_URL, USE_LOCAL_BACKEND
 import requests as _requests
 
 init_st()
@@ -24,6 +24,14 @@ def _backend_post(endpoint: str, payload: dict, token: str = None):
     except (_requests.exceptions.ConnectionError, _requests.exceptions.Timeout):
         return None
 
+# Label of an expense in the delete list; rows from old files or CSV imports may lack fields or hold a price as text
+def _expense_label(expense: dict) -> str:
+    try:
+        price = f"{float(expense.get('price')):.2f}"
+    except (TypeError, ValueError):
+        price = str(expense.get('price', '?'))
+    return f"#{expense.get('id')}  {expense.get('date', '')}  {expense.get('tags', '')}  {price} {str(expense.get('currency', '')).upper()}"
+
 st.title('Web-based Expense and Income Tracking')
 
 tab_dashboard, tab_add, tab_delete, tab_edit, tab_view_expenses, tab_view_income, tab_view_subscriptions, tab_net_worth = st.tabs([
@@ -32,27 +40,24 @@ tab_dashboard, tab_add, tab_delete, tab_edit, tab_view_expenses, tab_view_income
 
 # ── Dashboard ────────────────────────────────────────────────────────────────
 with tab_dashboard:
+    # Month and category totals come from the rollup the storage keeps on every write,
+    # so they cost months x categories cells rather than a pass over the records
+    expense_rollup = st.session_state.tracker.rollup('expenses')
     if st.session_state.expenses:
-        filtered_expenses = [e for e in st.session_state.expenses if e['date'][:7] == st.session_state.current_month]
-        monthly_expenses = sum(e['price'] for e in filtered_expenses)
+        monthly_expenses = expense_rollup.total(month=st.session_state.current_month)
         st.metric('Monthly Expenses', f"{monthly_expenses:.2f} USD")
     else:
         st.write("No expenses found.")
 
     if st.session_state.income:
-        filtered_income = [i for i in st.session_state.income if i['date'][:7] == st.session_state.current_month]
-        monthly_income = sum(i['amount'] for i in filtered_income)
+        monthly_income = st.session_state.tracker.rollup('income').total(month=st.session_state.current_month)
         st.metric('Monthly Income', f"{monthly_income:.2f} USD")
     else:
         st.write("No income found.")
 
     if st.session_state.budget:
         st.subheader('Budget Status')
-        budget_totals = {}
-        for expense in st.session_state.expenses:
-            if expense['date'][:7] == st.session_state.current_month:
-                tag = expense['tags']
-                budget_totals[tag] = budget_totals.get(tag, 0) + expense['price']
+        budget_totals = expense_rollup.by_category(month=st.session_state.current_month)
         for budget in st.session_state.budget:
             total_spent = budget_totals.get(budget['category'], 0)
             limit = float(budget['amount'])
@@ -116,7 +121,7 @@ with tab_dashboard:
     try:
         if USE_LOCAL_BACKEND:
             from backend.analytics import forecast_spending
-            _fc = forecast_spending(st.session_state.expenses)
+            _fc = forecast_spending(st.session_state.expenses, convert_fn=st.session_state.tracker.convert_currency)
         else:
             _resp = _backend_post('/forecast', {'expenses': st.session_state.expenses, 'base_currency': 'USD'})
             _fc = (_resp.json() if _resp.ok else {'success': False, 'forecasts': {}}) if _resp is not None else {'success': False, 'forecasts': {}}
@@ -407,13 +412,23 @@ with tab_delete:
 
     if choice == 'Expenses':
         with st.form('delete_expenses_form'):
-            expense_id = st.number_input('Expense ID', min_value=1, step=1, key='del_exp_id')
-            if st.form_submit_button('Delete Expense'):
-                results = st.session_state.tracker.delete_expenses(expense_id)
+            _exp_labels = {e['id']: _expense_label(e) for e in st.session_state.expenses if isinstance(e, dict) and 'id' in e}
+            st.session_state.selected_for_deletion = st.multiselect('Expenses to delete', options=list(_exp_labels), format_func=_exp_labels.get, key='del_exp_ids')
+            # For an expense that isn't in the list above, e.g. one added by someone else since it was loaded
+            expense_id = st.number_input('Or Expense ID (0 for none)', min_value=0, step=1, key='del_exp_id')
+            if st.form_submit_button('Delete Expenses'):
+                to_delete = list(st.session_state.selected_for_deletion)
+                if expense_id and expense_id not in to_delete:
+                    to_delete.append(int(expense_id))
+                # All selected expenses go in one write
+                results = st.session_state.tracker.delete_many('expenses', to_delete)
                 if results['success']:
                     st.success(results['message'])
+                    st.session_state.selected_for_deletion = []
                     sync_data()
                     st.rerun()
+                elif not to_delete:
+                    st.error('Select at least one expense to delete')
                 else:
                     st.error(results['message'])
 
@@ -568,18 +583,27 @@ with tab_view_expenses:
                 preview = _pd.read_csv(uploaded_csv)
                 st.dataframe(preview.head(3))
                 uploaded_csv.seek(0)
-                st.session_state.tracker.import_from_csv('expenses', uploaded_csv)
+                import_result = st.session_state.tracker.import_from_csv('expenses', uploaded_csv)
                 sync_data()
-                st.success(f'Imported {len(preview)} rows successfully.')
+                if import_result['success']:
+                    st.success(import_result['message'])
+                else:
+                    st.error(import_result['message'])
                 st.rerun()
             except Exception as _e:
                 st.error(f'Import failed: {_e}')
-    result = st.session_state.tracker.export_to_csv('expenses', 'expenses.csv')
-    if result['success']:
-        st.download_button(label='Export expenses to .csv', data=result['data'].to_csv(index=False).encode('utf-8'), file_name='expenses.csv', mime='text/csv', key='exp_download')
-    pdf_result = st.session_state.tracker.export_to_pdf('expenses', 'expenses.pdf')
-    if pdf_result['success']:
-        st.download_button(label='Export expenses to .pdf', data=pdf_result['data'], file_name='expenses.pdf', mime='application/pdf', key='exp_pdf_download')
+    exp_csv = export_bytes('expenses', 'csv')
+    if exp_csv:
+        st.download_button(label='Export expenses to .csv', data=exp_csv, file_name='expenses.csv', mime='text/csv', key='exp_download')
+    exp_pdf = export_bytes('expenses', 'pdf')
+    if exp_pdf:
+        st.download_button(label='Export expenses to .pdf', data=exp_pdf, file_name='expenses.pdf', mime='application/pdf', key='exp_pdf_download')
+    exp_xlsx = export_bytes('expenses', 'xlsx')
+    if exp_xlsx:
+        st.download_button(label='Export expenses to .xlsx', data=exp_xlsx, file_name='expenses.xlsx', mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', key='exp_xlsx_download')
+    exp_parquet = export_bytes('expenses', 'parquet')
+    if exp_parquet:
+        st.download_button(label='Export expenses to .parquet', data=exp_parquet, file_name='expenses.parquet', mime='application/vnd.apache.parquet', key='exp_parquet_download')
 
 # ── View Income ──────────────────────────────────────────────────────────────
 with tab_view_income:
@@ -615,18 +639,27 @@ with tab_view_income:
                 preview = _pd.read_csv(uploaded_csv)
                 st.dataframe(preview.head(3))
                 uploaded_csv.seek(0)
-                st.session_state.tracker.import_from_csv('income', uploaded_csv)
+                import_result = st.session_state.tracker.import_from_csv('income', uploaded_csv)
                 sync_data()
-                st.success(f'Imported {len(preview)} rows successfully.')
+                if import_result['success']:
+                    st.success(import_result['message'])
+                else:
+                    st.error(import_result['message'])
                 st.rerun()
             except Exception as _e:
                 st.error(f'Import failed: {_e}')
-    result = st.session_state.tracker.export_to_csv('income', 'income.csv')
-    if result['success']:
-        st.download_button(label='Export income to .csv', data=result['data'].to_csv(index=False).encode('utf-8'), file_name='income.csv', mime='text/csv', key='inc_download')
-    pdf_result = st.session_state.tracker.export_to_pdf('income', 'income.pdf')
-    if pdf_result['success']:
-        st.download_button(label='Export income to .pdf', data=pdf_result['data'], file_name='income.pdf', mime='application/pdf', key='inc_pdf_download')
+    inc_csv = export_bytes('income', 'csv')
+    if inc_csv:
+        st.download_button(label='Export income to .csv', data=inc_csv, file_name='income.csv', mime='text/csv', key='inc_download')
+    inc_pdf = export_bytes('income', 'pdf')
+    if inc_pdf:
+        st.download_button(label='Export income to .pdf', data=inc_pdf, file_name='income.pdf', mime='application/pdf', key='inc_pdf_download')
+    inc_xlsx = export_bytes('income', 'xlsx')
+    if inc_xlsx:
+        st.download_button(label='Export income to .xlsx', data=inc_xlsx, file_name='income.xlsx', mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', key='inc_xlsx_download')
+    inc_parquet = export_bytes('income', 'parquet')
+    if inc_parquet:
+        st.download_button(label='Export income to .parquet', data=inc_parquet, file_name='income.parquet', mime='application/vnd.apache.parquet', key='inc_parquet_download')
 
 # ── View Subscriptions ───────────────────────────────────────────────────────
 with tab_view_subscriptions:
@@ -657,15 +690,24 @@ with tab_view_subscriptions:
                 preview = _pd.read_csv(uploaded_csv)
                 st.dataframe(preview.head(3))
                 uploaded_csv.seek(0)
-                st.session_state.tracker.import_from_csv('subscriptions', uploaded_csv)
+                import_result = st.session_state.tracker.import_from_csv('subscriptions', uploaded_csv)
                 sync_data()
-                st.success(f'Imported {len(preview)} rows successfully.')
+                if import_result['success']:
+                    st.success(import_result['message'])
+                else:
+                    st.error(import_result['message'])
                 st.rerun()
             except Exception as _e:
                 st.error(f'Import failed: {_e}')
-    result = st.session_state.tracker.export_to_csv('subscriptions', 'subscriptions.csv')
-    if result['success']:
-        st.download_button(label='Export subscriptions to .csv', data=result['data'].to_csv(index=False).encode('utf-8'), file_name='subscriptions.csv', mime='text/csv', key='sub_download')
+    sub_csv = export_bytes('subscriptions', 'csv')
+    if sub_csv:
+        st.download_button(label='Export subscriptions to .csv', data=sub_csv, file_name='subscriptions.csv', mime='text/csv', key='sub_download')
+    sub_xlsx = export_bytes('subscriptions', 'xlsx')
+    if sub_xlsx:
+        st.download_button(label='Export subscriptions to .xlsx', data=sub_xlsx, file_name='subscriptions.xlsx', mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', key='sub_xlsx_download')
+    sub_parquet = export_bytes('subscriptions', 'parquet')
+    if sub_parquet:
+        st.download_button(label='Export subscriptions to .parquet', data=sub_parquet, file_name='subscriptions.parquet', mime='application/vnd.apache.parquet', key='sub_parquet_download')
 
 # ── Assets & Liabilities (Max only) ──────────────────────────────────────────
 with tab_net_worth:
@@ -7,6 +7,8 @@ from rich.table import Table
 import plotext as plt
 # For the date inputs
 from datetime import datetime
+# For the export file's extension
+import os
 
 # Import data from the core python file
 from CLI.core.core_stuff import ExpenseTracker,check_for_updates,validate_update,start_update
@@ -627,23 +629,17 @@ class Run:
                     ],
                     pointer='>',
                 ).ask()
-                results = tracker.open_file()
-                if not results['success']:
-                    console.print(f"[bold red]{results['message']}[/bold red].")
-                    continue
-                data = results['data']
+                # A .parquet or .xlsx name picks that format; anything else is written as CSV
+                extension = os.path.splitext(filename)[1].lower()
+                export = {'.parquet': tracker.export_to_parquet, '.xlsx': tracker.export_to_xlsx}.get(extension, tracker.export_to_csv)
                 if choice == 'Expenses':
-                    result = tracker.export_to_csv('expenses',filename)
+                    result = export('expenses',filename)
                 elif choice == 'Income':
-                    result = tracker.export_to_csv('income',filename)
+                    result = export('income',filename)
                 color = 'green' if result['success'] else 'red'
                 console.print(f"[bold {color}]{result['message']}[/bold {color}].")
             # Get the function to graph the expense data in the CLI
             elif choice == 'Show data on graphs and charts':
-                result = tracker.open_file()
-                if not result['success']:
-                    console.print(f"[bold red]{result['message']}[/bold red].")
-                data = result['data']
                 choice = questionary.select(
                     "What should be graphed?",
                     instructions="Use arrow keys to navigate.",
@@ -656,16 +652,19 @@ class Run:
                     ],
                     pointer='>',
                 ).ask()
+                # The chart is rendered headless and saved as <list>_chart.png
                 if choice == 'Expenses':
-                    tracker.create_graphs('expenses','pie')
+                    result = tracker.create_graphs('expenses','pie',filename='expenses_chart.png')
                 elif choice == 'Income':
-                    tracker.create_graphs('income','pie')
+                    result = tracker.create_graphs('income','pie',filename='income_chart.png')
                 elif choice == 'Budget':
-                    tracker.create_graphs('budget','pie')
+                    result = tracker.create_graphs('budget','pie',filename='budget_chart.png')
                 elif choice == 'Subscriptions':
-                    tracker.create_graphs('subscriptions','pie')
+                    result = tracker.create_graphs('subscriptions','pie',filename='subscriptions_chart.png')
                 elif choice == 'Goals':
-                    tracker.create_graphs('goals','bar')
+                    result = tracker.create_graphs('goals','barh',filename='goals_chart.png')
+                color = 'green' if result['success'] else 'red'
+                console.print(f"[bold {color}]{result['message']}[/bold {color}].")
             # Get the function to remove duplicate entries
             elif choice == 'Delete duplicates':
                 list_choice = questionary.select(
@@ -678,7 +677,10 @@ class Run:
                     ],
                     pointer='>',
                 ).ask()
-                result = tracker.check_for_duplicates(list_choice.lower())
+                # Show what would be removed before deleting anything
+                result = tracker.check_for_duplicates(list_choice.lower(),dryRun=True)
+                if result['success'] and questionary.confirm(f"{result['message']}. Remove them?").ask():
+                    result = tracker.check_for_duplicates(list_choice.lower())
                 color = 'green' if result['success'] else 'red'
                 console.print(f"[bold {color}]{result['message']}[/bold {color}].")
             # Get the function to convert expenses to a different currency
@@ -1,4 +1,3 @@
-import json
 import os
 import sys
 
@@ -7,7 +6,7 @@ import streamlit as st
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 from CLI.app.streamlit_setup import init_st, sync_data
-from CLI.core.core_stuff import ExpenseTracker
+from CLI.core.core_stuff import ExpenseTracker, load_config, save_config
 
 init_st()
 
@@ -33,17 +32,11 @@ _CONFIG_PATH = os.path.abspath(
 
 
 def _load_cfg() -> dict:
-    try:
-        if os.path.exists(_CONFIG_PATH):
-            return json.loads(open(_CONFIG_PATH).read())
-    except Exception:
-        pass
-    return {}
+    return load_config(_CONFIG_PATH)
 
 
 def _save_cfg(cfg: dict) -> None:
-    with open(_CONFIG_PATH, 'w') as fh:
-        json.dump(cfg, fh, indent=2)
+    save_config(_CONFIG_PATH, cfg)
 
 
 cfg = _load_cfg()
@@ -196,26 +189,27 @@ col_import, col_clear = st.columns([1, 5])
 with col_import:
     if st.button('Import Selected', type='primary', disabled=not selected_indices):
         tracker: ExpenseTracker = st.session_state.get('tracker') or ExpenseTracker()
-        imported = 0
         errors = []
+        to_import = []
+        import_rows = []
         for idx in selected_indices:
             row = edited.iloc[idx]
             try:
-                result = tracker.add_expenses(
-                    price=float(row['price']),
-                    purchased=str(row['purchased']),
-                    tags=str(row['tags']),
-                    currency=str(row['currency']).lower(),
-                    date=str(row['date']),
-                    notes=results[idx].get('notes', 'Imported from email'),
-                )
-                if result.get('success'):
-                    imported += 1
-                else:
-                    errors.append(f"Row {idx}: {result.get('message')}")
+                to_import.append({
+                    'price':     float(row['price']),
+                    'purchased': str(row['purchased']),
+                    'tags':      str(row['tags']),
+                    'currency':  str(row['currency']).lower(),
+                    'date':      str(row['date']),
+                    'notes':     results[idx].get('notes', 'Imported from email'),
+                })
+                import_rows.append(idx)
             except Exception as exc:
                 errors.append(f"Row {idx}: {exc}")
-
+        # One validation pass and one write for the whole import instead of one per receipt
+        bulk = tracker.add_expenses_many(to_import)
+        imported = sum(1 for item in bulk['data'] if item['success'])
+        errors.extend(f"Row {idx}: {item['message']}" for idx, item in zip(import_rows, bulk['data']) if not item['success'])
         if imported:
             st.success(f'Imported {imported} expense(s) successfully.', icon='✅')
             sync_data()
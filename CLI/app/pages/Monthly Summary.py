@@ -1,13 +1,14 @@
 # For the web ui setup
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
 # For proper importing stuff
 import os
 import sys
 sys.path.insert(0,os.path.abspath(os.path.join(os.path.dirname(__file__),'..','..','..')))
 # Initialize the session states
-from CLI.app.streamlit_setup import init_st, sync_data
+from CLI.app.streamlit_setup import init_st, sync_data, export_bytes
+# Charts are rendered headless and cached by content, so reruns don't redraw them
+from CLI.core import charts
 
 init_st()
 
@@ -17,13 +18,13 @@ st.title('Monthly Summary')
 current_month = st.session_state.current_month
 month_name = pd.to_datetime(current_month).strftime('%B %Y')
 
-# Filter expenses and income for the current month
-expenses = [expense for expense in st.session_state.expenses if expense['date'][:7] == current_month]
-income = [inc for inc in st.session_state.income if inc['date'][:7] == current_month]
+# Rollups of expenses and income kept by the storage; every total below reads their cells, not the records
+expense_rollup = st.session_state.tracker.rollup('expenses')
+income_rollup = st.session_state.tracker.rollup('income')
 
 # Calculate totals
-total_expenses = sum(expense['price'] for expense in expenses)
-total_income = sum(inc['amount'] for inc in income)
+total_expenses = expense_rollup.total(month=current_month)
+total_income = income_rollup.total(month=current_month)
 net_savings = total_income - total_expenses
 
 # Display metrics
@@ -38,10 +39,7 @@ with col3:
 st.divider()
 
 # Expense breakdown by category
-expense_by_category = {}
-for expense in expenses:
-    category = expense['tags']
-    expense_by_category[category] = expense_by_category.get(category, 0) + expense['price']
+expense_by_category = expense_rollup.by_category(month=current_month)
 
 if expense_by_category:
     st.subheader('Expenses by Category')
@@ -55,21 +53,15 @@ if expense_by_category:
     # Display table
     st.dataframe(df, hide_index=True)
 
-    # Create pie chart
-    fig, ax = plt.subplots()
-    ax.pie(df['Amount'], labels=df['Category'], autopct='%1.1f%%')
-    ax.set_title('Expense Distribution')
-    st.pyplot(fig)
+    # Create pie chart of the largest categories plus "Other"
+    st.image(charts.render('pie', {'Expenses': charts.top(expense_by_category)}, title='Expense Distribution'))
 else:
     st.write("No expenses recorded for this month.")
 
 st.divider()
 
 # Income breakdown by source
-income_by_source = {}
-for inc in income:
-    source = inc['source']
-    income_by_source[source] = income_by_source.get(source, 0) + inc['amount']
+income_by_source = income_rollup.by_category(month=current_month)
 
 if income_by_source:
     st.subheader('Income by Source')
@@ -83,18 +75,17 @@ if income_by_source:
     # Display table
     st.dataframe(df, hide_index=True)
 
-    # Create pie chart
-    fig, ax = plt.subplots()
-    ax.pie(df['Amount'], labels=df['Source'], autopct='%1.1f%%')
-    ax.set_title('Income Distribution')
-    st.pyplot(fig)
+    # Create pie chart of the largest sources plus "Other"
+    st.image(charts.render('pie', {'Income': charts.top(income_by_source)}, title='Income Distribution'))
 else:
     st.write("No income recorded for this month.")
 
 st.divider()
 
 # Monthly comparison (if previous months exist)
-all_months = sorted(list(set([expense['date'][:7] for expense in st.session_state.expenses] + [inc['date'][:7] for inc in st.session_state.income])), reverse=True)
+expenses_by_month = expense_rollup.by_month()
+income_by_month = income_rollup.by_month()
+all_months = sorted(set(expenses_by_month) | set(income_by_month), reverse=True)
 
 if len(all_months) > 1:
     st.subheader('Monthly Comparison')
@@ -102,8 +93,8 @@ if len(all_months) > 1:
     # Create a DataFrame for monthly data
     monthly_data = []
     for month in all_months:
-        month_expenses = sum(expense['price'] for expense in st.session_state.expenses if expense['date'][:7] == month)
-        month_income = sum(inc['amount'] for inc in st.session_state.income if inc['date'][:7] == month)
+        month_expenses = expenses_by_month.get(month, 0)
+        month_income = income_by_month.get(month, 0)
         monthly_data.append({
             'Month': pd.to_datetime(month).strftime('%B %Y'),
             'Expenses': month_expenses,
@@ -117,44 +108,33 @@ if len(all_months) > 1:
     st.dataframe(df, hide_index=True)
 
     # Create bar chart
-    fig, ax = plt.subplots()
-    df.plot(x='Month', y=['Expenses', 'Income'], kind='bar', ax=ax)
-    ax.set_title('Monthly Expenses vs Income')
-    ax.set_ylabel('Amount ($)')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    st.pyplot(fig)
+    by_month = df.set_index('Month')
+    st.image(charts.render('bar', {'Expenses': by_month['Expenses'].to_dict(), 'Income': by_month['Income'].to_dict()},
+                           title='Monthly Expenses vs Income', ylabel='Amount ($)'))
 
     # Create savings trend chart
-    fig, ax = plt.subplots()
-    df.plot(x='Month', y='Savings', kind='line', marker='o', ax=ax)
-    ax.set_title('Monthly Savings Trend')
-    ax.set_ylabel('Savings ($)')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    st.pyplot(fig)
+    st.image(charts.render('line', {'Savings': by_month['Savings'].to_dict()}, title='Monthly Savings Trend', ylabel='Savings ($)'))
 
 # Export options
 st.subheader('Export Data')
 col1, col2 = st.columns(2)
 with col1:
     if st.button('Export Expenses to CSV'):
-        result = st.session_state.tracker.export_to_csv('expenses', 'expenses.csv')
-        if result['success']:
+        data = export_bytes('expenses', 'csv')
+        if data is not None:
             st.download_button(
                 label="Download Expenses CSV",
-                data=result['data'].to_csv(index=False).encode('utf-8'),
+                data=data,
                 file_name="expenses.csv",
                 mime="text/csv"
             )
 with col2:
     if st.button('Export Summary to PDF'):
-        result = st.session_state.tracker.export_to_pdf('expenses', 'monthly_summary.pdf')
-        if result['success']:
-            with open('monthly_summary.pdf', 'rb') as f:
-                st.download_button(
-                    label="Download PDF Summary",
-                    data=f,
-                    file_name="monthly_summary.pdf",
-                    mime="application/pdf"
-                )
\ No newline at end of file
+        data = export_bytes('expenses', 'pdf')
+        if data is not None:
+            st.download_button(
+                label="Download PDF Summary",
+                data=data,
+                file_name="monthly_summary.pdf",
+                mime="application/pdf"
+            )
\ No newline at end of file
@@ -1,4 +1,3 @@
-import json
 import os
 import sys
 
@@ -6,6 +5,7 @@ import streamlit as st
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 from CLI.app.streamlit_setup import init_st
+from CLI.core.core_stuff import load_config, save_config
 
 init_st()
 
@@ -32,17 +32,11 @@ _CONFIG_PATH = os.path.abspath(_CONFIG_PATH)
 
 
 def _load_cfg() -> dict:
-    try:
-        if os.path.exists(_CONFIG_PATH):
-            return json.loads(open(_CONFIG_PATH).read())
-    except Exception:
-        pass
-    return {}
+    return load_config(_CONFIG_PATH)
 
 
 def _save_cfg(cfg: dict) -> None:
-    with open(_CONFIG_PATH, 'w') as fh:
-        json.dump(cfg, fh, indent=2)
+    save_config(_CONFIG_PATH, cfg)
 
 
 cfg = _load_cfg()
@@ -86,4 +86,10 @@ def sync_data():
     for key in key_to_reset:
         if key in st.session_state:
             del st.session_state[key]
-    init_st()
\ No newline at end of file
+    init_st()
+
+# Bytes of an exported list for a download button (fmt: csv, pdf, parquet or xlsx), or None when there is
+# nothing to export (or the format's package isn't installed). The tracker keeps them until the data on disk
+# changes, so reruns don't export again
+def export_bytes(listName, fmt):
+    return st.session_state.tracker.export_bytes(listName, fmt)
\ No newline at end of file
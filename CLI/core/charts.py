@@ -0,0 +1,140 @@
+# Chart rendering for create_graphs() and the Streamlit pages: headless matplotlib drawn from aggregated series, cached by content hash
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+# Slices / bars kept before the rest are folded into OTHER
+TOP_N = 8
+OTHER = 'Other'
+KINDS = ('pie', 'bar', 'barh', 'line')
+# Share of a pie below which a slice isn't labelled
+MIN_LABEL_SHARE = 0.03
+FORMATS = ('png', 'svg')
+
+# A chart's data: {series name: {label: value}}, drawn in the given order
+Series = Mapping[str, Mapping[Any, float]]
+
+
+# The n largest totals, largest first, plus the sum of the rest under OTHER
+def top(totals: Mapping[Any, float], n: int = TOP_N) -> Dict[str, float]:
+    ordered = sorted(totals.items(), key=lambda item: -item[1])
+    kept = {}
+    for label, value in ordered[:n]:
+        kept[str(label)] = round(kept.get(str(label), 0) + value, 2)
+    rest = sum(value for _, value in ordered[n:])
+    if rest:
+        kept[OTHER] = round(kept.get(OTHER, 0) + rest, 2)
+    return kept
+
+
+# Rendered charts by content hash, least recently used dropped first
+class ChartCache():
+    def __init__(self, max_entries: int = 64) -> None:
+        self.max_entries = max_entries
+        self._charts: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, draw: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            if key in self._charts:
+                self.hits += 1
+                self._charts.move_to_end(key)
+                return self._charts[key]
+            self.misses += 1
+        # Drawn outside the lock; two threads drawing the same chart at once both store the same bytes
+        image = draw()
+        with self._lock:
+            self._charts[key] = image
+            while len(self._charts) > self.max_entries:
+                self._charts.popitem(last=False)
+        return image
+
+    def clear(self) -> None:
+        with self._lock:
+            self._charts.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._charts), 'hits': self.hits, 'misses': self.misses}
+
+
+# Shared by every render() that isn't given its own cache
+CACHE = ChartCache()
+
+
+def _key(kind: str, series: List[Tuple[str, List[Tuple[str, float]]]], title: str, ylabel: Optional[str],
+         fmt: str, size: Tuple[float, float]) -> str:
+    content = json.dumps([kind, series, title, ylabel, fmt, list(size)], separators=(',', ':'))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _draw(kind: str, series: List[Tuple[str, List[Tuple[str, float]]]], title: str, ylabel: Optional[str],
+          fmt: str, size: Tuple[float, float]) -> bytes:
+    import numpy as np
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=size)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    # Every label of every series, in first-seen order
+    labels = list(dict.fromkeys(label for _, points in series for label, _ in points))
+    if kind == 'pie':
+        # A pie can only show positive shares
+        points = [(label, value) for label, value in series[0][1] if value > 0]
+        total = sum(value for _, value in points) or 1
+        # Slivers under MIN_LABEL_SHARE go unlabelled rather than piling their labels on top of each other
+        ax.pie([value for _, value in points],
+               labels=[label if value / total >= MIN_LABEL_SHARE else '' for label, value in points],
+               autopct=lambda percent: f'{percent:.1f}%' if percent >= MIN_LABEL_SHARE * 100 else '',
+               startangle=90, counterclock=False)
+        ax.axis('equal')
+    elif kind == 'barh':
+        name, points = series[0]
+        ax.barh([label for label, _ in points], [value for _, value in points])
+        ax.invert_yaxis()
+    else:
+        x = np.arange(len(labels))
+        width = 0.8 / len(series)
+        for i, (name, points) in enumerate(series):
+            values = dict(points)
+            heights = [values.get(label, 0) for label in labels]
+            if kind == 'line':
+                ax.plot(labels, heights, marker='o', label=name)
+            else:
+                ax.bar(x + (i - (len(series) - 1) / 2) * width, heights, width, label=name)
+        if kind == 'bar':
+            ax.set_xticks(x)
+            ax.set_xticklabels(labels)
+        ax.tick_params(axis='x', labelrotation=45)
+        if len(series) > 1:
+            ax.legend()
+    ax.set_title(title)
+    if ylabel and kind != 'pie':
+        ax.set_ylabel(ylabel)
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+# A chart as PNG / SVG bytes, drawn once per distinct content. kind is one of KINDS; a pie or barh uses the
+# first series only. Pass a mapping that is already aggregated (see top())
+def render(kind: str, series: Series, title: str = '', ylabel: Optional[str] = None, fmt: str = 'png',
+           size: Tuple[float, float] = (6.4, 4.8), cache: Optional[ChartCache] = None) -> bytes:
+    if kind not in KINDS:
+        raise ValueError(f'Unknown chart kind {kind!r}; expected one of {", ".join(KINDS)}')
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown chart format {fmt!r}; expected png or svg')
+    # Plain, ordered and JSON-safe, so equal numbers hash equal however they were passed
+    points = [(str(name), [(str(label), round(float(value), 2)) for label, value in values.items()])
+              for name, values in series.items()]
+    if not points or not any(values for _, values in points):
+        raise ValueError('Nothing to chart')
+    cache = CACHE if cache is None else cache
+    return cache.get(_key(kind, points, title, ylabel, fmt, size), lambda: _draw(kind, points, title, ylabel, fmt, size))
@@ -0,0 +1,104 @@
+# Cold-start check for the entry points: each one's imports run in a fresh interpreter under -X importtime, and
+# the median of a few runs is compared with its budget. It also fails when an entry point imports a heavy package
+# core_stuff only loads on demand. Entry points whose own packages aren't installed are skipped. From the root:
+#   python -m CLI.core.coldstart [runs]
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# Imported on demand only; none of them may show up at startup
+HEAVY = ('matplotlib', 'pandas', 'reportlab', 'requests')
+
+# name -> (statement run in the fresh interpreter, budget in ms of import time)
+# run.py prompts as soon as it is imported, so its import lines stand in for it
+ENTRY_POINTS: Dict[str, Tuple[str, float]] = {
+    'core': ('import CLI.core.core_stuff', 300),
+    'bot': ('import backend.phone_connect', 500),
+    'cli': ('import CLI.app.cli.cli_app', 800),
+    'run.py': ('import subprocess, rich.panel, rich.console, questionary, CLI.app.cli.cli_app', 900),
+}
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# (module, cumulative microseconds, depth) for every line of -X importtime output
+def _parse(stderr: str) -> List[Tuple[str, int, int]]:
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            # The header line
+            continue
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        imports.append((name.strip(), int(cumulative), depth))
+    return imports
+
+
+def _importtime(statement: str) -> Tuple[Optional[List[Tuple[str, int, int]]], str]:
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'
+    return _parse(result.stderr), ''
+
+
+# Top-level imports the interpreter makes before running anything (site, encodings, ...)
+def _startup() -> set:
+    imports, _ = _importtime('pass')
+    return {name for name, _, depth in imports or [] if depth == 0}
+
+
+# Median import time of one entry point, its slowest direct imports, and the heavy packages it loaded
+def measure(statement: str, runs: int = 5, startup: Optional[set] = None) -> Dict[str, object]:
+    startup = _startup() if startup is None else startup
+    totals = []
+    imports: List[Tuple[str, int, int]] = []
+    for _ in range(runs):
+        imports, error = _importtime(statement)
+        if imports is None:
+            return {'error': error}
+        totals.append(sum(cumulative for name, cumulative, depth in imports if depth == 0 and name not in startup))
+    # What the entry point itself imports, which is where a regression shows up. A module's
+    # imports are listed before it, so the children of each top-level import precede it
+    children: List[Tuple[int, str]] = []
+    top: List[Tuple[int, str]] = []
+    for name, cumulative, depth in imports:
+        if depth == 1:
+            children.append((cumulative, name))
+        elif depth == 0:
+            if name not in startup:
+                top.extend(children)
+            children = []
+    top.sort(reverse=True)
+    heavy = sorted({name.split('.')[0] for name, _, _ in imports if name.split('.')[0] in HEAVY})
+    return {'ms': statistics.median(totals) / 1000, 'slowest': [(name, cumulative / 1000) for cumulative, name in top[:3]],
+            'heavy': heavy}
+
+
+def check(runs: int = 5) -> bool:
+    startup = _startup()
+    ok = True
+    for name, (statement, budget) in ENTRY_POINTS.items():
+        result = measure(statement, runs, startup)
+        if 'error' in result:
+            # Missing third-party packages skip the entry point; anything else is a failure
+            skipped = 'ModuleNotFoundError' in result['error'] and 'CLI' not in result['error']
+            ok = ok and skipped
+            print(f"  {name:8} {'skipped' if skipped else 'FAILED'}: {result['error']}")
+            continue
+        over = result['ms'] > budget
+        ok = ok and not over and not result['heavy']
+        slowest = ', '.join(f'{module} {ms:.0f}' for module, ms in result['slowest'])
+        print(f"  {name:8} {result['ms']:7.1f} ms / {budget:.0f} ms {'OVER BUDGET' if over else 'ok':11} slowest: {slowest}")
+        if result['heavy']:
+            print(f"           imports {', '.join(result['heavy'])} at startup")
+    return ok
+
+
+if __name__ == '__main__':
+    print('Import time per entry point (median, ms)')
+    sys.exit(0 if check(int(sys.argv[1]) if len(sys.argv) > 1 else 5) else 1)
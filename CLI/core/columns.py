@@ -0,0 +1,121 @@
+# Columnar (NumPy) view of expenses or income for aggregations: amounts as int64 cents, dates as day ordinals,
+# months as year * 12 + month - 1, categories and currencies as int codes, so totals are one np.bincount
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from CLI.core.storage import CATEGORY_FIELDS, DATE_FIELDS
+
+# The money field of each list that has a columnar view
+AMOUNT_FIELDS = {'expenses': 'price', 'income': 'amount'}
+
+# Day / month value of a record whose date is missing or unreadable
+MISSING = -1
+
+
+def _cents(value: Any) -> int:
+    try:
+        return int(round(float(value) * 100))
+    except (TypeError, ValueError):
+        return 0
+
+
+# Sum of a stream of records in one pass, for callers that never hold the whole list
+def total_of(listName: str, records: Iterable[dict]) -> float:
+    amountField = AMOUNT_FIELDS[listName]
+    return sum(_cents(record.get(amountField)) for record in records) / 100
+
+
+# (day ordinal, month index) of an ISO date string
+def _day_and_month(value: Any) -> Tuple[int, int]:
+    try:
+        day = date.fromisoformat(value[:10])
+    except (TypeError, ValueError):
+        return MISSING, MISSING
+    return day.toordinal(), day.year * 12 + day.month - 1
+
+
+def month_index(month: str) -> int:
+    return int(month[:4]) * 12 + int(month[5:7]) - 1
+
+
+def month_label(index: int) -> str:
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+# Distinct values in first-seen order and each value's code
+def _intern(values: Iterable[Any]) -> Tuple[List[Any], np.ndarray]:
+    table: Dict[Any, int] = {}
+    codes = [table.setdefault(value, len(table)) for value in values]
+    return list(table), np.array(codes, dtype=np.int32)
+
+
+# One list as parallel arrays; rows are in stored order
+class Columns():
+    def __init__(self, listName: str, records: List[dict]) -> None:
+        amountField = AMOUNT_FIELDS[listName]
+        dateField = DATE_FIELDS[listName]
+        categoryField = CATEGORY_FIELDS[listName]
+        self.listName = listName
+        self.ids = np.array([record.get('id') or 0 for record in records], dtype=np.int64)
+        self.cents = np.array([_cents(record.get(amountField)) for record in records], dtype=np.int64)
+        dates = [_day_and_month(record.get(dateField)) for record in records]
+        self.days = np.array([day for day, _ in dates], dtype=np.int64)
+        self.months = np.array([month for _, month in dates], dtype=np.int64)
+        self.categories, self.category_codes = _intern(record.get(categoryField) for record in records)
+        self.currencies, self.currency_codes = _intern(str(record.get('currency') or '').lower() for record in records)
+
+    def __len__(self) -> int:
+        return len(self.cents)
+
+    # Rows in one month ('YYYY-MM') and/or currency; everything when neither is given
+    def mask(self, month: Optional[str] = None, currency: Optional[str] = None) -> np.ndarray:
+        keep = np.ones(len(self), dtype=bool)
+        if month is not None:
+            keep &= self.months == month_index(month)
+        if currency is not None:
+            code = self.currencies.index(currency.lower()) if currency.lower() in self.currencies else -1
+            keep &= self.currency_codes == code
+        return keep
+
+    def total(self, month: Optional[str] = None, currency: Optional[str] = None) -> float:
+        return int(self.cents[self.mask(month, currency)].sum()) / 100
+
+    # {'YYYY-MM': total} for every month with at least one row, oldest first
+    def by_month(self, currency: Optional[str] = None) -> Dict[str, float]:
+        keep = self.mask(currency=currency) & (self.months != MISSING)
+        months = self.months[keep]
+        if not len(months):
+            return {}
+        first = int(months.min())
+        counts = np.bincount(months - first)
+        sums = np.bincount(months - first, weights=self.cents[keep])
+        return {month_label(first + i): round(float(sums[i]) / 100, 2) for i in np.flatnonzero(counts)}
+
+    # {category: total} for the rows in a month / currency, largest first
+    def by_category(self, month: Optional[str] = None, currency: Optional[str] = None) -> Dict[Any, float]:
+        keep = self.mask(month, currency)
+        codes = self.category_codes[keep]
+        counts = np.bincount(codes, minlength=len(self.categories))
+        sums = np.bincount(codes, weights=self.cents[keep], minlength=len(self.categories))
+        order = sorted(np.flatnonzero(counts), key=lambda code: -sums[code])
+        return {self.categories[code]: round(float(sums[code]) / 100, 2) for code in order}
+
+
+# Day-by-day balance of income minus expenses: [{'date', 'change', 'balance'}], oldest first
+def running_balance(income: Columns, expenses: Columns, currency: Optional[str] = None) -> List[Dict[str, Any]]:
+    keepIncome = income.mask(currency=currency) & (income.days != MISSING)
+    keepExpenses = expenses.mask(currency=currency) & (expenses.days != MISSING)
+    days = np.concatenate([income.days[keepIncome], expenses.days[keepExpenses]])
+    cents = np.concatenate([income.cents[keepIncome], -expenses.cents[keepExpenses]])
+    if not len(days):
+        return []
+    order = np.argsort(days, kind='stable')
+    days, cents = days[order], cents[order]
+    # One slot per distinct day: where the sorted days change value
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(days)) + 1])
+    change = np.add.reduceat(cents, starts)
+    balance = np.cumsum(change)
+    return [{'date': date.fromordinal(int(day)).isoformat(), 'change': int(c) / 100, 'balance': int(b) / 100}
+            for day, c, b in zip(days[starts], change, balance)]
@@ -1,118 +1,226 @@
-# This is used to process lists, especially writing and reading files as seen in the open_file() and write_file() functions
-import json
-# This is for creating and using graphs effectively
-import matplotlib.pyplot as plt
-# This is to import and export .csv files easily
-import pandas as pd
-# This is used to export PDF documents nicely
-from reportlab.pdfgen import canvas
-# This is used to process the API url to get the rates in the convert_currency() function
-import requests
+# JSON encoding (orjson or msgspec when installed, json otherwise) for exports, imports and .bot_config.json
+from CLI.core import serializer
+# matplotlib, pandas, reportlab and requests are imported inside the methods that use them,
+# so the bots and the CLI don't pay for them at startup (python -m CLI.core.coldstart checks this)
 # Add more time safety
-from typing import Optional,List,Dict,Any
+from typing import Optional,List,Dict,Any,Callable,Iterator,Union
+# Storage backends (data.json or SQLite) behind open_file() / write_file()
+from CLI.core.storage import BatchStorage,LIST_NAMES,DATE_FIELDS,CATEGORY_FIELDS,SEQUENCE_KEY,data_stamp
+# Uses the ledger daemon (CLI.core.daemon) when one serves the file, the file directly otherwise
+from CLI.core.daemon import connect_storage
+# For the with tracker.batch(): block
+from contextlib import contextmanager
+# Predicates for tracker.query(): Eq, In, Range, Prefix combined with & | ~
+from CLI.core.query import Predicate,Query
+# Typed __slots__ records (Expense, Income, ...) and the field schema of each list
+from CLI.core.records import REQUIRED,RECORD_TYPES,Record,decode
+# Streamed CSV export writes rows as records arrive instead of building a DataFrame
+import csv
+# Cached exchange-rate tables (one request per base currency) for the currency conversions
+from CLI.core.rates import RateProvider,RateError,HistoricalRates
+import os
+# Chunked CSV import: rows read a chunk at a time, numbers and dates checked before they are stored
+import io
+import itertools
+# Exports for download buttons are written to a temporary folder and read back
+import tempfile
+import math
+from datetime import date as _date
+
+# The document without the storage's bookkeeping (the _rollups totals and _sequences id counters)
+def _public(data:Dict[str,Any]) -> Dict[str,Any]:
+    return {key:value for key,value in data.items() if not key.startswith('_')}
 
 class ExpenseTracker():
     # Initialize class variables
-    def __init__(self,filename:str='data.json') -> None:
+    def __init__(self,filename:str='data.json',storage:Optional[Any]=None) -> None:
         self.filename = filename
+        # Pick JSON or SQLite from the file extension unless a backend is passed in; a running daemon serves it instead
+        self.storage = storage if storage is not None else connect_storage(filename)
+        # Open batch() blocks, innermost last; each one works on top of the one before it
+        self._batches:List[BatchStorage] = []
+        # (listName, fmt) -> (data_stamp(), bytes) of the last export_bytes() of each list and format
+        self._exports:Dict[tuple,tuple] = {}
+        # Rate tables are cached next to the data file so every frontend shares them, as is the offline
+        # daily history that dated conversions read (python -m CLI.core.rates import / update fills it)
+        folder = os.path.dirname(os.path.abspath(filename))
+        self.rates = RateProvider(os.path.join(folder,'.rates_cache.json'),history=HistoricalRates(os.path.join(folder,'.fx_history.npz')))
         self.currency_symbols = {'usd':'$','eur':'€','gbp':'£','jpy':'¥','cny':'¥','inr':'₹','krw':'₩','thb':'฿','aud':'A$','cad':'C$','chf':'Fr','sgd':'S$','hkd':'HK$','nzd':'NZ$','sek':'kr','nok':'kr','dkk':'kr','rub':'₽','mxn':'Mex$','brl':'R$','zar':'R','czk':'Kč','pln':'zł','huf':'Ft','ron':'lei','bgn':'лв','try':'₺','myr':'RM','php':'₱','idr':'Rp','ils':'₪','isk':'kr','hrk':'kn',}
 
     # Read data file
     def open_file(self) -> Dict[str,Any]:
-        try:
-            # Read the file using open() function
-            with open(self.filename,'r') as file:
-                data = json.load(file)
-            # If not organized right then organize it right
-            if not isinstance(data,dict):
-                data = {'expenses':[],'income':[],'budget':[],'subscriptions':[],'goals':[],'recurring_expenses':[],'recurring_income':[],'assets':[],'liabilities':[]}
-            # If not data list then create it
-            else:
-                if 'expenses' not in data:
-                    data['expenses'] = []
-                if 'income' not in data:
-                    data['income'] = []
-                if 'budget' not in data:
-                    data['budget'] = []
-                if 'subscriptions' not in data:
-                    data['subscriptions'] = []
-                if 'goals' not in data:
-                    data['goals'] = []
-                if 'recurring_expenses' not in data:
-                    data['recurring_expenses'] = []
-                if 'recurring_income' not in data:
-                    data['recurring_income'] = []
-                if 'assets' not in data:
-                    data['assets'] = []
-                if 'liabilities' not in data:
-                    data['liabilities'] = []
-            return {'success':True,'data':data}
-        # If FileNotFound or JSONDecodeError then return empty list
-        except (FileNotFoundError, json.JSONDecodeError):
-            data = {'expenses':[],'income':[],'budget':[],'subscriptions':[],'goals':[],'recurring_expenses':[],'recurring_income':[],'assets':[],'liabilities':[]}
-            self.write_file(data)
-            return {'success':True,'data':data}
+        # The storage backend resets a missing or corrupt file to an empty document
+        return {'success':True,'data':_public(self.storage.load())}
     
     # Update data file
     def write_file(self,data:dict) -> None:
+        # open_file() leaves out the id counters; keep the stored ones so a deleted id is never handed out again
+        if SEQUENCE_KEY not in data:
+            data = {**data,SEQUENCE_KEY:{name:self.storage.next_id(name)-1 for name in LIST_NAMES}}
+        # Overwrite all data in the storage backend (which rebuilds the rollups from the lists)
+        self.storage.save(data)
+
+    # The whole document as JSON bytes, indented for a readable download
+    def export_json(self,indent:bool=True) -> bytes:
+        return serializer.dumps(_public(self.storage.load()),indent)
+
+    # Replace the whole document with an export; raises ValueError if it isn't a JSON object
+    def import_json(self,raw:bytes) -> None:
+        data = serializer.loads(raw)
+        if not isinstance(data,dict):
+            raise ValueError('Expected a JSON object with the lists at the top level')
+        # Rollups and id counters in the file (older exports have them) are rebuilt, not trusted
+        self.write_file(_public(data))
+
+    # Start a batch: every change until commit() runs against one in-memory document.
+    # Inside another batch it stacks on top of it, so it can be rolled back on its own
+    def begin(self) -> Dict[str,Any]:
+        self._batches.append(BatchStorage(self.storage))
+        self.storage = self._batches[-1]
+        return {'success':True,'message':'Batch started'}
+
+    # Write every change made since the last begin() at once; a nested batch writes into the outer one
+    def commit(self) -> Dict[str,Any]:
+        if not self._batches:
+            return {'success':False,'message':'No batch to commit'}
+        batch = self._batches.pop()
+        self.storage = batch.base
+        batch.commit()
+        if self._batches:
+            return {'success':True,'message':'Nested batch joined the outer batch'}
+        return {'success':True,'message':f'Committed {len(batch.ops)} changes'}
+
+    # Throw away every change made since the last begin(); an outer batch keeps its own changes
+    def rollback(self) -> Dict[str,Any]:
+        if not self._batches:
+            return {'success':False,'message':'No batch to roll back'}
+        self.storage = self._batches.pop().base
+        return {'success':True,'message':'Batch rolled back'}
+
+    # with tracker.batch(): ... — one read and one write for the whole block, nothing written if it raises
+    @contextmanager
+    def batch(self):
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    # Changes whenever the data on disk does, whoever wrote it (another tab, the bots, the CLI, the daemon)
+    def data_stamp(self) -> tuple:
+        return data_stamp(self.filename)
+
+    # Forget the cached document, e.g. after editing the data file by hand
+    def invalidate_cache(self) -> None:
+        self.storage.invalidate()
+
+    # How often open_file() and the view_* loaders were served from the cached document
+    def cache_stats(self) -> Dict[str,int]:
+        return self.storage.cache_stats()
+
+    # How often another process (bot, dashboard, CLI) held the data file lock and how long we waited for it
+    def lock_stats(self) -> Dict[str,float]:
+        return self.storage.lock_stats()
+
+    # Filtered, sorted, paged read of one list, e.g. where=Range('month','2024-03','2024-06') & Range('price',low=50)
+    def query(self,listName:str,where:Optional[Predicate]=None,sort:Optional[str]=None,descending:bool=False,limit:Optional[int]=None,offset:int=0) -> Dict[str,Any]:
+        return self.run_query(Query(listName,where,sort,descending,limit,offset))
+
+    # Run a Query built once and kept by the caller, so its plan is compiled only once
+    def run_query(self,query:Query) -> Dict[str,Any]:
+        if query.listName not in LIST_NAMES:
+            return {'success':False,'message':f'Unknown list: {query.listName}'}
+        try:
+            records = self.storage.query(query)
+        except KeyError as e:
+            return {'success':False,'message':f'Unknown field: {e}'}
+        return {'success':True,'message':f'{len(records)} {query.listName} found','data':records}
+
+    # One list as typed records (CLI.core.records): attributes, float amounts, lower-case currencies, checked once here
+    def typed_records(self,listName:str) -> Dict[str,Any]:
+        if listName not in RECORD_TYPES:
+            return {'success':False,'message':f'No record type for {listName}'}
         try:
-            # Overwrite all data to self.filename using open() function
-            with open(self.filename,'w') as file:
-                json.dump(data,file)
-        # If FileNotFound then create the data file
-        except FileNotFoundError:
-            with open(self.filename,'w') as file:
-                json.dump(data,file)
+            records = decode(listName,self.storage.iter_records(listName))
+        except (ValueError,TypeError) as e:
+            return {'success':False,'message':f'Bad {listName} record: {e}'}
+        return {'success':True,'message':f'{len(records)} {listName} loaded','data':records}
+
+    # Records of one list one at a time, for read-only passes that shouldn't load the whole file
+    def iter_records(self,listName:str) -> Any:
+        return self.storage.iter_records(listName)
+
+    # Columnar NumPy view of 'expenses' or 'income' (CLI.core.columns): .total(), .by_month(), .by_category()
+    # Pass month='YYYY-MM' when only that month is needed; the view may then hold just that month
+    def columns(self,listName:str,month:Optional[str]=None) -> Any:
+        return self.storage.columns(listName,month)
+
+    # Month x category totals of 'expenses' or 'income' (CLI.core.rollup): .total(), .by_month(), .by_category()
+    # The storage keeps it current on every add, edit, delete and import, so nothing here reads the records
+    def rollup(self,listName:str) -> Any:
+        from CLI.core.rollup import Rollup
+        return Rollup(listName,self.storage.rollup(listName))
+
+    # Day-by-day balance of all income minus all expenses, oldest first
+    def running_balance(self,currency:Optional[str]=None) -> Dict[str,Any]:
+        from CLI.core.columns import running_balance
+        return {'success':True,'data':running_balance(self.columns('income'),self.columns('expenses'),currency)}
 
     # Assign the id to the expense for better organization
-    def assign_id(self,data:List[dict]) -> int:
-        # If there aren't any previous items then assign '1'
-        if len(data) == 0:
-            return 1
-        # IF there are previous items then calculate the next id value
-        else:
-            max_id = max(item['id'] for item in data)
-            return max_id + 1
+    def assign_id(self,data:Union[str,List[dict]]) -> int:
+        # A list name: the list's stored sequence, so ids of deleted items are never reused
+        if isinstance(data,str):
+            return self.storage.next_id(data)
+        # A list of records, as before: one past the largest id in it
+        return max((item['id'] for item in data if isinstance(item,dict) and isinstance(item.get('id'),int)),default=0) + 1
         
-    # Create graphs
-    def create_graphs(self,listName:str,graph_type:str) -> Dict[str,Any]:
-        # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        processList = data[listName]
+    # The money field each list is charted by; labels come from CATEGORY_FIELDS
+    CHART_FIELDS = {'expenses':'price','income':'amount','budget':'amount','subscriptions':'price','goals':'amount'}
 
+    # Chart a list as PNG (or SVG) bytes: totals per category (tag, source, name ...) folded to the top entries plus
+    # "Other", or per month with group_by='month'. Rendered headless and cached by content (CLI.core.charts), so
+    # drawing the same numbers again costs nothing. With filename the image is also written there
+    def create_graphs(self,listName:str,graph_type:str,group_by:Optional[str]=None,top:Optional[int]=None,fmt:str='png',filename:Optional[str]=None) -> Dict[str,Any]:
+        from CLI.core import charts
+        from CLI.core.columns import AMOUNT_FIELDS
+        if listName not in self.CHART_FIELDS:
+            return {'success': False, 'message': f'Charts not supported for {listName}'}
+        if graph_type not in charts.KINDS:
+            return {'success': False, 'message': f'Unknown chart type {graph_type}'}
+        if group_by == 'month' and listName not in DATE_FIELDS:
+            return {'success': False, 'message': f'{listName} records have no date to chart by month'}
+        if listName in AMOUNT_FIELDS:
+            # One bincount over the columnar view
+            columns = self.columns(listName)
+            totals = columns.by_month() if group_by == 'month' else columns.by_category()
+        else:
+            totals = {}
+            amountField = self.CHART_FIELDS[listName]
+            for record in self.storage.iter_records(listName):
+                label = str(record.get(DATE_FIELDS.get(listName)) or '')[:7] if group_by == 'month' else record.get(CATEGORY_FIELDS[listName])
+                try:
+                    totals[label] = totals.get(label,0) + float(record.get(amountField) or 0)
+                except (TypeError,ValueError):
+                    continue
+            if group_by == 'month':
+                totals = {month: totals[month] for month in sorted(totals) if month}
         # If the list is empty, return an error
-        if not processList:
+        if not totals:
             return {'success': False, 'message': f'No {listName} found to create graph'}
+        # Months stay in order; categories are cut to the largest
+        series = totals if group_by == 'month' else charts.top(totals,top or charts.TOP_N)
+        by = 'month' if group_by == 'month' else CATEGORY_FIELDS[listName]
+        try:
+            image = charts.render(graph_type,{listName: series},title=f'{listName.capitalize()} by {by}',ylabel=self.CHART_FIELDS[listName],fmt=fmt)
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}
+        if filename:
+            with open(filename,'wb') as f:
+                f.write(image)
+        return {'success': True, 'message': f'Chart of {listName} by {by}' + (f' saved to {filename}' if filename else ''), 'data': image}
 
-        # Set up graph components
-        fig, ax = plt.subplots()
-
-        # If pie chart
-        if graph_type == 'pie':
-            if listName == 'expenses':
-                # Extract tags and prices for expenses
-                tags = [item['tags'] for item in processList]
-                prices = [item['price'] for item in processList]
-                ax.pie(prices, labels=tags, autopct='%1.1f%%')
-                ax.set_title(f'{listName} Pie Chart')
-            elif listName == 'income':
-                # Extract sources and amounts for income
-                sources = [item['source'] for item in processList]
-                amounts = [item['amount'] for item in processList]
-                ax.pie(amounts, labels=sources, autopct='%1.1f%%')
-                ax.set_title(f'{listName} Pie Chart')
-            elif listName == 'budget':
-                # Extract categories and amounts for budget
-                categories = [item['category'] for item in processList]
-                amounts = [item['amount'] for item in processList]
-                ax.pie(amounts, labels=categories, autopct='%1.1f%%')
-                ax.set_title(f'{listName} Pie Chart')
-            else:
-                return {'success': False, 'message': f'Pie chart not supported for {listName}'}
-
-            return {'success': True, 'data': fig}
-        
     # Get the currency symbol from self.currency_symbols
     def get_currency_symbols(self,currency:str) -> str:
         return self.currency_symbols.get(currency.lower(),currency.upper())
@@ -123,45 +231,31 @@ class ExpenseTracker():
         return f"{currency_symbol}{price}"
 
     # Backbone of converting currency function
-    def convert_currency(self,price:float,from_curr:str,to_curr:str) -> Dict[bool,Any]:
+    # With a date ('YYYY-MM-DD') the rate of that day comes from the offline history, without a request
+    def convert_currency(self,price:float,from_curr:str,to_curr:str,date:Optional[str]=None) -> Dict[bool,Any]:
         try:
-            # API url
-            url = f"https://api.frankfurter.app/latest?from={from_curr.upper()}&to={to_curr.upper()}"
-            response = requests.get(url,timeout=5)
-            # Get rate to return the improved price
-            rate = response.json()['rates'][to_curr.upper()]
-            return {'success':True,'rate':rate*price}
-        # If cannot connection to the API website the return None
-        except (requests.exceptions.ConnectTimeout, requests.exceptions.ConnectionError):
-            return {'success':False,'message':'Could not connect to the Conversion API'}
-        # If bad/wrong variables to be processed then return None
-        except KeyError:
-            return {'success':False,'message':'Bad variables'}
+            # The whole rate table of from_curr is fetched once and cached (CLI.core.rates)
+            return {'success':True,'rate':self.rates.convert(price,from_curr,to_curr,date)}
+        # If the API can't be reached (and nothing is cached) or a currency is unknown
+        except RateError as e:
+            return {'success':False,'message':str(e)}
 
     # View all expenses
     def view_total_expenses(self) -> Dict[str,Any]:
-        # Define and return list
-        result = self.open_file()
-        data = result['data']
-        if not data['expenses']:
-            return {'success':False,'message':'No expenses found.'}
-        expenseList = data['expenses']
+        # Streamed, so on a large data file the other lists are never parsed
+        expenseList = list(self.storage.iter_records('expenses'))
         # If expenseList is empty do not continue
         if not expenseList:
             return {'success':False,'message':'No expenses found.'}
         return {'success':True,'data':expenseList}
 
     # View filtered expenses
-    def view_filtered_expenses(self,price:Optional[float]=None,purchased:Optional[str]=None,tags:Optional[str]=None,currency:Optional[str]=None,date:Optional[str]=None) -> Dict[str,Any]:
-        # Define the list to be processed
-        result = self.open_file()
-        data = result['data']
-        expenseList = data['expenses']
-        # If expenseList is empty do not continue
-        if not expenseList:
+    def view_filtered_expenses(self,price:Optional[float]=None,purchased:Optional[str]=None,tags:Optional[str]=None,currency:Optional[str]=None,date:Optional[str]=None,month:Optional[str]=None) -> Dict[str,Any]:
+        # If there are no expenses do not continue
+        if self.storage.count('expenses') == 0:
             return {'success':False,'message':'No expenses found'}
-        # Loop through all expenses if the filter pertains to price
-        filteredExpenses = [expense for expense in expenseList if (price is None or expense['price'] == price) and (purchased is None or expense['purchased'].lower() == purchased.lower()) and (tags is None or expense['tags'].lower() == tags.lower()) and (currency is None or expense['currency'].lower() == currency.lower()) and (date is None or expense['date'] == date)]
+        # Intersect the storage's indexes for every filter that was given (month is 'YYYY-MM')
+        filteredExpenses = self.storage.select('expenses',{'price':price,'purchased':purchased,'tags':tags,'currency':currency,'date':date,'month':month})
         if filteredExpenses:
             return {'success':True,'data':filteredExpenses}
         else:
@@ -169,16 +263,9 @@ class ExpenseTracker():
 
     # Add new expenses
     def add_expenses(self,price:float,purchased:str,tags:str,currency:str,date:str,notes:str) -> Dict[str,Any]:        
-        # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        expenseList = data['expenses']
-        # If not expenses
-        if not expenseList:
-            expenseList = []
         # Varaibles in the list format
         expense = {
-            'id':self.assign_id(expenseList),
+            'id':self.storage.next_id('expenses'),
             'price':price,
             'purchased':purchased,
             'tags':tags,
@@ -186,54 +273,45 @@ class ExpenseTracker():
             'currency':currency.lower(),
             'notes':notes,
         }
-        expenseList.append(expense)
-        data['expenses'] = expenseList
-        self.write_file(data)
+        self.storage.insert('expenses',expense)
         return {'success':True,'message':'Expense properly added.'}
 
     # Edit an expense
     def edit_expenses(self,expense_id:int,price:Optional[float]=None,purchased:Optional[str]=None,tags:Optional[str]=None,date:Optional[str]=None,currency:Optional[str]=None,notes:Optional[str]=None)-> Dict[str,Any]:
         try:
-            # Define the list to process
-            result = self.open_file()
-            data = result['data']
-            expenseList = data['expenses']
-            # If the expenseList is empty do not continue
-            if not expenseList:
+            # If there are no expenses do not continue
+            if self.storage.count('expenses') == 0:
                 return {'success':False,'message':'No expenses to process.'}
-            # Set counter to count how many times the expense['id'] is found
-            count = 0
-            # Loop through all of the expenses in the list
-            for expense in expenseList:
-                if expense['id'] == expense_id:
-                    count += 1
-                    # Change the price if price != None
-                    if price is not None:
-                        expense['price'] = price
-                    # Change the item purchased if purchased != None
-                    if purchased is not None:
-                        expense['purchased'] = purchased
-                    # Change the category of the expense if tags != None
-                    if tags is not None:
-                        expense['tags'] = tags
-                    # Change the date of purchase if date != None
-                    if date is not None:
-                        expense['date'] = date
-                    # Change the currency and price if currency != None
-                    if currency is not None:
-                        from_curr = expense['currency']
-                        expense['currency'] = currency
-                        result = self.convert_currency(expense['price'],from_curr,expense['currency'])
-                        if not result['success']:
-                            return {'success':False,'message':result['message']}
-                        expense['price'] = result['rate']
-                    # Change the notes if notes != None
-                    if notes != None:
-                        expense['notes'] = notes
+            # Look the expense up by id and work on a copy until it is saved
+            expense = self.storage.get('expenses',expense_id)
             # If expense not found
-            if count < 1:
+            if expense is None:
                 return {'success':False,'message':'Expense not found'}
-            self.write_file(data)
+            expense = dict(expense)
+            # Change the price if price != None
+            if price is not None:
+                expense['price'] = price
+            # Change the item purchased if purchased != None
+            if purchased is not None:
+                expense['purchased'] = purchased
+            # Change the category of the expense if tags != None
+            if tags is not None:
+                expense['tags'] = tags
+            # Change the date of purchase if date != None
+            if date is not None:
+                expense['date'] = date
+            # Change the currency and price if currency != None
+            if currency is not None:
+                from_curr = expense['currency']
+                expense['currency'] = currency
+                result = self.convert_currency(expense['price'],from_curr,expense['currency'],expense['date'])
+                if not result['success']:
+                    return {'success':False,'message':result['message']}
+                expense['price'] = result['rate']
+            # Change the notes if notes != None
+            if notes != None:
+                expense['notes'] = notes
+            self.storage.update('expenses',expense)
             return {'success':True,'message':'Expense edited successfully'}
         except ValueError:
             return {'success':False,'message':'Invalid Expense ID'}
@@ -241,25 +319,12 @@ class ExpenseTracker():
     # Delete an expense
     def delete_expenses(self,expense_id:int) -> Dict[str,Any]:
         try:
-            # Define the list to process
-            result = self.open_file()
-            data = result['data']
-            expenseList = data['expenses']
-            # If expenseList is empty do not continue
-            if not expenseList:
+            # If there are no expenses do not continue
+            if self.storage.count('expenses') == 0:
                 return {'success':False,'message':'No expenses to process'}
-            deleteExpense = ''
-            # Loop through all of the expenses in the list
-            for expense in expenseList:
-                # If the expense id matches delete the expenses from the list
-                if expense['id'] == expense_id:
-                    deleteExpense = expense
-            # If deleteExpense == '' after the loop then return error
-            if deleteExpense == '':
+            # If nothing was deleted then return error
+            if not self.storage.delete('expenses',expense_id):
                 return {'success':False,'message':'Expense not found'}
-            expenseList.remove(deleteExpense)
-            data['expenses'] = expenseList
-            self.write_file(data)
             return {'success':True,'message':'Expense deleted successfully'}
         except ValueError:
             return {'success':False,'message':'Invalid ID format'}
@@ -267,21 +332,13 @@ class ExpenseTracker():
     # View all income
     def view_income(self) -> Dict[str,Any]:
         # Define the list to process
-        result = self.open_file()
-        if not result['success']:
-            return {'success':False,'message':result['message']}
-        data = result['data']
-        incomeList = data['income']
+        incomeList = self.storage.records('income')
         return {'success':True,'data':incomeList}
 
     # View filtered income
-    def view_filtered_income(self,amount:Optional[float]=None,source:Optional[str]=None,currency:Optional[str]=None,date:Optional[str]=None) -> Dict[str,Any]:
-        # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        incomeList = data['income']
-        # Loop through all expenses if the filter pertains to price
-        filteredIncome = [income for income in incomeList if (amount is None or income['amount'] == amount) and (source is None or income['source'].lower() == source.lower()) and (currency is None or income['currency'].lower() == currency.lower()) and (date is None or income['date'] == date)]
+    def view_filtered_income(self,amount:Optional[float]=None,source:Optional[str]=None,currency:Optional[str]=None,date:Optional[str]=None,month:Optional[str]=None) -> Dict[str,Any]:
+        # Intersect the storage's indexes for every filter that was given (month is 'YYYY-MM')
+        filteredIncome = self.storage.select('income',{'amount':amount,'source':source,'currency':currency,'date':date,'month':month})
         if filteredIncome:
             return {'success':True,'data':filteredIncome}
         else:
@@ -289,16 +346,9 @@ class ExpenseTracker():
         
     # Add income data
     def add_income(self,amount:float,source:str,date:str,currency:str='usd',notes:Optional[str]=None) -> Dict[str,Any]:
-        # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        incomeList = data['income']
-        # If not income
-        if not incomeList:
-            incomeList = []
         # Format for new income
         new_income = {
-            'id':self.assign_id(incomeList),
+            'id':self.storage.next_id('income'),
             'amount':amount,
             'source':source,
             'date':date,
@@ -306,42 +356,34 @@ class ExpenseTracker():
             'notes':notes,
         }
         # Add and write new income
-        incomeList.append(new_income)
-        data['income'] = incomeList
-        self.write_file(data)
+        self.storage.insert('income',new_income)
         return {'success':True,'message':'Income recorded successfully'}
 
     # Edit income data
     def edit_income(self,income_id:int,amount:Optional[float]=None,source:Optional[str]=None,date:Optional[str]=None,currency:Optional[str]=None,notes:Optional[str]=None)-> Dict[str,Any]:
         try:
-            # Define the list to process
-            result = self.open_file()
-            data = result['data']
-            incomeList = data['income']
-            if not incomeList:
+            if self.storage.count('income') == 0:
                 return {'success':False,'message':'No income to process.'}
-            count = 0
-            for income in incomeList:
-                if income['id'] == income_id:
-                    count += 1
-                    if amount is not None:
-                        income['amount'] = amount
-                    if source is not None:
-                        income['source'] = source
-                    if date is not None:
-                        income['date'] = date
-                    if currency is not None:
-                        from_curr = income['currency']
-                        income['currency'] = currency
-                        result = self.convert_currency(income['amount'],from_curr,income['currency'])
-                        if not result['success']:
-                            return {'success':False,'message':result['message']}
-                        income['amount'] = result['rate']
-                    if notes is not None:
-                        income['notes'] = notes
-            if count < 1:
+            income = self.storage.get('income',income_id)
+            if income is None:
                 return {'success':False,'message':'Income not found'}
-            self.write_file(data)
+            income = dict(income)
+            if amount is not None:
+                income['amount'] = amount
+            if source is not None:
+                income['source'] = source
+            if date is not None:
+                income['date'] = date
+            if currency is not None:
+                from_curr = income['currency']
+                income['currency'] = currency
+                result = self.convert_currency(income['amount'],from_curr,income['currency'],income['date'])
+                if not result['success']:
+                    return {'success':False,'message':result['message']}
+                income['amount'] = result['rate']
+            if notes is not None:
+                income['notes'] = notes
+            self.storage.update('income',income)
             return {'success':True,'message':'Income edited successfully'}
         except ValueError:
             return {'success':False,'message':'Invalid Income ID'}
@@ -349,90 +391,58 @@ class ExpenseTracker():
     # Delete income
     def delete_income(self,income_id:int) -> Dict[str,Any]:
         try:
-            # Define the list to process
-            result = self.open_file()
-            data = result['data']
-            incomeList = data['income']
-            # If incomeList is empty do not continue
-            if not incomeList:
+            # If there is no income do not continue
+            if self.storage.count('income') == 0:
                 return {'success':False,'message':'No income to process'}
-            deleteIncome = ''
-            # Loop through all of the income in the list
-            for income in incomeList:
-                # If the income id matches delete the income from the list
-                if income['id'] == income_id:
-                    deleteIncome = income
-            # If deleteIncome == '' after the loop then return error
-            if deleteIncome == '':
+            # If nothing was deleted then return error
+            if not self.storage.delete('income',income_id):
                 return {'success':False,'message':'Income not found'}
-            incomeList.remove(deleteIncome)
-            data['income'] = incomeList
-            self.write_file(data)
             return {'success':True,'message':'Income deleted successfully'}
         except ValueError:
             return {'success':False,'message':'Invalid ID format'}
 
     # Create a budget
     def create_budget(self,category:str,amount:float,currency:Optional[str]='usd') -> Dict[str,Any]:
-        # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        budgetList = data['budget']
-        # If not budget
-        if not budgetList:
-            budgetList = []
         # Create the new budget
         newBudget = {
-            'id': self.assign_id(budgetList),
+            'id': self.storage.next_id('budget'),
             'category':category,
             'amount':amount,
             'currency':currency,
         }
-        budgetList.append(newBudget)
         # Save the budget in the data file
-        data['budget'] = budgetList
-        self.write_file(data)
+        self.storage.insert('budget',newBudget)
         return {'success':True,'message':'Created budget category successfully'}
 
     # Update budget
     def update_budget(self,budgetCategory:str,category:Optional[str]=None,amount:Optional[float]=None,currency:Optional[str]=None) -> Dict[str,Any]:
-        # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        budgetList = data['budget']
         # Check to see if the budgetCategory is a created budget
-        count = 0
-        for budget in budgetList:
-            if budget['category'] == budgetCategory:
-                count += 1
-        if count < 1:
+        budgetList = [dict(budget) for budget in self.storage.records('budget') if budget['category'] == budgetCategory]
+        if len(budgetList) < 1:
             return {'success':False,'message':'Budget category not found'}
         # Use stuff to change the budget
         for budget in budgetList:
-            if budget['category'] == budgetCategory:
-                if category is not None:
-                    budget['category'] = category
-                if amount is not None:
-                    budget['amount'] = amount
-                if currency is not None:
-                    from_curr = budget['currency']
-                    budget['currency'] = currency
-                    result = self.convert_currency(budget['amount'],from_curr,budget['currency'])
-                    if not result['success']:
-                        return {'success':False,'message':result['message']}
-                    budget['amount'] = result['rate']
-        self.write_file(data)
+            if category is not None:
+                budget['category'] = category
+            if amount is not None:
+                budget['amount'] = amount
+            if currency is not None:
+                from_curr = budget['currency']
+                budget['currency'] = currency
+                result = self.convert_currency(budget['amount'],from_curr,budget['currency'])
+                if not result['success']:
+                    return {'success':False,'message':result['message']}
+                budget['amount'] = result['rate']
+        self.storage.update_many('budget',budgetList)
         return {'success':True,'message':'Edited the budget category successfully'}
 
     # Check the budget status
     def check_budget_status(self,budgetCategory:str) -> Dict[str,Any]:
         # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        budgetList = data['budget']
+        budgetList = self.storage.records('budget')
         if not budgetList:
             return {'success':False,'message':'No budget categories found'}
-        expenseList = data['expenses']
+        expenseList = self.storage.records('expenses')
         if not expenseList:
             return {'success':False,'message':'No expenses to process'}
         # Find expenses in the budget and store to a list
@@ -445,9 +455,7 @@ class ExpenseTracker():
     # View total budget
     def view_all_budget(self) -> Dict[str,Any]:
         # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        budgetList = data['budget']
+        budgetList = self.storage.records('budget')
         if not budgetList:
             return {'success':False,'message':'No budgets found'}
         return {'success':True,'data':budgetList}
@@ -456,9 +464,7 @@ class ExpenseTracker():
     def delete_budget(self,budget_category:str) -> Dict[str,Any]:
         try:
             # Define the list to process
-            result = self.open_file()
-            data = result['data']
-            budgetList = data['budget']
+            budgetList = self.storage.records('budget')
             # If budgetList is empty do not continue
             if not budgetList:
                 return {'success':False,'message':'No budgets to process'}
@@ -471,65 +477,50 @@ class ExpenseTracker():
             # If deleteBudget == '' after the loop then return error
             if deleteBudget == '':
                 return {'success':False,'message':'Budget not found'}
-            budgetList.remove(deleteBudget)
-            data['budget'] = budgetList
-            self.write_file(data)
+            self.storage.delete('budget',deleteBudget['id'])
             return {'success':True,'message':'Budget deleted successfully'}
         except ValueError:
             return {'success':False,'message':'Invalid category format'}
 
     # Add subscriptions
     def add_subscriptions(self,subscription_name:Optional[str],subscription_price:float,currency:str,start_date:Optional[str]=None) -> Dict[str,Any]:
-        # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        subscriptionList = data['subscriptions']
-        # If not subscriptions
-        if not subscriptionList:
-            subscriptionList = []
         # Add subscription
         subscription = {
-            'id': self.assign_id(subscriptionList),
+            'id': self.storage.next_id('subscriptions'),
             'name': subscription_name,
             'price': subscription_price,
             'currency': currency,
             'startDate': start_date,
         }
-        subscriptionList.append(subscription)
-        data['subscriptions'] = subscriptionList
-        self.write_file(data)
+        self.storage.insert('subscriptions',subscription)
         return {'success':True,'message':'Subscription successfully added'}
     
     # Edit subscriptions
     def edit_subscription(self,previous_name:Optional[str],price:Optional[float]=None,name:Optional[str]=None,currency:Optional[str]=None,start_date:Optional[str]=None)-> Dict[str,Any]:
         try:
             # Define the list to process
-            result = self.open_file()
-            data = result['data']
-            subscriptionList = data['subscriptions']
+            subscriptionList = self.storage.records('subscriptions')
             # If subscriptionList is empty
             if not subscriptionList:
                 return {'success':False,'message':'No subscriptions to process.'}
-            count = 0
-            for subscription in subscriptionList:
-                if subscription['name'] == previous_name:
-                    count += 1
-                    if price is not None:
-                        subscription['price'] = price
-                    if name is not None:
-                        subscription['name'] = name
-                    if currency is not None:
-                        from_curr = subscription['currency']
-                        subscription['currency'] = currency
-                        result = self.convert_currency(subscription['price'],from_curr,subscription['currency'])
-                        if not result['success']:
-                            return {'success':False,'message':result['message']}
-                        subscription['price'] = result['rate']
-                    if start_date is not None:
-                        subscription['startDate'] = start_date
-            if count < 1:
+            matches = [dict(subscription) for subscription in subscriptionList if subscription['name'] == previous_name]
+            if len(matches) < 1:
                 return {'success':False,'message':'Subscription not found'}
-            self.write_file(data)
+            for subscription in matches:
+                if price is not None:
+                    subscription['price'] = price
+                if name is not None:
+                    subscription['name'] = name
+                if currency is not None:
+                    from_curr = subscription['currency']
+                    subscription['currency'] = currency
+                    result = self.convert_currency(subscription['price'],from_curr,subscription['currency'])
+                    if not result['success']:
+                        return {'success':False,'message':result['message']}
+                    subscription['price'] = result['rate']
+                if start_date is not None:
+                    subscription['startDate'] = start_date
+            self.storage.update_many('subscriptions',matches)
             return {'success':True,'message':'Subscription edited successfully'}
         except ValueError:
             return {'success':False,'message':'Invalid Subscription'}
@@ -537,9 +528,7 @@ class ExpenseTracker():
     # View subscriptions
     def view_subscriptions(self) -> Dict[str,Any]:
         # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        subscriptionList = data['subscriptions']
+        subscriptionList = self.storage.records('subscriptions')
         # View all subscriptions
         if not subscriptionList:
             return {'success':False,'message':'No subscriptions found'}
@@ -548,9 +537,7 @@ class ExpenseTracker():
     # Search subscriptions
     def view_filtered_subscriptions(self,subscriptionName:Optional[str]=None,subscriptionPrice:Optional[float]=None,subscriptionCurrency:Optional[str]=None) -> Dict[str,Any]:
         # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        subscriptionList = data['subscriptions']
+        subscriptionList = self.storage.records('subscriptions')
         if not subscriptionList:
             return {'success':False,'message':'No subscriptions found'}
         filtered_subscriptions = [subscription for subscription in subscriptionList if (subscriptionName is None or subscriptionName == subscription['name']) and (subscriptionPrice is None or subscriptionPrice == subscription['price']) and (subscriptionCurrency is None or subscriptionCurrency.upper() == subscription['currency'].upper())]
@@ -563,9 +550,7 @@ class ExpenseTracker():
     def delete_subscription(self,subscription_name:str) -> Dict[str,Any]:
         try:
             # Define the list to process
-            result = self.open_file()
-            data = result['data']
-            subscriptionList = data['subscriptions']
+            subscriptionList = self.storage.records('subscriptions')
             # If subscriptionList is empty do not continue
             if not subscriptionList:
                 return {'success':False,'message':'No subscriptions to process'}
@@ -578,72 +563,54 @@ class ExpenseTracker():
             # If deleteSubscription == '' after the loop then return error
             if deleteSubscription == '':
                 return {'success':False,'message':'Subscription not found'}
-            subscriptionList.remove(deleteSubscription)
-            data['subscriptions'] = subscriptionList
-            self.write_file(data)
+            self.storage.delete('subscriptions',deleteSubscription['id'])
             return {'success':True,'message':'Subscription removed successfully'}
         except ValueError:
             return {'success':False,'message':'Invalid category format'}
     
     # Create a goal
     def create_goal(self,name:Optional[str],amount:Optional[float],startDate:Optional[str],monthContribution:Optional[float],currency:Optional[str]) -> Dict[bool,str]:
-        # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        goalList = data['goals']
-        # If not goals
-        if not goalList:
-            goalList = []
         # Add goal
         goal = {
-            'id':self.assign_id(goalList),
+            'id':self.storage.next_id('goals'),
             'name':name,
             'amount':amount,
             'startDate':startDate,
             'monthContribution':monthContribution,
             'currency':currency,
         }
-        goalList.append(goal)
-        data['goals'] = goalList
-        self.write_file(data)
+        self.storage.insert('goals',goal)
         return {'success':True,'message':'Successfully created the goal'}
     
     # Edit a goal
     def edit_goal(self,name:Optional[str],new_name:Optional[str]=None,amount:Optional[float]=None,startDate:Optional[str]=None,monthContribution:Optional[float]=None,currency:Optional[str]=None) -> Dict[bool,str]:
         # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        goalList = data['goals']
+        goalList = self.storage.records('goals')
         # If not goals
         if not goalList:
             return {'success':False,'message':'No goals to edit'}
         # Search for the goal
-        count = 0
-        for item in goalList:
-            if item['name'] == name:
-                if new_name is not None:
-                    item['name'] = new_name
-                if amount is not None:
-                    item['amount'] = amount
-                if startDate is not None:
-                    item['startDate'] = startDate
-                if monthContribution is not None:
-                    item['monthContribution'] = monthContribution
-                if currency is not None:
-                    item['currency'] = currency
-                count += 1
-        if count < 1:
+        matches = [dict(item) for item in goalList if item['name'] == name]
+        for item in matches:
+            if new_name is not None:
+                item['name'] = new_name
+            if amount is not None:
+                item['amount'] = amount
+            if startDate is not None:
+                item['startDate'] = startDate
+            if monthContribution is not None:
+                item['monthContribution'] = monthContribution
+            if currency is not None:
+                item['currency'] = currency
+        if len(matches) < 1:
             return {'success':False,'message':'No goal found'}
-        data['goals'] = goalList
-        self.write_file(data)
+        self.storage.update_many('goals',matches)
         return {'success':True,'message':'Successfully edited the goal'}
     
     # View all goals
     def view_all_goals(self) -> Dict[bool,str]:
         # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        goalList = data['goals']
+        goalList = self.storage.records('goals')
         # If goalList is empty
         if not goalList:
             return {'success':False,'message':'No goals found'}
@@ -652,9 +619,7 @@ class ExpenseTracker():
     # View filtered goals
     def view_filtered_goals(self,name:Optional[str]=None,amount:Optional[float]=None,startDate:Optional[str]=None,monthContribution:Optional[float]=None,currency:Optional[str]=None) -> Dict[bool,str]:
         # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        goalList = data['goals']
+        goalList = self.storage.records('goals')
         # If not goals
         if not goalList:
             return {'success':False,'message':'No goals found'}
@@ -665,30 +630,15 @@ class ExpenseTracker():
     
     # Delete goals
     def delete_goals(self,id:int) -> Dict[bool,str]:
-        # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        goalList = data['goals']
         # If not goals
-        if not goalList:
+        if self.storage.count('goals') == 0:
             return {'success':False,'message':'No goals to delete'}
-        deleteGoal = ''
-        for goal in goalList:
-            if goal['id'] == id:
-                deleteGoal = goal
-        if deleteGoal == '':
+        if not self.storage.delete('goals',id):
             return {'success':False,'message':'No goal with this ID was found'}
-        goalList.remove(deleteGoal)
-        data['goals'] = goalList
-        self.write_file(data)
         return {'success':True,'message':'Goal successfully deleted'}
 
     # Add recurring expense
     def add_recurring_expense(self,amount:float,purchased:str,tags:str,currency:str) -> Dict[bool,str]:
-        # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        recurringList = data['recurring_expenses']
         # Create recurring expense
         expense = {
             'amount': amount,
@@ -696,123 +646,76 @@ class ExpenseTracker():
             'tags': tags,
             'currency': currency,
         }
-        recurringList.append(expense)
-        data['recurring_expenses'] = recurringList
-        self.write_file(data)
+        self.storage.insert('recurring_expenses',expense)
         return {'success':True,'message':'Successfully added recurring expense'}
 
     # View all recurring expenses
     def view_recurring_expenses(self) -> Dict[bool,str]:
         # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        recurringList = data['recurring_expenses']
+        recurringList = self.storage.records('recurring_expenses')
         return {'success':True,'data':recurringList}
 
     # Add recurring income
     def add_recurring_income(self,amount:float,source:str,currency:str) -> Dict[bool,str]:
-        # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        recurringList = data['recurring_income']
         # Create recurring income
         income = {
             'amount': amount,
             'source': source,
             'currency': currency,
         }
-        recurringList.append(income)
-        data['recurring_income'] = recurringList
-        self.write_file(data)
+        self.storage.insert('recurring_income',income)
         return {'success':True,'message':'Successfully added recurring income'}
     
     # View all recurring income
     def view_recurring_income(self) -> Dict[bool,str]:
         # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        recurringList = data['recurring_income']
+        recurringList = self.storage.records('recurring_income')
         return {'success':True,'data':recurringList}
 
     # Detect recurring expenses
-    def detect_recurring_expenses(self, min_occurrences: int = 3, days_threshold: int = 30) -> Dict[str, Any]:
+    def detect_recurring_expenses(self, min_occurrences: int = 3, days_threshold: int = 30, amount_tolerance: float = 0.05) -> Dict[str, Any]:
         """
         Detect recurring expenses based on similar transactions within a time threshold.
 
+        Expenses are grouped by normalized merchant and currency, with prices within amount_tolerance
+        of each other counted as the same charge (CLI.core.recurring). Results are kept per group next
+        to the data file, so a run after a few changes only re-examines the groups those changes touch.
+
         Args:
             min_occurrences: Minimum number of occurrences to consider as recurring
             days_threshold: Maximum days between transactions to consider as the same recurring pattern
+            amount_tolerance: Largest relative price difference between two charges of one pattern
 
         Returns:
             Dictionary with success status and list of detected recurring expenses
         """
+        from CLI.core.recurring import RecurringDetector
         try:
-            result = self.open_file()
-            data = result['data']
-            expenses = data['expenses']
+            expenses = self.storage.records('expenses')
 
             if not expenses:
                 return {'success': False, 'message': 'No expenses to analyze'}
 
-            # Sort expenses by date
-            expenses.sort(key=lambda x: x['date'])
-
-            # Group expenses by similar characteristics (purchased item and amount)
-            expense_groups = {}
-            for expense in expenses:
-                key = (expense['purchased'].lower(), expense['price'], expense['currency'].lower())
-                if key not in expense_groups:
-                    expense_groups[key] = []
-                expense_groups[key].append(expense)
-
-            # Detect recurring patterns
-            recurring_expenses = []
-            for key, group_expenses in expense_groups.items():
-                if len(group_expenses) >= min_occurrences:
-                    # Check if the expenses occur at regular intervals
-                    dates = [pd.to_datetime(expense['date']) for expense in group_expenses]
-                    intervals = [(dates[i+1] - dates[i]).days for i in range(len(dates)-1)]
-
-                    # Calculate average interval
-                    avg_interval = sum(intervals) / len(intervals)
-
-                    # Check if intervals are consistent (within threshold)
-                    consistent = all(abs(interval - avg_interval) <= days_threshold for interval in intervals)
-
-                    if consistent:
-                        # Calculate next expected date
-                        last_date = dates[-1]
-                        next_expected_date = last_date + pd.Timedelta(days=avg_interval)
-
-                        recurring_expenses.append({
-                            'purchased': key[0],
-                            'price': key[1],
-                            'currency': key[2],
-                            'frequency_days': round(avg_interval),
-                            'occurrences': len(group_expenses),
-                            'next_expected_date': next_expected_date.strftime('%Y-%m-%d'),
-                            'last_date': last_date.strftime('%Y-%m-%d'),
-                            'category': group_expenses[0]['tags']  # Use the category from the first occurrence
-                        })
-
-            return {'success': True, 'data': recurring_expenses}
+            # State file per data file: .data.json.recurring.json (.recurring.json inside a partitioned directory)
+            folder = os.path.dirname(os.path.abspath(self.filename))
+            name = os.path.basename(self.filename.rstrip('/'))
+            stateFile = os.path.join(self.filename, '.recurring.json') if os.path.isdir(self.filename) else os.path.join(folder, f'.{name}.recurring.json')
+            detector = RecurringDetector(stateFile, min_occurrences, days_threshold, amount_tolerance)
+            return {'success': True, 'data': detector.detect(expenses)}
 
         except Exception as e:
             return {'success': False, 'message': f'Error detecting recurring expenses: {str(e)}'}
-    
+
     # ── Assets ────────────────────────────────────────────────────────────────
 
     ASSET_TYPES = ['liquid', 'investment', 'real_estate', 'vehicle', 'other']
     LIABILITY_TYPES = ['mortgage', 'student_loan', 'car_loan', 'credit_card', 'personal_loan', 'other']
 
     def view_assets(self) -> Dict[str, Any]:
-        result = self.open_file()
-        return {'success': True, 'data': result['data'].get('assets', [])}
+        return {'success': True, 'data': self.storage.records('assets')}
 
     def add_asset(self, name: str, asset_type: str, value: float, currency: str = 'usd', notes: str = '') -> Dict[str, Any]:
-        result = self.open_file()
-        data = result['data']
-        asset_id = self.assign_id(data['assets'])
+        asset_id = self.storage.next_id('assets')
         asset = {
             'id': asset_id,
             'name': name,
@@ -821,53 +724,41 @@ class ExpenseTracker():
             'currency': currency.lower(),
             'notes': notes or '',
         }
-        data['assets'].append(asset)
-        self.write_file(data)
+        self.storage.insert('assets', asset)
         return {'success': True, 'message': f'Asset "{name}" added successfully', 'data': asset}
 
     def edit_asset(self, asset_id: int, name: Optional[str] = None, asset_type: Optional[str] = None,
                    value: Optional[float] = None, currency: Optional[str] = None, notes: Optional[str] = None) -> Dict[str, Any]:
-        result = self.open_file()
-        data = result['data']
-        for asset in data['assets']:
-            if asset['id'] == asset_id:
-                if name is not None:
-                    asset['name'] = name
-                if asset_type is not None:
-                    asset['type'] = asset_type.lower()
-                if value is not None:
-                    asset['value'] = round(float(value), 2)
-                if currency is not None:
-                    asset['currency'] = currency.lower()
-                if notes is not None:
-                    asset['notes'] = notes
-                self.write_file(data)
-                return {'success': True, 'message': f'Asset {asset_id} updated'}
-        return {'success': False, 'message': f'Asset {asset_id} not found'}
+        asset = self.storage.get('assets', asset_id)
+        if asset is None:
+            return {'success': False, 'message': f'Asset {asset_id} not found'}
+        asset = dict(asset)
+        if name is not None:
+            asset['name'] = name
+        if asset_type is not None:
+            asset['type'] = asset_type.lower()
+        if value is not None:
+            asset['value'] = round(float(value), 2)
+        if currency is not None:
+            asset['currency'] = currency.lower()
+        if notes is not None:
+            asset['notes'] = notes
+        self.storage.update('assets', asset)
+        return {'success': True, 'message': f'Asset {asset_id} updated'}
 
     def delete_asset(self, asset_id: int) -> Dict[str, Any]:
-        result = self.open_file()
-        data = result['data']
-        before = len(data['assets'])
-        data['assets'] = [a for a in data['assets'] if a['id'] != asset_id]
-        if len(data['assets']) == before:
+        if not self.storage.delete('assets', asset_id):
             return {'success': False, 'message': f'Asset {asset_id} not found'}
-        self.write_file(data)
         return {'success': True, 'message': f'Asset {asset_id} deleted'}
 
     # ── Liabilities ───────────────────────────────────────────────────────────
 
     def view_liabilities(self) -> Dict[str, Any]:
-        result = self.open_file()
-        return {'success': True, 'data': result['data'].get('liabilities', [])}
+        return {'success': True, 'data': self.storage.records('liabilities')}
 
     def add_liability(self, name: str, liability_type: str, balance: float, currency: str = 'usd',
                       interest_rate: float = 0.0, notes: str = '') -> Dict[str, Any]:
-        result = self.open_file()
-        data = result['data']
-        if 'liabilities' not in data:
-            data['liabilities'] = []
-        liability_id = self.assign_id(data['liabilities'])
+        liability_id = self.storage.next_id('liabilities')
         liability = {
             'id': liability_id,
             'name': name,
@@ -877,177 +768,546 @@ class ExpenseTracker():
             'interest_rate': round(float(interest_rate), 4),
             'notes': notes or '',
         }
-        data['liabilities'].append(liability)
-        self.write_file(data)
+        self.storage.insert('liabilities', liability)
         return {'success': True, 'message': f'Liability "{name}" added', 'data': liability}
 
     def edit_liability(self, liability_id: int, name: Optional[str] = None, liability_type: Optional[str] = None,
                        balance: Optional[float] = None, currency: Optional[str] = None,
                        interest_rate: Optional[float] = None, notes: Optional[str] = None) -> Dict[str, Any]:
-        result = self.open_file()
-        data = result['data']
-        for lib in data.get('liabilities', []):
-            if lib['id'] == liability_id:
-                if name is not None: lib['name'] = name
-                if liability_type is not None: lib['type'] = liability_type.lower()
-                if balance is not None: lib['balance'] = round(float(balance), 2)
-                if currency is not None: lib['currency'] = currency.lower()
-                if interest_rate is not None: lib['interest_rate'] = round(float(interest_rate), 4)
-                if notes is not None: lib['notes'] = notes
-                self.write_file(data)
-                return {'success': True, 'message': f'Liability {liability_id} updated'}
-        return {'success': False, 'message': f'Liability {liability_id} not found'}
+        lib = self.storage.get('liabilities', liability_id)
+        if lib is None:
+            return {'success': False, 'message': f'Liability {liability_id} not found'}
+        lib = dict(lib)
+        if name is not None: lib['name'] = name
+        if liability_type is not None: lib['type'] = liability_type.lower()
+        if balance is not None: lib['balance'] = round(float(balance), 2)
+        if currency is not None: lib['currency'] = currency.lower()
+        if interest_rate is not None: lib['interest_rate'] = round(float(interest_rate), 4)
+        if notes is not None: lib['notes'] = notes
+        self.storage.update('liabilities', lib)
+        return {'success': True, 'message': f'Liability {liability_id} updated'}
 
     def delete_liability(self, liability_id: int) -> Dict[str, Any]:
-        result = self.open_file()
-        data = result['data']
-        before = len(data.get('liabilities', []))
-        data['liabilities'] = [l for l in data.get('liabilities', []) if l['id'] != liability_id]
-        if len(data['liabilities']) == before:
+        if not self.storage.delete('liabilities', liability_id):
             return {'success': False, 'message': f'Liability {liability_id} not found'}
-        self.write_file(data)
         return {'success': True, 'message': f'Liability {liability_id} deleted'}
 
+    # ── Bulk operations ───────────────────────────────────────────────────────
+
+    # Fields of each list in stored order, with the default used when a field is left out (REQUIRED = must be given);
+    # the typed record classes in CLI.core.records hold the schema
+    REQUIRED = REQUIRED
+    RECORD_FIELDS = {listName: dict(recordType.FIELDS) for listName, recordType in RECORD_TYPES.items()}
+    NUMERIC_FIELDS = {field for recordType in RECORD_TYPES.values() for field in recordType.NUMERIC}
+    # Money field that a currency change converts, matching edit_expenses / edit_income / edit_subscription / update_budget
+    CONVERTED_FIELDS = {'expenses': 'price', 'income': 'amount', 'budget': 'amount', 'subscriptions': 'price'}
+
+    # Check and normalize one record the same way the single add_* methods store it
+    def _clean_record(self, listName: str, record: Any, partial: bool = False) -> Dict[str, Any]:
+        if isinstance(record, Record):
+            record = record.to_dict()
+        fields = self.RECORD_FIELDS[listName]
+        clean = {}
+        for field, default in fields.items():
+            if field in record and record[field] is not None:
+                value = record[field]
+            elif partial:
+                continue
+            elif default is self.REQUIRED:
+                raise ValueError(f'Missing {field}')
+            else:
+                value = default
+            if field in self.NUMERIC_FIELDS and value is not None:
+                value = float(value)
+            clean[field] = value
+        # Same normalization as add_expenses / add_asset / add_liability
+        if listName in ('expenses', 'assets', 'liabilities') and 'currency' in clean:
+            clean['currency'] = str(clean['currency']).lower()
+        if listName in ('assets', 'liabilities') and 'type' in clean:
+            clean['type'] = str(clean['type']).lower()
+        if listName == 'assets' and 'value' in clean:
+            clean['value'] = round(clean['value'], 2)
+        if listName == 'liabilities':
+            if 'balance' in clean:
+                clean['balance'] = round(clean['balance'], 2)
+            if 'interest_rate' in clean:
+                clean['interest_rate'] = round(clean['interest_rate'], 4)
+        return clean
+
+    # Add many records (dicts or typed records) to one list with a single write; ids are contiguous and each item gets its own result
+    def add_many(self, listName: str, records: List[Any]) -> Dict[str, Any]:
+        if listName not in self.RECORD_FIELDS:
+            return {'success': False, 'message': f'Bulk add not supported for {listName}'}
+        results = []
+        valid = []
+        next_id = self.storage.next_id(listName)
+        for record in records:
+            try:
+                clean = self._clean_record(listName, record)
+            except (ValueError, TypeError, AttributeError) as e:
+                results.append({'success': False, 'message': f'Invalid record: {e}'})
+                continue
+            clean = {'id': next_id, **clean}
+            next_id += 1
+            valid.append(clean)
+            results.append({'success': True, 'id': clean['id']})
+        if valid:
+            self.storage.insert_many(listName, valid)
+            # The storage renumbers records whose ids another process took in the meantime
+            added = (result for result in results if result['success'])
+            for result, clean in zip(added, valid):
+                result['id'] = clean['id']
+        return {'success': bool(valid), 'message': f'Added {len(valid)} of {len(records)} {listName}', 'data': results}
+
+    # Bulk add for expenses (dicts with the add_expenses() arguments)
+    def add_expenses_many(self, expenses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self.add_many('expenses', expenses)
+
+    # Apply many partial edits ({'id': ..., field: new value}) with a single write
+    def edit_many(self, listName: str, changes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if listName not in self.RECORD_FIELDS:
+            return {'success': False, 'message': f'Bulk edit not supported for {listName}'}
+        results = []
+        edited = {}
+        money_field = self.CONVERTED_FIELDS.get(listName)
+        for change in changes:
+            record_id = change.get('id')
+            current = edited.get(record_id) or self.storage.get(listName, record_id)
+            if current is None:
+                results.append({'success': False, 'id': record_id, 'message': 'Not found'})
+                continue
+            try:
+                clean = self._clean_record(listName, change, partial=True)
+            except (ValueError, TypeError, AttributeError) as e:
+                results.append({'success': False, 'id': record_id, 'message': f'Invalid change: {e}'})
+                continue
+            record = {**current, **clean}
+            # A currency change converts the money field like the single edit methods do
+            if money_field and 'currency' in clean and clean['currency'] != current.get('currency') and money_field not in clean:
+                result = self.convert_currency(record[money_field], current.get('currency', 'usd'), clean['currency'], record.get('date'))
+                if not result['success']:
+                    results.append({'success': False, 'id': record_id, 'message': result['message']})
+                    continue
+                record[money_field] = result['rate']
+            edited[record_id] = record
+            results.append({'success': True, 'id': record_id})
+        if edited:
+            self.storage.update_many(listName, list(edited.values()))
+        return {'success': bool(edited), 'message': f'Edited {len(edited)} {listName}', 'data': results}
+
+    # Delete many records by id with a single write
+    def delete_many(self, listName: str, ids: List[int]) -> Dict[str, Any]:
+        deleted = set(self.storage.delete_many(listName, list(ids)))
+        results = [{'success': True, 'id': record_id} if record_id in deleted else {'success': False, 'id': record_id, 'message': 'Not found'} for record_id in ids]
+        return {'success': bool(deleted), 'message': f'Deleted {len(deleted)} {listName}', 'data': results}
+
     # Import from .csv file
-    def import_from_csv(self,listName:Optional[str],filename:Optional[str]) -> Dict[str,Any]:
-        # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        listToProcess = data[listName]
-        df = pd.read_csv(filename)
-        # Drop any id column from CSV — we assign fresh IDs to avoid conflicts
-        df = df.drop(columns=['id'], errors='ignore')
-        newData = df.to_dict('records')
-        max_id = max((item.get('id', 0) for item in listToProcess), default=0)
-        for i, record in enumerate(newData, start=1):
-            record['id'] = max_id + i
-        listToProcess.extend(newData)
-        data[listName] = listToProcess
-        self.write_file(data)
-        display_name = getattr(filename, 'name', filename)
-        return {'success':True,'message':f'Imported {display_name} successfully'}
-
-    # Export expenses to a .csv file
-    def export_to_csv(self,listName:str,filename:str) -> Dict[str,Any]:
-        # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        listToProcess = data[listName]
-        # If listToProcess is empty do no continue
-        if not listToProcess:
-            return {'success':False,'message':'No expenses to process'}
+    # Rows read, checked and written per chunk by import_from_csv()
+    IMPORT_CHUNK_SIZE = 10000
+    # Rejected rows listed in the import report; the rest are only counted
+    MAX_REPORTED_REJECTS = 100
+
+    # Import a .csv (path or open file) a chunk at a time: each row is coerced and checked against the list's schema,
+    # rows already stored (or repeated in the file) are skipped, and each chunk is written with one add_many().
+    # progress(report) is called after every chunk with the running counts
+    def import_from_csv(self,listName:Optional[str],filename:Optional[Any],chunk_size:Optional[int]=None,progress:Optional[Callable[[Dict[str,Any]],None]]=None) -> Dict[str,Any]:
+        if listName not in self.RECORD_FIELDS:
+            return {'success':False,'message':f'CSV import not supported for {listName}'}
+        chunk_size = max(1,chunk_size or self.IMPORT_CHUNK_SIZE)
+        display_name = filename if isinstance(filename,(str,os.PathLike)) else getattr(filename,'name','the CSV file')
+        # Keys of every stored record, hashed, so the index stays small on big ledgers
+        seen = {hash(self._duplicate_key(listName,record)) for record in self.storage.iter_records(listName)}
+        report = {'rows':0,'imported':0,'duplicates':0,'rejected':0,'rejects':[]}
+        try:
+            with self._open_csv(filename) as file:
+                reader = csv.DictReader(file)
+                while True:
+                    chunk = []
+                    read = 0
+                    for row in itertools.islice(reader,chunk_size):
+                        read += 1
+                        report['rows'] += 1
+                        try:
+                            clean = self._clean_record(listName,self._coerce_csv_row(listName,row))
+                        except (ValueError,TypeError) as e:
+                            report['rejected'] += 1
+                            if len(report['rejects']) < self.MAX_REPORTED_REJECTS:
+                                report['rejects'].append({'line':reader.line_num,'message':str(e)})
+                            continue
+                        key = hash(self._duplicate_key(listName,clean))
+                        if key in seen:
+                            report['duplicates'] += 1
+                            continue
+                        seen.add(key)
+                        chunk.append(clean)
+                    if chunk:
+                        self.add_many(listName,chunk)
+                        report['imported'] += len(chunk)
+                    if read and progress is not None:
+                        progress(dict(report))
+                    if read < chunk_size:
+                        break
+        except (OSError,UnicodeDecodeError,csv.Error) as e:
+            return {'success':False,'message':f'Could not read {display_name}: {e}','data':report}
+        message = f"Imported {report['imported']} of {report['rows']} rows from {display_name}"
+        if report['duplicates']:
+            message += f", skipped {report['duplicates']} duplicates"
+        if report['rejected']:
+            message += f", rejected {report['rejected']} invalid rows"
+        return {'success':report['imported'] > 0 or not report['rejected'],'message':message,'data':report}
+
+    # A path, or an uploaded / opened file in binary or text mode, as a text stream for csv
+    @staticmethod
+    @contextmanager
+    def _open_csv(source:Any):
+        if isinstance(source,(str,os.PathLike)):
+            with open(source,'r',encoding='utf-8-sig',newline='') as file:
+                yield file
+        elif isinstance(source.read(0),bytes):
+            # Leave the caller's file open; detach so closing the wrapper doesn't close it
+            wrapper = io.TextIOWrapper(source,encoding='utf-8-sig',newline='')
+            try:
+                yield wrapper
+            finally:
+                wrapper.detach()
+        else:
+            yield source
+
+    # One CSV row as record values: the id column is dropped (ids are assigned fresh), blank cells count as
+    # missing, numbers must be finite and dates ISO (YYYY-MM-DD, a time after them is dropped)
+    def _coerce_csv_row(self,listName:str,row:Dict[str,Any]) -> Dict[str,Any]:
+        record = {}
+        for field,value in row.items():
+            if field is None or value is None:
+                # Cells past the header's columns
+                continue
+            field = field.strip()
+            value = value.strip()
+            if field == 'id' or value == '':
+                continue
+            if field in self.NUMERIC_FIELDS:
+                try:
+                    value = float(value.replace(',',''))
+                except ValueError:
+                    raise ValueError(f'{field} {value!r} is not a number')
+                if not math.isfinite(value):
+                    raise ValueError(f'{field} is not a finite number')
+            elif field == DATE_FIELDS.get(listName):
+                try:
+                    value = _date.fromisoformat(value[:10]).isoformat()
+                except ValueError:
+                    raise ValueError(f'{field} {value!r} is not a YYYY-MM-DD date')
+            record[field] = value
+        return record
+
+    # Records per batch written by export_to_parquet()
+    EXPORT_BATCH_SIZE = 10000
+
+    # The records export_to_*() write, streamed from storage: with start / end (YYYY-MM-DD, inclusive) only those
+    # dated in that range. ValueError for a range on a list without dates
+    def _export_records(self,listName:str,start:Optional[str]=None,end:Optional[str]=None) -> Iterator[dict]:
+        if not start and not end:
+            yield from self.storage.iter_records(listName)
+            return
+        dateField = DATE_FIELDS.get(listName)
+        if dateField is None:
+            raise ValueError(f'{listName} records have no date to limit the export by')
+        for record in self.storage.iter_records(listName):
+            day = str(record.get(dateField) or '')[:10]
+            if day and (not start or day >= start) and (not end or day <= end):
+                yield record
+
+    # Every field of the exported records in first-seen order: a first streamed pass before the one that writes
+    def _export_fields(self,listName:str,start:Optional[str]=None,end:Optional[str]=None) -> List[str]:
+        fields = {}
+        for record in self._export_records(listName,start,end):
+            fields.update(dict.fromkeys(record))
+        return list(fields)
+
+    # Bytes of a whole-list export (fmt: csv, pdf, parquet or xlsx) for a download button, or None when there is
+    # nothing to export or the format's package isn't installed. Kept until the data on disk changes, so a
+    # Streamlit rerun over the same data doesn't export again
+    def export_bytes(self,listName:str,fmt:str) -> Optional[bytes]:
+        stamp = self.data_stamp()
+        cached = self._exports.get((listName,fmt))
+        # Inside a batch the working copy isn't on disk, so the stamp can't tell whether it changed
+        if cached is not None and cached[0] == stamp and not self._batches:
+            return cached[1]
+        with tempfile.TemporaryDirectory() as folder:
+            result = getattr(self,f'export_to_{fmt}')(listName,os.path.join(folder,f'{listName}.{fmt}'))
+            data = None
+            if result['success']:
+                with open(result['data'],'rb') as file:
+                    data = file.read()
+        if not self._batches:
+            self._exports[(listName,fmt)] = (stamp,data)
+        return data
+
+    # Export a list to a .csv file; start / end limit it to records dated in that range
+    def export_to_csv(self,listName:str,filename:str,start:Optional[str]=None,end:Optional[str]=None) -> Dict[str,Any]:
+        try:
+            fields = self._export_fields(listName,start,end)
+        except ValueError as e:
+            return {'success':False,'message':str(e)}
+        # If there is nothing to process do no continue
+        if not fields:
+            return {'success':False,'message':f'No {listName} to export'}
         # Write .csv file
-        df = pd.DataFrame(listToProcess)
-        df.to_csv(filename,index=False)
-        return {'success':True,'message':f'Wrote {listName} to {filename}','data':df}
+        with open(filename,'w',newline='') as file:
+            writer = csv.DictWriter(file,fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(self._export_records(listName,start,end))
+        # data is the path of the written file
+        return {'success':True,'message':f'Wrote {listName} to {filename}','data':filename}
 
-    # Export to PDF
-    def export_to_pdf(self, listName: str, filename: str) -> Dict[str, Any]:
+    # Export a list to a .parquet file (needs pyarrow), EXPORT_BATCH_SIZE records per row group
+    def export_to_parquet(self,listName:str,filename:str,start:Optional[str]=None,end:Optional[str]=None) -> Dict[str,Any]:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            return {'success':False,'message':'Parquet export needs pyarrow (pip install pyarrow)'}
+        try:
+            fields = self._export_fields(listName,start,end)
+        except ValueError as e:
+            return {'success':False,'message':str(e)}
+        if not fields:
+            return {'success':False,'message':f'No {listName} to export'}
+        # ids are integers, money fields floats, everything else text
+        types = {field: pa.int64() if field == 'id' else pa.float64() if field in self.NUMERIC_FIELDS else pa.string() for field in fields}
+        schema = pa.schema([(field,types[field]) for field in fields])
+
+        def column(field:str,batch:List[dict]) -> List[Any]:
+            values = [record.get(field) for record in batch]
+            if field == 'id':
+                return [None if value is None else int(value) for value in values]
+            if field in self.NUMERIC_FIELDS:
+                return [None if value in (None,'') else float(value) for value in values]
+            return [None if value is None else str(value) for value in values]
+
+        records = self._export_records(listName,start,end)
+        with pq.ParquetWriter(filename,schema) as writer:
+            while True:
+                batch = list(itertools.islice(records,self.EXPORT_BATCH_SIZE))
+                if not batch:
+                    break
+                writer.write_batch(pa.record_batch([pa.array(column(field,batch),type=types[field]) for field in fields],schema=schema))
+        return {'success':True,'message':f'Wrote {listName} to {filename}','data':filename}
+
+    # Export a list to an .xlsx file (needs openpyxl); the write-only workbook streams rows to the sheet
+    def export_to_xlsx(self,listName:str,filename:str,start:Optional[str]=None,end:Optional[str]=None) -> Dict[str,Any]:
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            return {'success':False,'message':'Excel export needs openpyxl (pip install openpyxl)'}
+        try:
+            fields = self._export_fields(listName,start,end)
+        except ValueError as e:
+            return {'success':False,'message':str(e)}
+        if not fields:
+            return {'success':False,'message':f'No {listName} to export'}
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(listName)
+        sheet.append(fields)
+        for record in self._export_records(listName,start,end):
+            # Cells take numbers and text; anything else (tag lists, nested values) is written as text
+            sheet.append([value if value is None or isinstance(value,(int,float,str)) else str(value) for value in (record.get(field) for field in fields)])
+        workbook.save(filename)
+        return {'success':True,'message':f'Wrote {listName} to {filename}','data':filename}
+
+    # Rows drawn per page of export_to_pdf() (the first page also holds the title)
+    PDF_ROWS_PER_PAGE = 40
+    _PDF_FONT_SIZE = 9
+    _PDF_ROW_HEIGHT = 16
+
+    # Export to PDF, a page of rows at a time: each page is its own table drawn straight onto the canvas, so only
+    # one page of rows is held whatever the size of the list. columns picks and orders the columns (every field
+    # by default); subtotals adds a table of per-month, per-currency totals of the money fields at the end;
+    # start / end limit it to records dated in that range
+    def export_to_pdf(self,listName:str,filename:str,columns:Optional[List[str]]=None,subtotals:bool=False,rows_per_page:Optional[int]=None,start:Optional[str]=None,end:Optional[str]=None) -> Dict[str,Any]:
         from reportlab.lib.pagesizes import letter
-        from reportlab.lib import colors
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.pdfgen.canvas import Canvas
+        from reportlab.pdfbase.pdfmetrics import stringWidth
         from datetime import datetime as _dt
-        import io
-
-        result = self.open_file()
-        data = result['data']
-        items = data.get(listName, [])
-        if not items:
-            return {'success': False, 'message': f'No {listName} to export'}
-
-        buf = io.BytesIO()
-        doc = SimpleDocTemplate(buf, pagesize=letter)
-        styles = getSampleStyleSheet()
-        story = []
-
-        story.append(Paragraph(f'{listName.capitalize()} Report', styles['Title']))
-        story.append(Paragraph(f'Generated: {_dt.now().strftime("%Y-%m-%d %H:%M")}', styles['Normal']))
-        story.append(Spacer(1, 16))
-
-        headers = list(items[0].keys())
-        table_data = [headers] + [[str(row.get(h, '')) for h in headers] for row in items]
-        t = Table(table_data, repeatRows=1)
-        t.setStyle(TableStyle([
+
+        try:
+            # Every field in first-seen order by default, as export_to_csv() writes them
+            columns = columns or self._export_fields(listName,start,end)
+        except ValueError as e:
+            return {'success':False,'message':str(e)}
+        if not columns:
+            return {'success':False,'message':f'No {listName} to export'}
+        width,height = letter
+        margin = 40
+        # No more rows than fit under the header row
+        rows_per_page = max(4,min(rows_per_page or self.PDF_ROWS_PER_PAGE,int((height - 2 * margin) // self._PDF_ROW_HEIGHT) - 1))
+        # Narrow id and number columns, wide text columns; cells are cut to fit so every row has one height
+        weights = [0.5 if column == 'id' else 1.0 if column in self.NUMERIC_FIELDS or column == DATE_FIELDS.get(listName) else 2.0 for column in columns]
+        colWidths = [(width - 2 * margin) * weight / sum(weights) for weight in weights]
+
+        def cell(value:Any,colWidth:float) -> str:
+            text = '' if value is None else str(value)
+            # No Helvetica glyph is wider than the font size, so short cells skip measuring
+            if len(text) * self._PDF_FONT_SIZE <= colWidth - 6 or stringWidth(text,'Helvetica',self._PDF_FONT_SIZE) <= colWidth - 6:
+                return text
+            while text and stringWidth(text + '\u2026','Helvetica',self._PDF_FONT_SIZE) > colWidth - 6:
+                text = text[:-1]
+            return text + '\u2026'
+
+        canvas = Canvas(filename,pagesize=letter,pageCompression=1)
+        canvas.setTitle(f'{listName.capitalize()} Report')
+        pages = 0
+        top = height - margin
+
+        def draw_page(rows:List[List[str]],header:List[str]) -> None:
+            nonlocal pages,top
+            pages += 1
+            table = self._pdf_table([header] + rows,colWidths)
+            _,tableHeight = table.wrapOn(canvas,width - 2 * margin,top - margin)
+            table.drawOn(canvas,margin,top - tableHeight)
+            canvas.setFont('Helvetica',8)
+            canvas.drawRightString(width - margin,margin / 2,f'Page {pages}')
+            canvas.showPage()
+            top = height - margin
+
+        canvas.setFont('Helvetica-Bold',18)
+        canvas.drawCentredString(width / 2,top - 18,f'{listName.capitalize()} Report')
+        canvas.setFont('Helvetica',10)
+        canvas.drawString(margin,top - 40,f'Generated: {_dt.now().strftime("%Y-%m-%d %H:%M")}')
+        top -= 56
+        # The title takes the room of a few rows on the first page
+        pageRows = rows_per_page - 3
+        dateField = DATE_FIELDS.get(listName)
+        moneyFields = [field for field in columns if field in RECORD_TYPES[listName].NUMERIC] if listName in RECORD_TYPES else []
+        totals = {}
+        rows = []
+        count = 0
+        for record in self._export_records(listName,start,end):
+            count += 1
+            rows.append([cell(record.get(column),colWidth) for column,colWidth in zip(columns,colWidths)])
+            if subtotals and moneyFields:
+                key = (str(record.get(dateField) or '')[:7] or 'undated',str(record.get('currency') or '').upper())
+                sums = totals.setdefault(key,[0] + [0.0] * len(moneyFields))
+                sums[0] += 1
+                for i,field in enumerate(moneyFields,start=1):
+                    try:
+                        sums[i] += float(record.get(field) or 0)
+                    except (TypeError,ValueError):
+                        pass
+            if len(rows) == pageRows:
+                draw_page(rows,columns)
+                rows = []
+                pageRows = rows_per_page
+        if not count:
+            return {'success':False,'message':f'No {listName} to export'}
+        if rows:
+            draw_page(rows,columns)
+        if totals:
+            header = ['Month','Currency','Rows'] + [f'Total {field}' for field in moneyFields]
+            colWidths = [(width - 2 * margin) / len(header)] * len(header)
+            summary = [[month,currency,str(sums[0])] + [f'{total:,.2f}' for total in sums[1:]] for (month,currency),sums in sorted(totals.items())]
+            canvas.setFont('Helvetica-Bold',14)
+            canvas.drawString(margin,top - 14,'Monthly subtotals')
+            top -= 28
+            first = max(1,rows_per_page - 2)
+            draw_page(summary[:first],header)
+            for start in range(first,len(summary),rows_per_page):
+                draw_page(summary[start:start + rows_per_page],header)
+        canvas.save()
+        # data is the path of the written file, as with export_to_csv()
+        return {'success':True,'message':f'PDF exported to {filename} ({count} rows, {pages} pages)','data':filename}
+
+    # One page of an export_to_pdf() table: header row on blue, alternating row shading
+    def _pdf_table(self,data:List[List[str]],colWidths:List[float]) -> Any:
+        from reportlab.lib import colors
+        from reportlab.platypus import Table, TableStyle
+        table = Table(data,colWidths=colWidths,rowHeights=self._PDF_ROW_HEIGHT)
+        table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F81BD')),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
             ('GRID', (0, 0), (-1, -1), 0.4, colors.HexColor('#CCCCCC')),
             ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#EBF3FF')]),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+            ('FONTSIZE', (0, 0), (-1, -1), self._PDF_FONT_SIZE),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
         ]))
-        story.append(t)
-
-        doc.build(story)
-        pdf_bytes = buf.getvalue()
-        with open(filename, 'wb') as f:
-            f.write(pdf_bytes)
-        return {'success': True, 'message': f'PDF exported to {filename}', 'data': pdf_bytes}
-
+        return table
 
     # Convert expenses to a different currency
     def convert_prices_to_currency(self,to_currency:str) -> Dict[str,Any]:
         # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        expenseList = data['expenses']
+        expenseList = self.storage.records('expenses')
         # If expenseList is empty do not continue
         if not expenseList:
             return {'success':False,'message':'No expenses to process'}
-        # Loop through the expenseList list
-        for expense in expenseList:
-            # Only change the currency if the expense['currency'] doesn't match the to_currency
-            if expense['currency'] != to_currency:
-                from_currency = expense['currency']
-                result = self.convert_currency(expense['price'],from_currency,to_currency)
-                if not result['success']:
-                    return {'success':False,'message':result['message']}
-                expense['price'] = round(result['rate'],2)
-                expense['currency'] = to_currency.lower()
-        self.write_file(data)
+        # Only change the expenses whose currency doesn't match the to_currency
+        foreign = [expense for expense in expenseList if str(expense.get('currency','')).lower() != to_currency.lower()]
+        # Each price at the rate of its own date where the offline history has it, one latest rate per currency otherwise
+        # (undated rows included)
+        try:
+            prices = self.rates.convert_many([expense['price'] for expense in foreign],[expense.get('currency','') for expense in foreign],to_currency,[expense.get('date') for expense in foreign])
+        except RateError as e:
+            return {'success':False,'message':str(e)}
+        converted = [{**expense,'price':round(float(price),2),'currency':to_currency.lower()} for expense,price in zip(foreign,prices)]
+        if converted:
+            self.storage.update_many('expenses',converted)
         return {'success':True,'message':f'Successfully converted to {to_currency.upper()}'}
 
-    def check_for_duplicates(self,array:str) -> Dict[bool,str]:
-        # Define the list to process
-        result = self.open_file()
-        data = result['data']
-        processedList = data[array]
-        # Look through the list for duplicates
-        count = 0
-        for item in processedList:
-            for item2 in processedList:
-                if item['id'] != item2['id'] and item['id'] < item2['id']:
-                    if array == 'expenses':
-                        if item['price'] == item2['price'] and item['purchased'] == item2['purchased'] and item['tags'] == item2['tags'] and item['date'] == item2['date'] and item['currency'] == item2['currency'] and item['notes'] == item2['notes']:
-                            self.delete_expenses(item2['id'])
-                            count += 1
-                    elif array == 'income':
-                        if item['amount'] == item2['amount'] and item['source'] == item2['source'] and item['date'] == item2['date'] and item['currency'] == item2['currency'] and item['notes'] == item2['notes']:
-                            self.delete_income(item2['id'])
-                            count += 1
-                    elif array == 'budget':
-                        if item['id'] != item2['id'] and item['category'] == item2['category'] and item['amount'] == item2['amount'] and item['currency'] == item2['currency']:
-                            self.delete_budget(item2['category'])
-                            count += 1
-                    elif array == 'subscriptions':
-                        if item['id'] != item2['id'] and item['price'] == item2['price'] and item['name'] == item2['name'] and item['currency'] == item2['currency'] and item['startDate'] == item2['startDate']:
-                            self.delete_subscription(item2['name'])
-                            count += 1
-                    elif array == 'goals':
-                        if item['id'] != item2['id'] and item['name'] == item2['name'] and item['amount'] == item2['amount'] and item['startDate'] == item2['startDate'] and item['monthContribution'] == item2['monthContribution'] and item['currency'] == item2['currency']:
-                            self.delete_goals(item2['id'])
-                            count += 1
-        if count < 1:
-            return {'success':False,'message':'No duplicates found'}
-        return {'success':True,'message':f'Removed {count} duplicates'}
+    # Fields that make two records the same item; lists not named here compare every field except id
+    DUPLICATE_KEYS = {
+        'expenses': ('price','purchased','tags','date','currency','notes'),
+        'income': ('amount','source','date','currency','notes'),
+        'budget': ('category','amount','currency'),
+        'subscriptions': ('price','name','currency','startDate'),
+        'goals': ('name','amount','startDate','monthContribution','currency'),
+    }
+
+    # Normalize one field for comparison so ' Coffee' and 'Coffee' (or a list and its tuple) match
+    @staticmethod
+    def _duplicate_value(value:Any) -> Any:
+        if isinstance(value,str):
+            return value.strip()
+        if isinstance(value,list):
+            return tuple(value)
+        if isinstance(value,dict):
+            return tuple(sorted(value.items()))
+        return value
+
+    # What makes a record the same item as another: its key fields (DUPLICATE_KEYS unless given) normalized
+    def _duplicate_key(self,array:str,item:Dict[str,Any],keys:Optional[List[str]]=None,ignore:Optional[set]=None) -> tuple:
+        keys = keys or self.DUPLICATE_KEYS.get(array)
+        fields = keys if keys is not None else sorted(field for field in item if field != 'id')
+        return tuple((field, self._duplicate_value(item.get(field))) for field in fields if not ignore or field not in ignore)
+
+    # Group records by their key fields in one pass; returns the ids of each group with more than one record
+    def find_duplicates(self,array:str,keys:Optional[List[str]]=None,ignore:Optional[List[str]]=None) -> List[List[int]]:
+        records = self.storage.records(array)
+        ignore = set(ignore or ())
+        groups = {}
+        for item in records:
+            # Records without an id (the recurring lists) can't be deleted one by one
+            if item.get('id') is None:
+                continue
+            groups.setdefault(self._duplicate_key(array,item,keys,ignore),[]).append(item['id'])
+        # The oldest (lowest id) record of each group is the one kept
+        return [sorted(ids) for ids in groups.values() if len(ids) > 1]
+
+    # Remove every duplicate but the oldest in one write; dryRun only reports what would go
+    def check_for_duplicates(self,array:str,dryRun:bool=False,keys:Optional[List[str]]=None,ignore:Optional[List[str]]=None) -> Dict[str,Any]:
+        groups = self.find_duplicates(array,keys,ignore)
+        duplicates = [record_id for ids in groups for record_id in ids[1:]]
+        report = {'groups':groups,'removed':[] if dryRun else duplicates}
+        if not duplicates:
+            return {'success':False,'message':'No duplicates found','data':report}
+        if dryRun:
+            return {'success':True,'message':f'Found {len(duplicates)} duplicates in {len(groups)} groups','data':report}
+        self.storage.delete_many(array,duplicates)
+        return {'success':True,'message':f'Removed {len(duplicates)} duplicates','data':report}
 
 
 __version__ = "v1.5"
 
-# For getting web pages such as the GitHub page for this project
-import requests
 # For checking for updates properly
 from packaging.version import Version
 # For running the updates properly
@@ -1055,6 +1315,8 @@ import subprocess
 import sys
 # Check the repo for the current version number
 def check_for_updates(repo="PyMite6941/Expense-tracker"):
+    # For getting web pages such as the GitHub page for this project
+    import requests
     try:
         url = f"https://api.github.com/repos/{repo}/releases/latest"
         response = requests.get(url,timeout=5)
@@ -1073,4 +1335,18 @@ def validate_update(latest_tag):
 def start_update():
     subprocess.run(["git","pull"],check=True)
     subprocess.run([sys.executable,"-m","pip","install","-r","requirements.txt"],check=True)
-    return {'success':True,'message':'Close the program to run with the new updates'}
\ No newline at end of file
+    return {'success':True,'message':'Close the program to run with the new updates'}
+
+# Read a settings file such as .bot_config.json; missing or unreadable gives {}
+def load_config(path:str) -> Dict[str,Any]:
+    try:
+        with open(path,'rb') as file:
+            cfg = serializer.load(file)
+    except (OSError,ValueError):
+        return {}
+    return cfg if isinstance(cfg,dict) else {}
+
+# Write a settings file, indented so it stays hand-editable
+def save_config(path:str,cfg:Dict[str,Any]) -> None:
+    with open(path,'wb') as file:
+        serializer.dump(cfg,file,indent=True)
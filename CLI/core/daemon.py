@@ -0,0 +1,384 @@
+# Local ledger daemon: one process owns the data file and serves the storage API to every frontend over a Unix socket
+# Start it next to the data file with: python -m CLI.core.daemon [data_file]
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from CLI.core import serializer
+from CLI.core.query import Eq, Query, dump_query, execute, load_query
+from CLI.core.storage import DATE_FIELDS, BatchStorage, open_storage
+
+# Storage calls answered from the daemon's copy as soon as they arrive
+READ_CALLS = frozenset({'load', 'records', 'get', 'count', 'next_id', 'select', 'query', 'rollup', 'cache_stats', 'lock_stats',
+                        'invalidate'})
+# Storage calls that change the ledger; they go through the writer queue
+WRITE_CALLS = frozenset({'save', 'insert_many', 'update_many', 'delete_many', 'apply'})
+
+# How long a client waits to connect before using the file directly
+CONNECT_TIMEOUT = 0.5
+
+
+# An error the daemon reported that has no matching built-in exception
+class DaemonError(RuntimeError):
+    pass
+
+
+# Next to the data file, or inside a partitioned directory (named the way open_storage() picks one)
+def socket_path(filename: str) -> str:
+    if filename.endswith(('/', os.sep)) or os.path.isdir(filename):
+        return os.path.join(filename.rstrip('/' + os.sep) or filename, '.sock')
+    return filename + '.sock'
+
+
+# Sockets connect to the daemon only where the platform has AF_UNIX (not on older Windows)
+def _unix_sockets() -> bool:
+    return hasattr(socket, 'AF_UNIX')
+
+
+def _send(file: Any, message: Dict[str, Any]) -> None:
+    file.write(serializer.dumps(message) + b'\n')
+    file.flush()
+
+
+# Owns one storage backend and serves it on a Unix socket; writes are group-committed
+class LedgerDaemon():
+    def __init__(self, filename: str = 'data.json', path: Optional[str] = None, kind: Optional[str] = None) -> None:
+        self.filename = filename
+        self.path = path or socket_path(filename)
+        self.storage = open_storage(filename, kind)
+        # Held by the writer for a whole commit and by every read, so no read sees a commit half applied
+        self._storage_lock = threading.Lock()
+        self._writes: 'queue.Queue[Tuple[str, list, Future]]' = queue.Queue()
+        self.commits = 0
+        self.writes = 0
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+        # Open client connections, closed on shutdown so their clients fall back to the file
+        self._connections: set = set()
+
+    # Run one call against a storage; insert_many answers with the ids that were stored
+    @staticmethod
+    def _call(storage: Any, call: str, args: list) -> Any:
+        if call == 'query':
+            # Sent as plain lists (CLI.core.query.dump_query)
+            return storage.query(load_query(args[0]))
+        result = getattr(storage, call)(*args)
+        if call == 'insert_many':
+            return [record.get('id') for record in args[1]]
+        return result
+
+    # Take every write waiting in the queue, run them against one working copy and commit once
+    def _writer(self) -> None:
+        while True:
+            group = [self._writes.get()]
+            while True:
+                try:
+                    group.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            # None is the shutdown signal; what was queued before it is still written
+            writes = [item for item in group if item is not None]
+            if writes:
+                self._commit(writes)
+            if len(writes) < len(group):
+                return
+
+    def _commit(self, group: List[Tuple[str, list, Future]]) -> None:
+        with self._storage_lock:
+            self._commit_locked(group)
+
+    def _commit_locked(self, group: List[Tuple[str, list, Future]]) -> None:
+        if len(group) == 1:
+            call, args, future = group[0]
+            try:
+                future.set_result(self._call(self.storage, call, args))
+            except Exception as e:
+                future.set_exception(e)
+            self.commits += 1
+            self.writes += 1
+            return
+        batch = BatchStorage(self.storage)
+        results = []
+        for call, args, future in group:
+            # Every call runs on the group's one batch; a call that fails halfway is rolled back
+            # to where it started, so none of its changes are committed and the others' are
+            savepoint = batch.savepoint()
+            try:
+                result = self._call(batch, call, args)
+            except Exception as e:
+                batch.rollback_to(savepoint)
+                results.append((future, None, e))
+            else:
+                results.append((future, result, None))
+        try:
+            batch.commit()
+        except Exception as e:
+            for future, _, _ in results:
+                future.set_exception(e)
+            return
+        self.commits += 1
+        self.writes += len(group)
+        # Ids the commit renumbered show up in the stored records
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def handle(self, request: Dict[str, Any]) -> Any:
+        call = request.get('call')
+        args = list(request.get('args', []))
+        if call == 'stats':
+            return {'commits': self.commits, 'writes': self.writes, 'queued': self._writes.qsize()}
+        if call in READ_CALLS:
+            with self._storage_lock:
+                return self._call(self.storage, call, args)
+        if call in WRITE_CALLS:
+            future: Future = Future()
+            self._writes.put((call, args, future))
+            result = future.result()
+            if call == 'insert_many':
+                # The records were renumbered in the daemon's copy if another writer had taken their ids
+                return [record.get('id') for record in args[1]]
+            return result
+        raise ValueError(f'Unknown call: {call}')
+
+    def serve_forever(self) -> None:
+        if _running(self.path):
+            raise RuntimeError(f'A ledger daemon is already serving {self.path}')
+        if os.path.exists(self.path):
+            # Left behind by a daemon that didn't shut down cleanly
+            os.unlink(self.path)
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def setup(self) -> None:
+                super().setup()
+                daemon._connections.add(self.connection)
+
+            def finish(self) -> None:
+                daemon._connections.discard(self.connection)
+                super().finish()
+
+            def handle(self) -> None:
+                for line in self.rfile:
+                    try:
+                        answer = {'result': daemon.handle(serializer.loads(line))}
+                    except Exception as e:
+                        answer = {'error': type(e).__name__, 'message': str(e)}
+                    _send(self.wfile, answer)
+
+        writer = threading.Thread(target=self._writer, name='ledger-writer', daemon=True)
+        writer.start()
+        # Only the owner may connect: the socket gives full access to the ledger
+        umask = os.umask(0o177)
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(self.path, Handler)
+        finally:
+            os.umask(umask)
+        self._server.daemon_threads = True
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            for connection in list(self._connections):
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self._writes.put(None)
+            writer.join()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+
+
+# Storage API forwarded to a running LedgerDaemon; uses the file directly once the daemon is gone
+class DaemonStorage():
+    def __init__(self, filename: str, path: Optional[str] = None, kind: Optional[str] = None) -> None:
+        self.filename = filename
+        self.kind = kind
+        self.path = path or socket_path(filename)
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._file: Any = None
+        # The backend open_storage() gives, once the daemon can't be reached
+        self.direct: Any = None
+
+    def _connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(None)
+        self._sock, self._file = sock, sock.makefile('rb')
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+            self._sock = self._file = None
+
+    # One request and its answer; reads that can't reach the daemon go to the file instead
+    def _request(self, call: str, *args: Any) -> Any:
+        with self._lock:
+            if self.direct is None:
+                try:
+                    answer = self._exchange(call, args)
+                except (OSError, ValueError):
+                    self.close()
+                    if call in WRITE_CALLS:
+                        # It may or may not have been applied; retrying could add a record twice
+                        raise ConnectionError(f'Lost the ledger daemon at {self.path} during {call}')
+                    self.direct = open_storage(self.filename, self.kind)
+                else:
+                    if 'error' in answer:
+                        raise _ERRORS.get(answer['error'], DaemonError)(answer['message'])
+                    return answer['result']
+        return DaemonStorage._call_direct(self.direct, call, args)
+
+    def _exchange(self, call: str, args: tuple) -> Dict[str, Any]:
+        if self._sock is None:
+            self._connect()
+        self._sock.sendall(serializer.dumps({'call': call, 'args': list(args)}) + b'\n')
+        line = self._file.readline()
+        if not line:
+            raise ConnectionResetError('The ledger daemon closed the connection')
+        return serializer.loads(line)
+
+    @staticmethod
+    def _call_direct(storage: Any, call: str, args: tuple) -> Any:
+        if call == 'stats':
+            return {'commits': 0, 'writes': 0, 'queued': 0}
+        return LedgerDaemon._call(storage, call, list(args))
+
+    def stats(self) -> Dict[str, int]:
+        return self._request('stats')
+
+    def invalidate(self) -> None:
+        self._request('invalidate')
+
+    def cache_stats(self) -> Dict[str, int]:
+        return self._request('cache_stats')
+
+    def lock_stats(self) -> Dict[str, float]:
+        return self._request('lock_stats')
+
+    def load(self) -> Dict[str, Any]:
+        return self._request('load')
+
+    def save(self, data: Dict[str, Any]) -> None:
+        self._request('save', data)
+
+    def records(self, listName: str) -> List[dict]:
+        return self._request('records', listName)
+
+    def iter_records(self, listName: str) -> Iterator[dict]:
+        return iter(self.records(listName))
+
+    def get(self, listName: str, record_id: int) -> Optional[dict]:
+        return self._request('get', listName, record_id)
+
+    def count(self, listName: str) -> int:
+        return self._request('count', listName)
+
+    def next_id(self, listName: str) -> int:
+        return self._request('next_id', listName)
+
+    # The daemon runs the query and sends back the matching rows only; a predicate class it
+    # can't send makes the query run here on the whole list instead
+    def query(self, query: Query) -> List[dict]:
+        try:
+            wire = dump_query(query)
+        except TypeError:
+            return execute(query, self.records(query.listName), DATE_FIELDS.get(query.listName))
+        return self._request('query', wire)
+
+    def select(self, listName: str, filters: Dict[str, Any]) -> List[dict]:
+        return self._request('select', listName, filters)
+
+    # With a month only that month's rows cross the socket
+    def columns(self, listName: str, month: Optional[str] = None) -> Any:
+        from CLI.core.columns import Columns
+        if month is None:
+            return Columns(listName, self.records(listName))
+        return Columns(listName, self.query(Query(listName, Eq('month', month))))
+
+    # Only the rollup crosses the socket, not the records behind it
+    def rollup(self, listName: str) -> Dict[str, Any]:
+        return self._request('rollup', listName)
+
+    def insert(self, listName: str, record: dict) -> None:
+        self.insert_many(listName, [record])
+
+    # The daemon answers with the stored ids, which differ if another writer had taken them
+    def insert_many(self, listName: str, records: List[dict]) -> None:
+        ids = self._request('insert_many', listName, records)
+        for record, record_id in zip(records, ids):
+            record['id'] = record_id
+
+    def update(self, listName: str, record: dict) -> bool:
+        return self.update_many(listName, [record]) > 0
+
+    def update_many(self, listName: str, records: List[dict]) -> int:
+        return self._request('update_many', listName, records)
+
+    def delete(self, listName: str, record_id: int) -> bool:
+        return len(self.delete_many(listName, [record_id])) > 0
+
+    def delete_many(self, listName: str, record_ids: List[int]) -> List[int]:
+        return self._request('delete_many', listName, record_ids)
+
+    def apply(self, ops: List[dict]) -> None:
+        self._request('apply', ops)
+
+
+# Exceptions the daemon reports that the client raises as themselves
+_ERRORS: Dict[str, type] = {error.__name__: error for error in (ValueError, TypeError, KeyError, LookupError)}
+
+
+def _running(path: str) -> bool:
+    if not _unix_sockets() or not os.path.exists(path):
+        return False
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(path)
+    except OSError:
+        return False
+    finally:
+        sock.close()
+    return True
+
+
+# The daemon's client when it is serving this file, otherwise the storage backend itself
+def connect_storage(filename: str, kind: Optional[str] = None) -> Any:
+    path = socket_path(filename)
+    if _running(path):
+        return DaemonStorage(filename, path, kind)
+    return open_storage(filename, kind)
+
+
+if __name__ == '__main__':
+    if not _unix_sockets():
+        print('The ledger daemon needs Unix domain sockets; frontends will use the file directly.')
+        sys.exit(1)
+    ledger = LedgerDaemon(sys.argv[1] if len(sys.argv) > 1 else 'data.json')
+    # SIGTERM stops it the same way Ctrl+C does, so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=ledger.shutdown).start())
+    print(f'Serving {ledger.filename} on {ledger.path}')
+    try:
+        ledger.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,78 @@
+# Secondary indexes over one list of records, used by the JSON storage backends. Built on first use and kept
+# current through add() / remove() as records are inserted, edited and deleted
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Callable, Dict, List, Optional, Set
+
+
+# Comparison form of a filter value: case-insensitive strings, hashable lists
+def fold(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.lower()
+    if isinstance(value, list):
+        return tuple(fold(item) for item in value)
+    return value
+
+
+# 'YYYY-MM' of an ISO date (or of a month given as 'YYYY-MM')
+def month_of(value: Any) -> Optional[str]:
+    return value[:7] if isinstance(value, str) else None
+
+
+# key(record[field]) -> ids of the records with that key
+class FieldIndex():
+    def __init__(self, field: str, records: List[dict], key: Callable[[Any], Any] = fold) -> None:
+        self.field = field
+        self.key = key
+        self.ids: Dict[Any, Set[Any]] = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record: dict) -> None:
+        self.ids.setdefault(self.key(record.get(self.field)), set()).add(record.get('id'))
+
+    def remove(self, record: dict) -> None:
+        key = self.key(record.get(self.field))
+        ids = self.ids.get(key)
+        if ids is not None:
+            ids.discard(record.get('id'))
+            if not ids:
+                del self.ids[key]
+
+    def lookup(self, value: Any) -> Set[Any]:
+        return self.ids.get(self.key(value), set())
+
+
+# (date, id) pairs kept sorted; dates are ISO strings, so string order is date order
+class DateIndex():
+    def __init__(self, field: str, records: List[dict]) -> None:
+        self.field = field
+        self.entries: List[tuple] = sorted(entry for entry in map(self._entry, records) if entry is not None)
+
+    def _entry(self, record: dict) -> Optional[tuple]:
+        date = record.get(self.field)
+        if not isinstance(date, str) or record.get('id') is None:
+            return None
+        return (date, record['id'])
+
+    def add(self, record: dict) -> None:
+        entry = self._entry(record)
+        if entry is not None:
+            insort(self.entries, entry)
+
+    def remove(self, record: dict) -> None:
+        entry = self._entry(record)
+        if entry is None:
+            return
+        i = bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            del self.entries[i]
+
+    # Ids dated between start and end, both inclusive; a missing bound is open
+    def between(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Any]:
+        lo = 0 if start is None else bisect_left(self.entries, (start,))
+        # (end, inf) sorts after every (end, id) pair, so records dated end are included
+        hi = len(self.entries) if end is None else bisect_right(self.entries, (end, float('inf')))
+        return [record_id for _, record_id in self.entries[lo:hi]]
+
+    def lookup(self, value: Any) -> Set[Any]:
+        return set(self.between(value, value)) if isinstance(value, str) else set()
@@ -0,0 +1,124 @@
+# Streaming reader for one list of a data.json document, a chunk at a time: iter_list() yields the records of
+# one list as each is decoded and steps over the others an element at a time, so memory stays at about one
+# chunk plus one record. read_first() decodes the first value only, which is where the rollups are written
+import json
+import re
+from typing import Any, Iterator, Optional, TextIO
+
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r'\s*')
+# What may follow a complete value
+_DELIMITERS = frozenset(' \t\r\n,:]}')
+
+# Separator after a list element, with the whitespace around it
+_SEPARATOR = re.compile(r'\s*([,\]])\s*')
+
+# The C scanner behind json.loads: (value, end) of the value at an offset
+_scan = json.JSONDecoder().scan_once
+
+
+# A window over the file; consumed text is dropped whenever more is read
+class _Reader():
+    def __init__(self, file: TextIO) -> None:
+        self.file = file
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.file.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    # Next non-whitespace character without consuming it ('' at the end of the file)
+    def peek(self) -> str:
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f'Expected {char!r} at offset {self.pos} of the current chunk')
+        self.pos += 1
+
+    # Decode one value, reading more while it may be cut short by the end of the window
+    def decode(self) -> Any:
+        while True:
+            try:
+                value, end = _scan(self.buf, self.pos)
+            except (StopIteration, json.JSONDecodeError):
+                # Leading whitespace, or a value that runs past the window
+                pos = self.pos
+                self.pos = _WHITESPACE.match(self.buf, pos).end()
+                if self.pos != pos or self._fill():
+                    continue
+                raise ValueError(f'Bad or truncated value at offset {self.pos} of the current chunk')
+            # A number cut at the window edge ('12.' of '12.5') decodes short; only trust a value followed by a delimiter
+            if (end == len(self.buf) or self.buf[end] not in _DELIMITERS) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    # Elements of the list starting here, decoded one at a time
+    def elements(self) -> Iterator[Any]:
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            match = _SEPARATOR.match(self.buf, self.pos)
+            if match is None:
+                # The separator is past the window
+                self.peek()
+                match = _SEPARATOR.match(self.buf, self.pos)
+            if match is None:
+                raise ValueError(f"Expected ',' or ']' at offset {self.pos} of the current chunk")
+            self.pos = match.end()
+            if match.group(1) == ']':
+                return
+
+    # Move past one value; a list is decoded an element at a time and dropped, never whole
+    def skip(self) -> None:
+        if self.peek() == '[':
+            for _ in self.elements():
+                pass
+        else:
+            self.decode()
+
+
+# Records of one top-level list, in file order; nothing when the file has no such list
+def iter_list(file: TextIO, listName: str) -> Iterator[Any]:
+    reader = _Reader(file)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key: Optional[str] = reader.decode()
+        reader.expect(':')
+        if key == listName and reader.peek() == '[':
+            yield from reader.elements()
+            return
+        reader.skip()
+        if reader.peek() == '}':
+            return
+        reader.expect(',')
+
+
+# The value of the document's first key when that key is the one asked for, else None; only
+# the first value is decoded, so the rest of the file is never read
+def read_first(file: TextIO, key: str) -> Any:
+    reader = _Reader(file)
+    reader.expect('{')
+    if reader.peek() != '"' or reader.decode() != key:
+        return None
+    reader.expect(':')
+    return reader.decode()
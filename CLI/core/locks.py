@@ -0,0 +1,84 @@
+# Cross-process locking for the JSON storage backends: flock() on a side file (data.json.lock), shared while
+# reading and exclusive around every read-modify-write. The side file survives the rename that replaces the
+# data file on every write. On platforms without fcntl (Windows) the locks do nothing
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import ContextManager, Dict, Iterator
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# flock() on one lock file, re-entrant within a thread and exclusive between threads; stats() reports how often and how long callers waited
+class FileLock():
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.acquired = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def shared(self) -> ContextManager[None]:
+        return self._hold(exclusive=False)
+
+    # Yields True when a shared lock this thread held was upgraded, i.e. what was read under it may be stale
+    def exclusive(self) -> ContextManager[bool]:
+        return self._hold(exclusive=True)
+
+    @contextmanager
+    def _hold(self, exclusive: bool) -> Iterator[bool]:
+        if fcntl is None:
+            yield False
+            return
+        state = self._local
+        if getattr(state, 'depth', 0):
+            # Already held by this thread: only a shared -> exclusive request has anything to do
+            upgrade = exclusive and not state.exclusive
+            if upgrade:
+                self._acquire(state.fd, fcntl.LOCK_EX)
+                state.exclusive = True
+            state.depth += 1
+            try:
+                yield upgrade
+            finally:
+                state.depth -= 1
+                if upgrade:
+                    fcntl.flock(state.fd, fcntl.LOCK_SH)
+                    state.exclusive = False
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            self._acquire(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            state.fd, state.exclusive, state.depth = fd, exclusive, 1
+            yield False
+        finally:
+            state.depth = 0
+            # Closing the descriptor releases the lock
+            os.close(fd)
+
+    # Take the lock, timing the wait when it isn't free straight away
+    def _acquire(self, fd: int, mode: int) -> None:
+        try:
+            fcntl.flock(fd, mode | fcntl.LOCK_NB)
+            waited = None
+        except BlockingIOError:
+            start = time.perf_counter()
+            fcntl.flock(fd, mode)
+            waited = time.perf_counter() - start
+        with self._stats_lock:
+            self.acquired += 1
+            if waited is not None:
+                self.contended += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            return {'acquired': self.acquired, 'contended': self.contended,
+                    'wait_seconds': round(self.wait_seconds, 6), 'max_wait_seconds': round(self.max_wait_seconds, 6)}
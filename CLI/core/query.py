@@ -0,0 +1,417 @@
+# Query predicates and the planner / executor behind ExpenseTracker.query()
+# Predicates compare like the view_filtered_* filters (strings case-insensitively) and combine with & | ~,
+# e.g. Range('month', '2024-03', '2024-06') & In('tags', ['food', 'rent']); 'month' is the YYYY-MM of the date field.
+# The parts an index can answer narrow the candidates, and only those are tested; SqliteStorage turns the same
+# predicates into SQL, and months() tells the partitioned storage which month files to open
+import heapq
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from CLI.core.indexes import fold, month_of
+
+# Sorts after every character an ISO date or a YYYY-MM month can contain
+DATE_END = '~'
+
+
+# A record's value for a field; 'month' is derived from the list's date field
+def field_value(record: dict, field: str, dateField: Optional[str]) -> Any:
+    if field == 'month':
+        return month_of(record.get(dateField)) if dateField else None
+    return record.get(field)
+
+
+# SQL for one equality; the date column is compared as is so its index is used
+def _sql_equal(column: Tuple[str, bool], value: Any) -> Tuple[str, list]:
+    expr, isDate = column
+    if isinstance(value, str) and not isDate:
+        return f'LOWER({expr}) = ?', [fold(value)]
+    return f'{expr} = ?', [value]
+
+
+# Every predicate combines with & (and), | (or) and ~ (not)
+class Predicate():
+    def __and__(self, other: 'Predicate') -> 'Predicate':
+        return And(self, other)
+
+    def __or__(self, other: 'Predicate') -> 'Predicate':
+        return Or(self, other)
+
+    def __invert__(self) -> 'Predicate':
+        return Not(self)
+
+    def test(self, record: dict, dateField: Optional[str]) -> bool:
+        raise NotImplementedError
+
+    # What an index can answer: ('eq', field, value), ('in', field, values), ('dates', low, high),
+    # ('and', [...]) or ('or', [...]); None when the predicate needs a scan
+    def probe(self, dateField: Optional[str]) -> Optional[tuple]:
+        return None
+
+    # WHERE clause and parameters; column(field) gives (SQL expression, is the date column)
+    def sql(self, column: Callable[[str], Tuple[str, bool]]) -> Tuple[str, list]:
+        raise NotImplementedError
+
+    # Inclusive (low, high) YYYY-MM intervals (None = open) every match falls in; None when unbounded.
+    # Month-partitioned storage only opens the partitions inside them.
+    def months(self, dateField: Optional[str]) -> Optional[List[tuple]]:
+        return None
+
+
+def _is_date(field: str, dateField: Optional[str]) -> bool:
+    return bool(dateField) and field in ('month', dateField)
+
+
+class Eq(Predicate):
+    def __init__(self, field: str, value: Any) -> None:
+        self.field = field
+        self.value = value
+
+    def test(self, record: dict, dateField: Optional[str]) -> bool:
+        return fold(field_value(record, self.field, dateField)) == fold(self.value)
+
+    def probe(self, dateField: Optional[str]) -> Optional[tuple]:
+        if self.field == 'month' and not dateField:
+            return None
+        return ('eq', self.field, self.value)
+
+    def sql(self, column: Callable[[str], Tuple[str, bool]]) -> Tuple[str, list]:
+        if self.field == 'month':
+            return Range('month', self.value, self.value).sql(column)
+        return _sql_equal(column(self.field), self.value)
+
+    def months(self, dateField: Optional[str]) -> Optional[List[tuple]]:
+        if _is_date(self.field, dateField) and isinstance(self.value, str):
+            return [(month_of(self.value), month_of(self.value))]
+        return None
+
+
+class In(Predicate):
+    def __init__(self, field: str, values: Iterable[Any]) -> None:
+        self.field = field
+        self.values = list(values)
+        self._folded = {fold(value) for value in self.values}
+
+    def test(self, record: dict, dateField: Optional[str]) -> bool:
+        return fold(field_value(record, self.field, dateField)) in self._folded
+
+    def probe(self, dateField: Optional[str]) -> Optional[tuple]:
+        if self.field == 'month' and not dateField:
+            return None
+        return ('in', self.field, self.values)
+
+    def sql(self, column: Callable[[str], Tuple[str, bool]]) -> Tuple[str, list]:
+        if not self.values:
+            return '0', []
+        return Or(*(Eq(self.field, value) for value in self.values)).sql(column)
+
+    def months(self, dateField: Optional[str]) -> Optional[List[tuple]]:
+        return Or(*(Eq(self.field, value) for value in self.values)).months(dateField)
+
+
+# low <= value <= high; either bound may be left out or made exclusive
+class Range(Predicate):
+    def __init__(self, field: str, low: Any = None, high: Any = None,
+                 include_low: bool = True, include_high: bool = True) -> None:
+        self.field = field
+        self.low = low
+        self.high = high
+        self.include_low = include_low
+        self.include_high = include_high
+
+    def test(self, record: dict, dateField: Optional[str]) -> bool:
+        value = field_value(record, self.field, dateField)
+        if value is None:
+            return False
+        try:
+            if self.low is not None and (value < self.low if self.include_low else value <= self.low):
+                return False
+            if self.high is not None and (value > self.high if self.include_high else value >= self.high):
+                return False
+        except TypeError:
+            return False
+        return True
+
+    def probe(self, dateField: Optional[str]) -> Optional[tuple]:
+        if not dateField or self.field not in ('month', dateField):
+            return None
+        if not all(bound is None or isinstance(bound, str) for bound in (self.low, self.high)):
+            return None
+        # The date index answers a superset (bounds taken inclusively); test() trims it
+        if self.field == 'month':
+            return ('dates', month_of(self.low), None if self.high is None else month_of(self.high) + DATE_END)
+        return ('dates', self.low, self.high)
+
+    def sql(self, column: Callable[[str], Tuple[str, bool]]) -> Tuple[str, list]:
+        if self.field == 'month':
+            # Months become a range on the date column itself
+            expr = column(self.field)[0]
+            clauses, params = [f'{expr} IS NOT NULL'], []
+            if self.low is not None:
+                clauses.append(f'{expr} >= ?')
+                params.append(self.low if self.include_low else self.low + DATE_END)
+            if self.high is not None:
+                clauses.append(f'{expr} < ?')
+                params.append(self.high + DATE_END if self.include_high else self.high)
+            return '(' + ' AND '.join(clauses) + ')', params
+        expr = column(self.field)[0]
+        clauses, params = [f'{expr} IS NOT NULL'], []
+        if self.low is not None:
+            clauses.append(f'{expr} {">=" if self.include_low else ">"} ?')
+            params.append(self.low)
+        if self.high is not None:
+            clauses.append(f'{expr} {"<=" if self.include_high else "<"} ?')
+            params.append(self.high)
+        return '(' + ' AND '.join(clauses) + ')', params
+
+    def months(self, dateField: Optional[str]) -> Optional[List[tuple]]:
+        if not _is_date(self.field, dateField):
+            return None
+        if not all(bound is None or isinstance(bound, str) for bound in (self.low, self.high)):
+            return None
+        return [(month_of(self.low), month_of(self.high))]
+
+
+# String values starting with prefix (case-insensitive)
+class Prefix(Predicate):
+    def __init__(self, field: str, prefix: str) -> None:
+        self.field = field
+        self.prefix = prefix
+
+    def test(self, record: dict, dateField: Optional[str]) -> bool:
+        value = field_value(record, self.field, dateField)
+        return isinstance(value, str) and value.lower().startswith(self.prefix.lower())
+
+    def probe(self, dateField: Optional[str]) -> Optional[tuple]:
+        if dateField and self.field in ('month', dateField):
+            return ('dates', self.prefix, self.prefix + DATE_END)
+        return None
+
+    def sql(self, column: Callable[[str], Tuple[str, bool]]) -> Tuple[str, list]:
+        expr, isDate = column(self.field)
+        if isDate:
+            return f'({expr} >= ? AND {expr} < ?)', [self.prefix, self.prefix + DATE_END]
+        escaped = self.prefix.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return f"LOWER({expr}) LIKE ? ESCAPE '\\'", [escaped + '%']
+
+    def months(self, dateField: Optional[str]) -> Optional[List[tuple]]:
+        if not _is_date(self.field, dateField):
+            return None
+        # A prefix down to the month names one month; a shorter one ('2024') a span of them
+        if len(self.prefix) >= 7:
+            return [(self.prefix[:7], self.prefix[:7])]
+        return [(self.prefix, self.prefix + DATE_END)]
+
+
+class And(Predicate):
+    def __init__(self, *parts: Predicate) -> None:
+        self.parts = parts
+
+    def test(self, record: dict, dateField: Optional[str]) -> bool:
+        return all(part.test(record, dateField) for part in self.parts)
+
+    # Any part an index can answer narrows the candidates; the rest are checked on them
+    def probe(self, dateField: Optional[str]) -> Optional[tuple]:
+        probes = [probe for probe in (part.probe(dateField) for part in self.parts) if probe is not None]
+        return ('and', probes) if probes else None
+
+    def sql(self, column: Callable[[str], Tuple[str, bool]]) -> Tuple[str, list]:
+        if not self.parts:
+            return '1', []
+        clauses, params = zip(*(part.sql(column) for part in self.parts))
+        return '(' + ' AND '.join(clauses) + ')', [param for group in params for param in group]
+
+    # Intersection of the parts that are bounded
+    def months(self, dateField: Optional[str]) -> Optional[List[tuple]]:
+        result = None
+        for part in self.parts:
+            spans = part.months(dateField)
+            if spans is None:
+                continue
+            if result is None:
+                result = spans
+                continue
+            result = [(_later(lowA, lowB), _earlier(highA, highB)) for lowA, highA in result for lowB, highB in spans]
+            result = [(low, high) for low, high in result if low is None or high is None or low <= high]
+        return result
+
+
+class Or(Predicate):
+    def __init__(self, *parts: Predicate) -> None:
+        self.parts = parts
+
+    def test(self, record: dict, dateField: Optional[str]) -> bool:
+        return any(part.test(record, dateField) for part in self.parts)
+
+    # Only usable when every branch can be answered from an index
+    def probe(self, dateField: Optional[str]) -> Optional[tuple]:
+        probes = [part.probe(dateField) for part in self.parts]
+        return ('or', probes) if probes and None not in probes else None
+
+    def sql(self, column: Callable[[str], Tuple[str, bool]]) -> Tuple[str, list]:
+        if not self.parts:
+            return '0', []
+        clauses, params = zip(*(part.sql(column) for part in self.parts))
+        return '(' + ' OR '.join(clauses) + ')', [param for group in params for param in group]
+
+    # Union, but only when every branch is bounded
+    def months(self, dateField: Optional[str]) -> Optional[List[tuple]]:
+        spans = [part.months(dateField) for part in self.parts]
+        if not spans or None in spans:
+            return None
+        return [span for part in spans for span in part]
+
+
+class Not(Predicate):
+    def __init__(self, part: Predicate) -> None:
+        self.part = part
+
+    def test(self, record: dict, dateField: Optional[str]) -> bool:
+        return not self.part.test(record, dateField)
+
+    def sql(self, column: Callable[[str], Tuple[str, bool]]) -> Tuple[str, list]:
+        clause, params = self.part.sql(column)
+        # A comparison with a missing (NULL) value is unknown in SQL, and NOT unknown is still unknown;
+        # test() counts it as no match, so the negation has to match it
+        return f'NOT COALESCE({clause}, 0)', params
+
+
+def _later(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _earlier(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    return b if a is None else a if b is None else min(a, b)
+
+
+# Whether a YYYY-MM month falls inside any of the spans returned by Predicate.months()
+def month_in(month: str, spans: List[tuple]) -> bool:
+    return any((low is None or month >= low) and (high is None or month <= high) for low, high in spans)
+
+
+# One list, an optional predicate, and how to order and page the result
+class Query():
+    def __init__(self, listName: str, where: Optional[Predicate] = None, sort: Optional[str] = None,
+                 descending: bool = False, limit: Optional[int] = None, offset: int = 0) -> None:
+        self.listName = listName
+        self.where = where
+        self.sort = sort
+        self.descending = descending
+        self.limit = limit
+        self.offset = max(offset, 0)
+        self._plans: Dict[Optional[str], Optional[tuple]] = {}
+
+    # Compiled once per date field (i.e. per backend list) and reused on every run
+    def plan(self, dateField: Optional[str]) -> Optional[tuple]:
+        if dateField not in self._plans:
+            self._plans[dateField] = None if self.where is None else self.where.probe(dateField)
+        return self._plans[dateField]
+
+    def matches(self, record: dict, dateField: Optional[str]) -> bool:
+        return self.where is None or self.where.test(record, dateField)
+
+
+# A query as plain JSON-able lists, for sending it to the ledger daemon (CLI.core.daemon)
+def dump_query(query: Query) -> Dict[str, Any]:
+    return {'list': query.listName, 'where': None if query.where is None else _dump(query.where), 'sort': query.sort,
+            'descending': query.descending, 'limit': query.limit, 'offset': query.offset}
+
+
+def load_query(data: Dict[str, Any]) -> Query:
+    return Query(data['list'], None if data['where'] is None else _load(data['where']), data['sort'],
+                 data['descending'], data['limit'], data['offset'])
+
+
+# Raises TypeError for a predicate class this module doesn't define
+def _dump(predicate: Predicate) -> list:
+    kind = type(predicate)
+    if kind is Eq:
+        return ['eq', predicate.field, predicate.value]
+    if kind is In:
+        return ['in', predicate.field, predicate.values]
+    if kind is Range:
+        return ['range', predicate.field, predicate.low, predicate.high, predicate.include_low, predicate.include_high]
+    if kind is Prefix:
+        return ['prefix', predicate.field, predicate.prefix]
+    if kind in (And, Or):
+        return ['and' if kind is And else 'or', [_dump(part) for part in predicate.parts]]
+    if kind is Not:
+        return ['not', _dump(predicate.part)]
+    raise TypeError(f'Cannot send a {kind.__name__} predicate')
+
+
+def _load(data: list) -> Predicate:
+    kind, args = data[0], data[1:]
+    if kind in ('and', 'or'):
+        return (And if kind == 'and' else Or)(*(_load(part) for part in args[0]))
+    if kind == 'not':
+        return Not(_load(args[0]))
+    return {'eq': Eq, 'in': In, 'range': Range, 'prefix': Prefix}[kind](*args)
+
+
+# Candidate ids for a probe; index(field) gives the FieldIndex / DateIndex of a field
+def _resolve(probe: tuple, index: Callable[[str], Any], dateField: Optional[str]) -> set:
+    kind = probe[0]
+    if kind == 'eq':
+        return set(index(probe[1]).lookup(probe[2]))
+    if kind == 'in':
+        found = set()
+        for value in probe[2]:
+            found |= index(probe[1]).lookup(value)
+        return found
+    if kind == 'dates':
+        return set(index(dateField).between(probe[1], probe[2]))
+    sets = [_resolve(part, index, dateField) for part in probe[1]]
+    if kind == 'or':
+        return set().union(*sets)
+    found = None
+    for ids in sorted(sets, key=len):
+        found = ids if found is None else found & ids
+        if not found:
+            break
+    return found if found is not None else set()
+
+
+def _sort_key(field: str, dateField: Optional[str]) -> Callable[[dict], tuple]:
+    return lambda record: (fold(field_value(record, field, dateField)), record.get('id') or 0)
+
+
+# Run a query over one list. Without positions / index (SQLite fallback, batches, id-less lists) it scans.
+def execute(query: Query, items: List[dict], dateField: Optional[str] = None,
+            positions: Optional[Dict[Any, int]] = None, index: Optional[Callable[[str], Any]] = None) -> List[dict]:
+    stop = None if query.limit is None else query.offset + query.limit
+    plan = query.plan(dateField) if index is not None else None
+    if plan is not None:
+        candidates = _resolve(plan, index, dateField)
+        pool = (items[position] for position in sorted(positions[record_id] for record_id in candidates if record_id in positions))
+    else:
+        pool = iter(items)
+    matched = (record for record in pool if query.matches(record, dateField))
+
+    if query.sort is None:
+        return list(islice(matched, query.offset, stop))
+
+    # Sorting on the date field with nothing narrowed yet: walk the sorted date index
+    if plan is None and index is not None and dateField and query.sort == dateField:
+        entries = index(dateField).entries
+        ordered = (items[positions[record_id]] for _, record_id in (reversed(entries) if query.descending else entries))
+        dated = (record for record in ordered if query.matches(record, dateField))
+        # Records without a usable date aren't in the index; like None values they sort last
+        undated = (record for record in items if not isinstance(record.get(dateField), str) and query.matches(record, dateField))
+        return list(islice((record for part in (dated, undated) for record in part), query.offset, stop))
+
+    # Otherwise keep only the top offset + limit in a heap; missing values go last either way
+    missing: List[dict] = []
+
+    def present() -> Iterable[dict]:
+        for record in matched:
+            if field_value(record, query.sort, dateField) is None:
+                missing.append(record)
+            else:
+                yield record
+
+    key = _sort_key(query.sort, dateField)
+    if stop is None:
+        ordered = sorted(present(), key=key, reverse=query.descending)
+    else:
+        ordered = (heapq.nlargest if query.descending else heapq.nsmallest)(stop, present(), key=key)
+    return (ordered + missing)[query.offset:stop]
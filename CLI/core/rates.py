@@ -0,0 +1,345 @@
+# Exchange rates for the currency conversions: cached whole-table fetches (RateProvider) and an offline daily history (HistoricalRates)
+# Fill the history with: python -m CLI.core.rates import eurofxref-hist.csv, then python -m CLI.core.rates update
+import csv
+import math
+import os
+import sys
+import threading
+import time
+from bisect import bisect_right
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, TextIO, Union
+
+from CLI.core import serializer
+
+API_URL = 'https://api.frankfurter.app/latest'
+# Time series endpoint: /<start>..<end> gives {'rates': {day: {currency: rate}}}
+API_ROOT = 'https://api.frankfurter.app'
+# Base of the reference rates; every other pair is a cross rate through it
+HISTORY_BASE = 'EUR'
+
+# Rates are published once a working day, so half a day keeps them current
+DEFAULT_TTL = 12 * 3600
+
+# Longest gap between a date and the last stored day before it that still counts as covered
+# (a weekend plus holidays); later dates fall back to the latest rates
+MAX_GAP_DAYS = 5
+
+
+# A rate that couldn't be fetched; the message is what convert_currency() reports
+class RateError(Exception):
+    pass
+
+
+# Day number of a record's date ('YYYY-MM-DD...', a date or an ordinal); None when it isn't one
+def _day(on: Any) -> Optional[int]:
+    if on is None:
+        return None
+    if isinstance(on, int):
+        return on
+    if isinstance(on, date):
+        return on.toordinal()
+    try:
+        return date.fromisoformat(str(on)[:10]).toordinal()
+    except ValueError:
+        return None
+
+
+# Daily rates per EUR: a sorted day axis and a float32 day x currency matrix, forward-filled for lookups
+class HistoricalRates():
+    def __init__(self, path: Optional[str] = '.fx_history.npz') -> None:
+        self.path = path
+        self._loaded = False
+        self.days: List[int] = []
+        self.currencies: List[str] = []
+        self._column: Dict[str, int] = {}
+        # As published (NaN where a currency has no rate that day), and with gaps filled from the day
+        # before plus a last column of ones for EUR itself, which lookups use
+        self._raw: Any = None
+        self._filled: Any = None
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.path is None or not os.path.exists(self.path):
+            return
+        import numpy as np
+        try:
+            with np.load(self.path) as stored:
+                self._set([int(day) for day in stored['days']], [str(code) for code in stored['currencies']], stored['rates'])
+        except (OSError, ValueError, KeyError):
+            # An unreadable table is the same as none: conversions use the latest rates
+            return
+
+    def _set(self, days: List[int], currencies: List[str], raw: Any) -> None:
+        import numpy as np
+        self.days = days
+        self.currencies = currencies
+        self._column = {code: i for i, code in enumerate(currencies)}
+        self._raw = raw.astype(np.float32)
+        filled = self._raw.copy()
+        for row in range(1, len(days)):
+            gaps = np.isnan(filled[row])
+            filled[row, gaps] = filled[row - 1, gaps]
+        self._filled = np.hstack([filled, np.ones((len(days), 1), dtype=np.float32)])
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self.days)
+
+    # First and last stored day, or None when the table is empty
+    def span(self) -> Optional[tuple]:
+        self._load()
+        if not self.days:
+            return None
+        return date.fromordinal(self.days[0]), date.fromordinal(self.days[-1])
+
+    # Add or overwrite days: {day (any form _day() takes): {currency: rate per EUR}}
+    def merge(self, rows: Dict[Any, Dict[str, float]]) -> int:
+        import numpy as np
+        self._load()
+        rows = {_day(day): {code.upper(): rate for code, rate in rates.items()} for day, rates in rows.items()}
+        rows.pop(None, None)
+        if not rows:
+            return 0
+        days = sorted(set(self.days) | set(rows))
+        currencies = list(self.currencies) + sorted({code for rates in rows.values() for code in rates} - set(self._column) - {HISTORY_BASE})
+        raw = np.full((len(days), len(currencies)), np.nan, dtype=np.float32)
+        position = {day: i for i, day in enumerate(days)}
+        if self.days:
+            raw[[position[day] for day in self.days], :len(self.currencies)] = self._raw
+        column = {code: i for i, code in enumerate(currencies)}
+        for day, rates in rows.items():
+            for code, rate in rates.items():
+                if code in column and rate is not None:
+                    raw[position[day], column[code]] = rate
+        self._set(days, currencies, raw)
+        return len(rows)
+
+    def save(self) -> None:
+        import numpy as np
+        if self.path is None or self._raw is None:
+            return
+        tmp = f'{self.path}.{os.getpid()}.tmp.npz'
+        np.savez_compressed(tmp, days=np.array(self.days, dtype=np.int32), currencies=np.array(self.currencies), rates=self._raw)
+        os.replace(tmp, self.path)
+
+    # Bulk load a wide CSV dump: a Date column, then one column of rates per EUR for each currency
+    # ('N/A' or empty where there is none) — the layout of the ECB's eurofxref-hist.csv
+    def load_csv(self, source: Union[str, TextIO]) -> int:
+        if isinstance(source, str):
+            with open(source, 'r', encoding='utf-8', newline='') as file:
+                return self.load_csv(file)
+        rows: Dict[Any, Dict[str, float]] = {}
+        for row in csv.DictReader(source):
+            day = row.pop('Date', None) or row.pop('date', None)
+            rates = {}
+            for code, value in row.items():
+                if not code or not code.strip():
+                    continue
+                try:
+                    rates[code.strip()] = float(value)
+                except (TypeError, ValueError):
+                    continue
+            rows[day] = rates
+        return self.merge(rows)
+
+    # Column of a currency in the filled table (EUR is the last one), None when the table doesn't have it
+    def _index(self, code: str) -> Optional[int]:
+        code = code.upper()
+        if code == HISTORY_BASE:
+            return len(self.currencies)
+        return self._column.get(code)
+
+    # from_curr -> to_curr on that day or the last day before it with rates; None if not covered
+    def rate(self, from_curr: str, to_curr: str, on: Any) -> Optional[float]:
+        self._load()
+        day = _day(on)
+        source, target = self._index(from_curr), self._index(to_curr)
+        if day is None or source is None or target is None:
+            return None
+        row = bisect_right(self.days, day) - 1
+        if row < 0 or day - self.days[row] > MAX_GAP_DAYS:
+            return None
+        rate = float(self._filled[row, target]) / float(self._filled[row, source])
+        # NaN before a currency's first published day
+        return None if math.isnan(rate) else rate
+
+    # Rates for a whole column of (currency, date) with one searchsorted; NaN where the table can't answer
+    def rates_many(self, currencies: List[str], days: List[Any], to_curr: str) -> Any:
+        import numpy as np
+        self._load()
+        result = np.full(len(currencies), np.nan)
+        target = self._index(to_curr)
+        if target is None or not self.days:
+            return result
+        ordinals = np.array([_day(on) or -1 for on in days], dtype=np.int64)
+        rows = np.searchsorted(np.array(self.days, dtype=np.int64), ordinals, side='right') - 1
+        columns = {code: self._index(code) for code in set(currencies)}
+        sources = np.array([-1 if columns[code] is None else columns[code] for code in currencies], dtype=np.int64)
+        stored = np.array(self.days, dtype=np.int64)
+        covered = (rows >= 0) & (sources >= 0) & (ordinals - stored[np.maximum(rows, 0)] <= MAX_GAP_DAYS)
+        result[covered] = self._filled[rows[covered], target].astype(float) / self._filled[rows[covered], sources[covered]]
+        return result
+
+
+# Whole rate tables per base currency, cached in memory and on disk
+class RateProvider():
+    def __init__(self, cache_file: Optional[str] = '.rates_cache.json', ttl: float = DEFAULT_TTL, timeout: float = 5,
+                 history: Optional[HistoricalRates] = None, failure_ttl: Optional[float] = None) -> None:
+        self.cache_file = cache_file
+        self.ttl = ttl
+        # How long a failed fetch is remembered (the TTL by default), so a loop over many records
+        # converting offline fails fast instead of waiting out the timeout on every row
+        self.failure_ttl = ttl if failure_ttl is None else failure_ttl
+        self._failures: Dict[str, float] = {}
+        self.timeout = timeout
+        # Offline daily rates for conversions given a date
+        self.history = history
+        self.fetches = 0
+        self._session: Any = None
+        self._lock = threading.Lock()
+        # base -> {'fetched': epoch seconds, 'rates': {currency: rate}}, upper-case codes
+        self._tables: Dict[str, Dict[str, Any]] = self._read_cache()
+
+    def _read_cache(self) -> Dict[str, Dict[str, Any]]:
+        if self.cache_file is None:
+            return {}
+        try:
+            with open(self.cache_file, 'rb') as file:
+                tables = serializer.load(file)
+        except (OSError, ValueError):
+            return {}
+        return tables if isinstance(tables, dict) else {}
+
+    def _write_cache(self) -> None:
+        if self.cache_file is None:
+            return
+        tmp = f'{self.cache_file}.{os.getpid()}.tmp'
+        try:
+            with open(tmp, 'wb') as file:
+                serializer.dump(self._tables, file)
+            os.replace(tmp, self.cache_file)
+        except OSError:
+            # The cache only saves requests; a read-only directory just means fetching again next run
+            pass
+
+    # One pooled session for every request; requests is only imported on the first fetch
+    def _get(self, url: str, params: Dict[str, str]) -> Any:
+        import requests
+        if self._session is None:
+            self._session = requests.Session()
+        try:
+            return self._session.get(url, params=params, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            raise RateError('Could not connect to the Conversion API')
+
+    def _fetch(self, base: str) -> Dict[str, float]:
+        response = self._get(API_URL, {'from': base})
+        self.fetches += 1
+        try:
+            rates = response.json()['rates']
+        except (ValueError, KeyError):
+            # frankfurter answers an unknown currency with an error body instead of rates
+            raise RateError('Bad variables')
+        return {currency.upper(): float(rate) for currency, rate in rates.items()}
+
+    # Every rate from `base`, fetched when missing or older than the TTL
+    def table(self, base: str) -> Dict[str, float]:
+        base = base.upper()
+        with self._lock:
+            cached = self._tables.get(base)
+            if cached is not None and cached.get('rates') and time.time() - cached.get('fetched', 0) < self.ttl:
+                return cached['rates']
+            failed = self._failures.get(base)
+            if failed is not None and time.time() - failed < self.failure_ttl:
+                if cached is not None and cached.get('rates'):
+                    return cached['rates']
+                raise RateError('Could not connect to the Conversion API')
+            try:
+                rates = self._fetch(base)
+            except RateError:
+                self._failures[base] = time.time()
+                if cached is not None and cached.get('rates'):
+                    return cached['rates']
+                raise
+            self._failures.pop(base, None)
+            rates[base] = 1.0
+            self._tables[base] = {'fetched': time.time(), 'rates': rates}
+            self._write_cache()
+            return rates
+
+    # The rate on a given day from the offline history when it has one, else the latest rate
+    def rate(self, from_curr: str, to_curr: str, on: Any = None) -> float:
+        if from_curr.upper() == to_curr.upper():
+            return 1.0
+        if on is not None and self.history is not None:
+            rate = self.history.rate(from_curr, to_curr, on)
+            if rate is not None:
+                return rate
+        rate = self.table(from_curr).get(to_curr.upper())
+        if rate is None:
+            raise RateError('Bad variables')
+        return rate
+
+    def convert(self, amount: float, from_curr: str, to_curr: str, on: Any = None) -> float:
+        return amount * self.rate(from_curr, to_curr, on)
+
+    # amounts[i] from currencies[i] into to_curr, as a float array. With dates, each amount converts at its
+    # own date from the history; the rest use one latest rate per distinct currency
+    def convert_many(self, amounts: Iterable[float], currencies: Iterable[str], to_curr: str, dates: Optional[Iterable[Any]] = None) -> Any:
+        import numpy as np
+        amounts = np.asarray(list(amounts), dtype=float)
+        currencies = np.array([str(currency).upper() for currency in currencies], dtype=str)
+        rates = np.full(len(amounts), np.nan)
+        rates[currencies == to_curr.upper()] = 1.0
+        if dates is not None and self.history is not None:
+            dated = np.isnan(rates)
+            rates[dated] = self.history.rates_many(list(currencies[dated]), [on for on, keep in zip(dates, dated) if keep], to_curr)
+        missing = np.isnan(rates)
+        codes, inverse = np.unique(currencies[missing], return_inverse=True)
+        rates[missing] = np.array([self.rate(code, to_curr) for code in codes], dtype=float)[inverse]
+        return amounts * rates
+
+    # Fetch the days after the last stored one (or the last `days` days for an empty table) into the history
+    def update_history(self, days: int = 365) -> int:
+        if self.history is None:
+            return 0
+        span = self.history.span()
+        start = span[1] + timedelta(days=1) if span else date.today() - timedelta(days=days)
+        if start > date.today():
+            return 0
+        response = self._get(f'{API_ROOT}/{start.isoformat()}..', {'from': HISTORY_BASE})
+        self.fetches += 1
+        try:
+            rows = response.json()['rates']
+        except (ValueError, KeyError):
+            raise RateError('Bad variables')
+        # The series starts at the last business day on or before `start`, which may already be stored
+        added = self.history.merge(rows)
+        self.history.save()
+        return added
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._tables = {}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ('import', 'update') or (sys.argv[1] == 'import' and len(sys.argv) < 3):
+        print(__doc__)
+        sys.exit(1)
+    if sys.argv[1] == 'import':
+        history = HistoricalRates(sys.argv[3] if len(sys.argv) > 3 else '.fx_history.npz')
+        count = history.load_csv(sys.argv[2])
+        history.save()
+    else:
+        history = HistoricalRates(sys.argv[2] if len(sys.argv) > 2 else '.fx_history.npz')
+        try:
+            count = RateProvider(None, history=history).update_history()
+        except RateError as e:
+            print(e)
+            sys.exit(1)
+    span = history.span()
+    print(f'{count} days added; {len(history)} days stored' + (f' ({span[0]} to {span[1]})' if span else ''))
@@ -0,0 +1,173 @@
+# Typed __slots__ record classes for the ledger lists: fields are attributes, money fields floats and currencies
+# lower-case. Fields a class doesn't know are kept in `extra`, so to_dict() writes back everything that was read.
+# FIELDS of each class is also the schema ExpenseTracker checks bulk adds and edits against (RECORD_FIELDS)
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+# Default of a field that must be present
+REQUIRED = object()
+
+
+def _number(value: Any) -> float:
+    if isinstance(value, bool):
+        raise ValueError(f'Expected a number, got {value!r}')
+    return float(value)
+
+
+# One ledger entry; subclasses list their fields in FIELDS
+class Record():
+    # (field, default) in stored order after 'id'; REQUIRED marks fields without a default
+    FIELDS: Tuple[Tuple[str, Any], ...] = ()
+    # Fields held as floats
+    NUMERIC: FrozenSet[str] = frozenset()
+    __slots__ = ('id', 'extra')
+
+    def __init__(self, id: Optional[int] = None, **values: Any) -> None:
+        self.id = id
+        for field, default in self.FIELDS:
+            if field not in values and default is REQUIRED:
+                raise ValueError(f'Missing {field}')
+            setattr(self, field, self._normalize(field, values.pop(field, default)))
+        # None rather than {} when there is nothing extra, which is almost always
+        self.extra = values or None
+
+    @classmethod
+    def _normalize(cls, field: str, value: Any) -> Any:
+        if value is None:
+            return None
+        if field in cls.NUMERIC:
+            return _number(value)
+        if field == 'currency':
+            return str(value).lower()
+        return value
+
+    # From the on-disk dict; ValueError / TypeError if a required field is missing or a number isn't one
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> 'Record':
+        return cls(**record)
+
+    # Back to the on-disk dict: id, the known fields, then anything extra
+    def to_dict(self) -> Dict[str, Any]:
+        record = {'id': self.id}
+        for field, _ in self.FIELDS:
+            record[field] = getattr(self, field)
+        if self.extra:
+            record.update(self.extra)
+        return record
+
+    def __eq__(self, other: Any) -> bool:
+        return type(other) is type(self) and other.to_dict() == self.to_dict()
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{field}={getattr(self, field)!r}' for field, _ in self.FIELDS)
+        return f'{type(self).__name__}(id={self.id!r}, {fields})'
+
+
+class Expense(Record):
+    FIELDS = (('price', REQUIRED), ('purchased', REQUIRED), ('tags', REQUIRED), ('date', REQUIRED),
+              ('currency', REQUIRED), ('notes', ''))
+    NUMERIC = frozenset({'price'})
+    __slots__ = tuple(field for field, _ in FIELDS)
+    price: float
+    purchased: str
+    tags: str
+    date: str
+    currency: str
+    notes: str
+
+
+class Income(Record):
+    FIELDS = (('amount', REQUIRED), ('source', REQUIRED), ('date', REQUIRED), ('currency', 'usd'), ('notes', None))
+    NUMERIC = frozenset({'amount'})
+    __slots__ = tuple(field for field, _ in FIELDS)
+    amount: float
+    source: str
+    date: str
+    currency: str
+    notes: Optional[str]
+
+
+class Budget(Record):
+    FIELDS = (('category', REQUIRED), ('amount', REQUIRED), ('currency', 'usd'))
+    NUMERIC = frozenset({'amount'})
+    __slots__ = tuple(field for field, _ in FIELDS)
+    category: str
+    amount: float
+    currency: str
+
+
+class Subscription(Record):
+    FIELDS = (('name', REQUIRED), ('price', REQUIRED), ('currency', REQUIRED), ('startDate', None))
+    NUMERIC = frozenset({'price'})
+    __slots__ = tuple(field for field, _ in FIELDS)
+    name: str
+    price: float
+    currency: str
+    startDate: Optional[str]
+
+
+class Goal(Record):
+    FIELDS = (('name', REQUIRED), ('amount', REQUIRED), ('startDate', None), ('monthContribution', 0),
+              ('currency', 'usd'))
+    NUMERIC = frozenset({'amount', 'monthContribution'})
+    __slots__ = tuple(field for field, _ in FIELDS)
+    name: str
+    amount: float
+    startDate: Optional[str]
+    monthContribution: float
+    currency: str
+
+
+class Asset(Record):
+    FIELDS = (('name', REQUIRED), ('type', REQUIRED), ('value', REQUIRED), ('currency', 'usd'), ('notes', ''))
+    NUMERIC = frozenset({'value'})
+    __slots__ = tuple(field for field, _ in FIELDS)
+    name: str
+    type: str
+    value: float
+    currency: str
+    notes: str
+
+
+class Liability(Record):
+    FIELDS = (('name', REQUIRED), ('type', REQUIRED), ('balance', REQUIRED), ('currency', 'usd'),
+              ('interest_rate', 0.0), ('notes', ''))
+    NUMERIC = frozenset({'balance', 'interest_rate'})
+    __slots__ = tuple(field for field, _ in FIELDS)
+    name: str
+    type: str
+    balance: float
+    currency: str
+    interest_rate: float
+    notes: str
+
+
+# Record class of each list that has one (the recurring lists stay plain dicts)
+RECORD_TYPES: Dict[str, type] = {
+    'expenses': Expense,
+    'income': Income,
+    'budget': Budget,
+    'subscriptions': Subscription,
+    'goals': Goal,
+    'assets': Asset,
+    'liabilities': Liability,
+}
+
+
+# A whole list; repeated strings (categories, currencies, dates) share one object across it
+def decode(listName: str, records: Iterable[Dict[str, Any]]) -> List[Record]:
+    recordType = RECORD_TYPES[listName]
+    fields = [field for field, _ in recordType.FIELDS]
+    strings: Dict[str, str] = {}
+    decoded = []
+    for record in records:
+        item = recordType.from_dict(record)
+        for field in fields:
+            value = getattr(item, field)
+            if type(value) is str:
+                setattr(item, field, strings.setdefault(value, value))
+        decoded.append(item)
+    return decoded
+
+
+def encode(records: Iterable[Record]) -> List[Dict[str, Any]]:
+    return [record.to_dict() for record in records]
@@ -0,0 +1,178 @@
+# Recurring-expense detection for ExpenseTracker.detect_recurring_expenses(), recomputing only the merchant groups whose rows changed
+import hashlib
+import os
+import re
+import zlib
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from CLI.core import serializer
+
+STATE_VERSION = 1
+
+# Day ordinal of a record whose date is missing or unreadable; such rows are left out
+MISSING = -1
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+# The merchant part of a group key: 'Netflix.com #4411' and 'netflix com' are the same merchant
+def normalize_merchant(purchased: Any) -> str:
+    words = _PUNCTUATION.sub(' ', str(purchased or '').lower()).split()
+    return ' '.join(word for word in words if not word.isdigit()) or ' '.join(words)
+
+
+# Day ordinals of ISO dates in one vectorized parse; rows that don't parse are MISSING
+def _days(dates: List[Any]) -> np.ndarray:
+    text = [str(value or '')[:10] for value in dates]
+    try:
+        parsed = np.array(text, dtype='datetime64[D]')
+        days = parsed.astype(np.int64) + date(1970, 1, 1).toordinal()
+        # Blank dates parse as NaT
+        days[np.isnat(parsed)] = MISSING
+        return days
+    except ValueError:
+        # Something unreadable in the column: fall back to one row at a time
+        days = np.full(len(text), MISSING, dtype=np.int64)
+        for i, value in enumerate(text):
+            try:
+                days[i] = date.fromisoformat(value).toordinal()
+            except ValueError:
+                pass
+        return days
+
+
+# Recurring series per merchant group, recomputed only for groups whose rows changed
+class RecurringDetector():
+    def __init__(self, state_file: Optional[str] = None, min_occurrences: int = 3, days_threshold: int = 30,
+                 amount_tolerance: float = 0.05) -> None:
+        self.state_file = state_file
+        self.min_occurrences = min_occurrences
+        self.days_threshold = days_threshold
+        self.amount_tolerance = amount_tolerance
+        # Groups recomputed / reused by the last detect()
+        self.recomputed = 0
+        self.reused = 0
+
+    def _settings(self) -> List[Any]:
+        return [STATE_VERSION, self.min_occurrences, self.days_threshold, self.amount_tolerance]
+
+    def _read_state(self) -> Dict[str, Any]:
+        if self.state_file is None:
+            return {}
+        try:
+            with open(self.state_file, 'rb') as file:
+                state = serializer.load(file)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(state, dict) or state.get('settings') != self._settings():
+            return {}
+        return state.get('groups') or {}
+
+    def _write_state(self, groups: Dict[str, Any]) -> None:
+        if self.state_file is None:
+            return
+        tmp = f'{self.state_file}.{os.getpid()}.tmp'
+        try:
+            with open(tmp, 'wb') as file:
+                serializer.dump({'settings': self._settings(), 'groups': groups}, file)
+            os.replace(tmp, self.state_file)
+        except OSError:
+            # The state only saves work; without it every group is recomputed next time
+            pass
+
+    # Every recurring series in the expenses, soonest next date first
+    def detect(self, expenses: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        rows = list(expenses)
+        keys: Dict[str, int] = {}
+        codes = np.array([keys.setdefault(f"{normalize_merchant(row.get('purchased'))}\x1f{str(row.get('currency') or '').lower()}",
+                                          len(keys)) for row in rows], dtype=np.int64)
+        names = list(keys)
+        days = _days([row.get('date') for row in rows])
+        cents = np.array([_cents(row.get('price')) for row in rows], dtype=np.int64)
+        ids = np.array([row.get('id') if isinstance(row.get('id'), int) else -1 for row in rows], dtype=np.int64)
+        # The text the results show, so renaming or re-tagging a row also counts as a change
+        texts = np.array([zlib.crc32(f"{row.get('purchased')}\x1f{row.get('tags')}".encode()) for row in rows], dtype=np.int64)
+        keep = days != MISSING
+        rows = [row for row, kept in zip(rows, keep) if kept]
+        codes, days, cents, ids, texts = codes[keep], days[keep], cents[keep], ids[keep], texts[keep]
+
+        # Fingerprint of each group: its (id, day, cents, text) rows in a fixed order
+        order = np.lexsort((texts, cents, days, ids, codes))
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        fingerprints = {}
+        for part in np.split(order, bounds) if len(order) else []:
+            fingerprints[names[codes[part[0]]]] = hashlib.blake2b(
+                np.stack([ids[part], days[part], cents[part], texts[part]]).tobytes(), digest_size=16).hexdigest()
+
+        state = self._read_state()
+        changed = [name for name, fingerprint in fingerprints.items()
+                   if state.get(name, {}).get('fingerprint') != fingerprint]
+        self.recomputed, self.reused = len(changed), len(fingerprints) - len(changed)
+        groups = {name: state[name] for name in fingerprints if name not in changed}
+        if changed:
+            changedCodes = np.array([keys[name] for name in changed], dtype=np.int64)
+            found = self._series(np.flatnonzero(np.isin(codes, changedCodes)), codes, days, cents, rows)
+            for name in changed:
+                groups[name] = {'fingerprint': fingerprints[name], 'found': found.get(keys[name], [])}
+        if changed or len(groups) != len(state):
+            self._write_state(groups)
+        results = [series for group in groups.values() for series in group['found']]
+        return sorted(results, key=lambda series: (series['next_expected_date'], series['purchased']))
+
+    # The recurring series among the given rows, by group code
+    def _series(self, selected: np.ndarray, codes: np.ndarray, days: np.ndarray, cents: np.ndarray,
+                rows: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+        if not len(selected):
+            return {}
+        # Split each group into price bands: sorted by price, a new band starts where the price
+        # jumps by more than the tolerance (and a cent) over the previous one
+        byPrice = selected[np.lexsort((cents[selected], codes[selected]))]
+        groupCodes, prices = codes[byPrice], cents[byPrice]
+        newBand = np.ones(len(byPrice), dtype=bool)
+        newBand[1:] = (groupCodes[1:] != groupCodes[:-1]) | (prices[1:] > prices[:-1] * (1 + self.amount_tolerance) + 1)
+        bandOf = np.zeros(len(codes), dtype=np.int64)
+        bandOf[byPrice] = np.cumsum(newBand) - 1
+        bandCount = int(newBand.sum())
+
+        # Each band's rows in date order; a band's gaps are the diffs that stay inside it
+        ordered = selected[np.lexsort((days[selected], bandOf[selected]))]
+        band = bandOf[ordered]
+        starts = np.searchsorted(band, np.arange(bandCount))
+        counts = np.bincount(band, minlength=bandCount)
+        gaps = np.diff(days[ordered]).astype(float)
+        inside = band[1:] == band[:-1]
+        gapBand = band[:-1][inside]
+        gaps = gaps[inside]
+        means = np.bincount(gapBand, weights=gaps, minlength=bandCount) / np.maximum(counts - 1, 1)
+        deviation = np.zeros(bandCount)
+        np.maximum.at(deviation, gapBand, np.abs(gaps - means[gapBand]))
+        # Enough rows, at least a day apart on average (same-day repeats aren't a schedule), evenly spaced
+        recurring = (counts >= self.min_occurrences) & (means >= 1) & (deviation <= self.days_threshold)
+
+        results: Dict[int, List[Dict[str, Any]]] = {}
+        for i in np.flatnonzero(recurring):
+            start, count, mean = int(starts[i]), int(counts[i]), float(means[i])
+            first, last = rows[ordered[start]], rows[ordered[start + count - 1]]
+            lastDay = int(days[ordered[start + count - 1]])
+            results.setdefault(int(codes[ordered[start]]), []).append({
+                'purchased': str(last.get('purchased') or '').lower(),
+                'price': last.get('price'),
+                'currency': str(last.get('currency') or '').lower(),
+                'frequency_days': round(mean),
+                'occurrences': count,
+                'next_expected_date': (date.fromordinal(lastDay) + timedelta(days=round(mean))).isoformat(),
+                'last_date': date.fromordinal(lastDay).isoformat(),
+                # Use the category from the first occurrence
+                'category': first.get('tags'),
+            })
+        return results
+
+
+def _cents(value: Any) -> int:
+    try:
+        return int(round(float(value) * 100))
+    except (TypeError, ValueError):
+        return 0
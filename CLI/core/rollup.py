@@ -0,0 +1,161 @@
+# Month x category totals of expenses and income, kept up to date by the storage backends on every write
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Key of the rollups in a JSON document: {listName: rollup}
+ROLLUP_KEY = '_rollups'
+
+# (date, category, amount) field of each list with a rollup
+ROLLUP_FIELDS = {
+    'expenses': ('date', 'tags', 'price'),
+    'income': ('date', 'source', 'amount'),
+}
+
+# Month of a record without a usable date
+UNDATED = 'undated'
+
+
+def _cents(value: Any) -> int:
+    try:
+        return int(round(float(value) * 100))
+    except (TypeError, ValueError):
+        return 0
+
+
+# (month, category, currency, cents) a record counts under
+def cell_of(listName: str, record: Dict[str, Any]) -> Tuple[str, str, str, int]:
+    dateField, categoryField, amountField = ROLLUP_FIELDS[listName]
+    day = record.get(dateField)
+    # Same test as the partitioned backend's month keys
+    dated = isinstance(day, str) and len(day) >= 7 and day[:4].isdigit() and day[4] == '-' and day[5:7].isdigit()
+    month = day[:7] if dated else UNDATED
+    category = record.get(categoryField)
+    return (month, '' if category is None else str(category), str(record.get('currency') or '').lower(),
+            _cents(record.get(amountField)))
+
+
+# {'rows': records, 'months': {month: {category: {currency: [cents, records]}}}}
+def empty() -> Dict[str, Any]:
+    return {'rows': 0, 'months': {}}
+
+
+# Add (sign 1) or take out (sign -1) one record
+def add(rollup: Dict[str, Any], listName: str, record: Dict[str, Any], sign: int = 1) -> None:
+    month, category, currency, cents = cell_of(listName, record)
+    categories = rollup['months'].setdefault(month, {})
+    currencies = categories.setdefault(category, {})
+    cell = currencies.setdefault(currency, [0, 0])
+    cell[0] += sign * cents
+    cell[1] += sign
+    rollup['rows'] += sign
+    # Empty cells are dropped so a month or category nobody uses any more disappears
+    if cell[1] <= 0:
+        del currencies[currency]
+        if not currencies:
+            del categories[category]
+            if not categories:
+                del rollup['months'][month]
+
+
+def build(listName: str, records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    rollup = empty()
+    for record in records:
+        if isinstance(record, dict):
+            add(rollup, listName, record)
+        else:
+            # A hand-edited file can hold rows that aren't objects: nothing to add, but still counted
+            # so 'rows' keeps matching the list's length
+            rollup['rows'] += 1
+    return rollup
+
+
+# A copy the caller can keep: the stored rollup changes in place on every write
+def copy(rollup: Dict[str, Any]) -> Dict[str, Any]:
+    return {'rows': rollup['rows'],
+            'months': {month: {category: {currency: list(cell) for currency, cell in currencies.items()}
+                               for category, currencies in categories.items()}
+                       for month, categories in rollup['months'].items()}}
+
+
+# A record going out (old) and/or in (new) of a document's rollup; lists without one are ignored
+def changed(data: Dict[str, Any], listName: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+    rollups = data.get(ROLLUP_KEY)
+    if listName not in ROLLUP_FIELDS or not isinstance(rollups, dict) or listName not in rollups:
+        return
+    if old is not None:
+        add(rollups[listName], listName, old, -1)
+    if new is not None:
+        add(rollups[listName], listName, new)
+
+
+# The document with a rollup per list that matches it, built for lists missing one (or when
+# rebuild is set); the rollups are moved to the front of the document. A rollups dict that needs
+# rebuilding is copied, never changed in place, since a cached document may share it
+def ensure(data: Dict[str, Any], rebuild: bool = False) -> Dict[str, Any]:
+    rollups = data.get(ROLLUP_KEY)
+    if not isinstance(rollups, dict):
+        rollups = {}
+    # A count that doesn't match the list means it was edited by hand
+    stale = {listName: build(listName, data.get(listName, [])) for listName in ROLLUP_FIELDS
+             if rebuild or not isinstance(rollups.get(listName), dict)
+             or rollups[listName].get('rows') != len(data.get(listName, []))}
+    if stale:
+        rollups = {**rollups, **stale}
+    if next(iter(data), None) == ROLLUP_KEY and data[ROLLUP_KEY] is rollups:
+        return data
+    return {ROLLUP_KEY: rollups, **{key: value for key, value in data.items() if key != ROLLUP_KEY}}
+
+
+# One list's rollup: totals by month, category and currency without touching the records
+class Rollup():
+    def __init__(self, listName: str, rollup: Dict[str, Any]) -> None:
+        self.listName = listName
+        self.rows = rollup.get('rows', 0)
+        self._months = rollup.get('months', {})
+
+    def __len__(self) -> int:
+        return self.rows
+
+    # Cells of one month ('YYYY-MM') and/or currency: (month, category, cents, count)
+    def _cells(self, month: Optional[str] = None, currency: Optional[str] = None) -> Iterable[Tuple[str, str, int, int]]:
+        months = [month] if month is not None else list(self._months)
+        currency = None if currency is None else currency.lower()
+        for key in months:
+            for category, currencies in self._months.get(key, {}).items():
+                for code, (cents, count) in currencies.items():
+                    if currency is None or code == currency:
+                        yield key, category, cents, count
+
+    def total(self, month: Optional[str] = None, currency: Optional[str] = None) -> float:
+        return sum(cents for _, _, cents, _ in self._cells(month, currency)) / 100
+
+    def count(self, month: Optional[str] = None, currency: Optional[str] = None) -> int:
+        return sum(count for _, _, _, count in self._cells(month, currency))
+
+    # {'YYYY-MM': total} for every dated month with at least one record, oldest first
+    def by_month(self, currency: Optional[str] = None) -> Dict[str, float]:
+        totals: Dict[str, int] = {}
+        for month, _, cents, _ in self._cells(currency=currency):
+            if month != UNDATED:
+                totals[month] = totals.get(month, 0) + cents
+        return {month: round(totals[month] / 100, 2) for month in sorted(totals)}
+
+    # {category: total} for a month / currency, largest first
+    def by_category(self, month: Optional[str] = None, currency: Optional[str] = None) -> Dict[str, float]:
+        totals: Dict[str, int] = {}
+        for _, category, cents, _ in self._cells(month, currency):
+            totals[category] = totals.get(category, 0) + cents
+        return {category: round(cents / 100, 2) for category, cents in sorted(totals.items(), key=lambda item: -item[1])}
+
+    # {category: record count} for a month / currency
+    def counts_by_category(self, month: Optional[str] = None, currency: Optional[str] = None) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for _, category, _, count in self._cells(month, currency):
+            counts[category] = counts.get(category, 0) + count
+        return counts
+
+    # Months with records, oldest first and undated last
+    def months(self) -> List[str]:
+        return sorted(self._months, key=lambda month: (month == UNDATED, month))
+
+    def currencies(self) -> List[str]:
+        return sorted({code for categories in self._months.values() for currencies in categories.values() for code in currencies})
@@ -0,0 +1,110 @@
+# JSON encoding for the data file, the journal, SQLite rows and .bot_config.json: orjson, then msgspec, then json
+# Compare them on a generated ledger with: python -m CLI.core.serializer [records]
+import json
+import sys
+import time
+from typing import Any, BinaryIO, Callable, Dict, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _json_loads(data: Union[str, bytes]) -> Any:
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any, indent: bool = False) -> bytes:
+    if indent:
+        return json.dumps(obj, indent=2).encode()
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def _orjson_dumps(obj: Any, indent: bool = False) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+
+
+def _msgspec_dumps(obj: Any, indent: bool = False) -> bytes:
+    data = msgspec.json.encode(obj)
+    return msgspec.json.format(data, indent=2) if indent else data
+
+
+# name -> (loads, dumps) for every encoder that can be imported here, preferred first
+BACKENDS: Dict[str, tuple] = {}
+if orjson is not None:
+    BACKENDS['orjson'] = (orjson.loads, _orjson_dumps)
+if msgspec is not None:
+    BACKENDS['msgspec'] = (msgspec.json.decode, _msgspec_dumps)
+BACKENDS['json'] = (_json_loads, _json_dumps)
+
+# What the fast encoders raise for input only json handles
+_DECODE_ERRORS: tuple = (ValueError,) + ((msgspec.DecodeError,) if msgspec is not None else ())
+_ENCODE_ERRORS: tuple = (TypeError, OverflowError, ValueError) + ((msgspec.EncodeError,) if msgspec is not None else ())
+
+NAME = next(iter(BACKENDS))
+_loads: Callable[[Union[str, bytes]], Any] = BACKENDS[NAME][0]
+_dumps: Callable[..., bytes] = BACKENDS[NAME][1]
+
+
+# Raises json.JSONDecodeError (a ValueError) for bad input, whichever backend is active
+def loads(data: Union[str, bytes]) -> Any:
+    try:
+        return _loads(data)
+    except _DECODE_ERRORS:
+        # NaN / Infinity and the like are only accepted by json; it also gives the standard error
+        return json.loads(data)
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    try:
+        return _dumps(obj, indent)
+    except _ENCODE_ERRORS:
+        return _json_dumps(obj, indent)
+
+
+def load(file: BinaryIO) -> Any:
+    return loads(file.read())
+
+
+def dump(obj: Any, file: BinaryIO, indent: bool = False) -> None:
+    file.write(dumps(obj, indent))
+
+
+# Parse / dump seconds per backend on a ledger of `records` expenses and income
+def benchmark(records: int = 100_000, repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    document = {
+        'expenses': [{'id': i, 'price': round(i * 0.37 % 500, 2), 'purchased': f'item {i}', 'tags': ('food', 'rent', 'fun')[i % 3],
+                      'date': f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}', 'currency': 'usd', 'notes': ''} for i in range(records)],
+        'income': [{'id': i, 'amount': 1500.0, 'source': 'salary', 'date': f'2024-{i % 12 + 1:02d}-01', 'currency': 'usd'}
+                   for i in range(records // 10)],
+    }
+    results = {}
+    for name, (parse, dump_) in BACKENDS.items():
+        encoded = dump_(document)
+        results[name] = {
+            'dump': min(_timed(lambda: dump_(document)) for _ in range(repeat)),
+            'parse': min(_timed(lambda: parse(encoded)) for _ in range(repeat)),
+        }
+    return results
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    timings = benchmark(count)
+    base = timings['json']
+    print(f'{count} records, active backend: {NAME}')
+    for name, result in timings.items():
+        print(f"  {name:8} dump {result['dump'] * 1000:8.1f} ms ({base['dump'] / result['dump']:4.1f}x)   "
+              f"parse {result['parse'] * 1000:8.1f} ms ({base['parse'] / result['parse']:4.1f}x)")
@@ -0,0 +1,1493 @@
+# Storage backends for ExpenseTracker, all with the API it is written against:
+#   load / save, records / get / count / next_id, iter_records, insert / update / delete (and their _many forms),
+#   apply (row-level changes at once), query / select (CLI.core.query), columns (CLI.core.columns), rollup (CLI.core.rollup)
+# JsonStorage is the original data.json rewritten on every change; JournalStorage appends each change to data.journal
+# and folds it into the snapshot in the background; PartitionedStorage keeps expenses and income in a file per month;
+# SqliteStorage keeps a table per list. Ids come from per-list sequences that only grow, so a deleted id is never reused.
+# The JSON backends take a shared flock() (CLI.core.locks) to read and an exclusive one around every change, and
+# replace files by temp file + rename. open_storage() picks the backend from the path unless a kind is given.
+# Migrate an existing data.json once with:
+#   python -m CLI.core.storage data.json data.db
+#   python -m CLI.core.storage data.json data/
+import functools
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import closing, nullcontext
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from CLI.core import rollup, serializer
+from CLI.core.indexes import DateIndex, FieldIndex, month_of
+from CLI.core.jsonstream import iter_list, read_first
+from CLI.core.locks import FileLock
+from CLI.core.query import And, Eq, Query, execute, month_in
+
+# Every list the data file holds, in the order data.json has always used
+LIST_NAMES = ['expenses', 'income', 'budget', 'subscriptions', 'goals',
+              'recurring_expenses', 'recurring_income', 'assets', 'liabilities']
+
+# Field used as the "category" of each list (indexed in SQLite)
+CATEGORY_FIELDS = {
+    'expenses': 'tags',
+    'income': 'source',
+    'budget': 'category',
+    'subscriptions': 'name',
+    'goals': 'name',
+    'recurring_expenses': 'tags',
+    'recurring_income': 'source',
+    'assets': 'type',
+    'liabilities': 'type',
+}
+
+# Field used as the date of each list (indexed in SQLite)
+DATE_FIELDS = {
+    'expenses': 'date',
+    'income': 'date',
+    'subscriptions': 'startDate',
+    'goals': 'startDate',
+}
+
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+# Document key holding the per-list id sequences (a table of the same name in SQLite)
+SEQUENCE_KEY = '_sequences'
+
+# Lists PartitionedStorage splits into one file per month; records without a readable date go to UNDATED
+PARTITIONED_LISTS = ('expenses', 'income')
+UNDATED = 'undated'
+
+
+def empty_document() -> Dict[str, List[dict]]:
+    return {name: [] for name in LIST_NAMES}
+
+
+# Make sure every list, its id sequence and its rollup exist; anything that isn't a dict becomes an empty document.
+# Use the returned document from here on: it may be a new dict with the rollups moved to the front.
+# rebuild recomputes the rollups even when their counts match, for a document the caller edited wholesale
+def normalize_document(data: Any, rebuild: bool = False) -> Dict[str, Any]:
+    if not isinstance(data, dict):
+        data = empty_document()
+    sequences = _sequences(data)
+    for name in LIST_NAMES:
+        if name not in data:
+            data[name] = []
+        # A hand-edited file can hold ids past the stored counter; never hand those out again
+        sequences[name] = max(sequences.get(name, 0), _max_id(data[name]))
+    return rollup.ensure(data, rebuild)
+
+
+# Records handed to callers are copies, so changing one can't change the cached document behind it
+def _copy_record(record: Any) -> Any:
+    return dict(record) if isinstance(record, dict) else record
+
+
+def _copy_records(records: Iterable[Any]) -> List[Any]:
+    return [_copy_record(record) for record in records]
+
+
+# A document a caller can change freely: lists, records, sequences and rollups are all copies
+def _copy_document(data: Dict[str, Any]) -> Dict[str, Any]:
+    copy = {key: _copy_records(value) if isinstance(value, list) else dict(value) if isinstance(value, dict) else value
+            for key, value in data.items()}
+    if isinstance(copy.get(rollup.ROLLUP_KEY), dict):
+        copy[rollup.ROLLUP_KEY] = {name: rollup.copy(value) for name, value in copy[rollup.ROLLUP_KEY].items()}
+    return copy
+
+
+def _max_id(records: List[dict]) -> int:
+    # A hand-edited file can hold rows that aren't objects at all; they have no id to count
+    return max((int(record['id']) for record in records
+                if isinstance(record, dict) and isinstance(record.get('id'), (int, float))), default=0)
+
+
+# Highest id ever handed out per list; it only grows, so a deleted id is never reused
+def _sequences(data: Dict[str, Any]) -> Dict[str, int]:
+    sequences = data.get(SEQUENCE_KEY)
+    if not isinstance(sequences, dict):
+        sequences = data[SEQUENCE_KEY] = {}
+    return sequences
+
+
+def _bump_sequence(data: Dict[str, Any], listName: str, records: List[dict]) -> None:
+    sequences = _sequences(data)
+    top = _max_id(records)
+    if top > sequences.get(listName, 0):
+        sequences[listName] = top
+
+
+# Give an inserted record whose id was already handed out the next free one, renumbering it in place
+# (and later changes to it in the same ops). That happens when next_id() was read before another
+# process added to the list; callers run this under the exclusive lock, so ids stay unique.
+def _claim_ids(sequences: Dict[str, int], ops: List[dict]) -> None:
+    top = dict(sequences)
+    renumbered: Dict[tuple, int] = {}
+    for entry in ops:
+        listName = entry['list']
+        if entry['op'] == 'delete':
+            entry['id'] = renumbered.get((listName, entry['id']), entry['id'])
+            continue
+        record = entry['record']
+        record_id = record.get('id')
+        if not isinstance(record_id, int) or isinstance(record_id, bool):
+            continue
+        if entry['op'] == 'update':
+            record['id'] = renumbered.get((listName, record_id), record_id)
+            continue
+        if record_id <= top.get(listName, 0):
+            renumbered[(listName, record_id)] = record['id'] = top[listName] + 1
+        top[listName] = max(top.get(listName, 0), record['id'])
+
+
+# id -> position of every record in a list; the first record wins if an id repeats
+def _index_ids(items: List[dict]) -> Dict[Any, int]:
+    index: Dict[Any, int] = {}
+    for i, item in enumerate(items):
+        # Deleted slots are None; a hand-edited row that isn't an object has no id to look up
+        if isinstance(item, dict):
+            index.setdefault(item.get('id'), i)
+    return index
+
+
+# Records of one list streamed out of a JSON document; a missing file has none, and a
+# truncated or corrupt one raises ValueError where the damage starts. The lock is only held to open
+# the file: writes replace it by rename, so the open descriptor keeps reading one whole version.
+def _stream_list(path: str, listName: str, lock: Optional[FileLock] = None) -> Iterator[dict]:
+    try:
+        with lock.shared() if lock is not None else nullcontext():
+            file = open(path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+    with file:
+        yield from iter_list(file, listName)
+
+
+# SQL for the (month, category, currency, cents) a row counts under, the same cell as
+# CLI.core.rollup.cell_of; row is NEW / OLD in a trigger or the table name
+def _rollup_cell(listName: str, row: str) -> tuple:
+    amount = rollup.ROLLUP_FIELDS[listName][2]
+    return (f"CASE WHEN substr({row}.date, 1, 7) GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]' THEN substr({row}.date, 1, 7) ELSE '{UNDATED}' END",
+            f"COALESCE({row}.category, '')",
+            f"lower(COALESCE(json_extract({row}.record, '$.currency'), ''))",
+            f"CAST(round(COALESCE(json_extract({row}.record, '$.{amount}'), 0) * 100) AS INTEGER)")
+
+
+# The rollups at the front of a JSON document, None when the file has none (or can't be read)
+def _read_rollups(path: str, lock: FileLock) -> Any:
+    try:
+        with lock.shared(), open(path, 'r', encoding='utf-8') as file:
+            return read_first(file, rollup.ROLLUP_KEY)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+# Run a storage method holding its backend's exclusive file lock, so the read-modify-write
+# inside can't interleave with another process (or thread) writing the same data
+def _exclusive(method: Callable) -> Callable:
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._file_lock.exclusive() as upgraded:
+            # Upgrading a shared lock isn't atomic; another process may have written in between
+            if upgraded:
+                self.invalidate()
+            return method(self, *args, **kwargs)
+    return locked
+
+
+# The same with the shared lock, for reads that span several files
+def _shared(method: Callable) -> Callable:
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._file_lock.shared():
+            return method(self, *args, **kwargs)
+    return locked
+
+
+# Records whose fields equal every filter (strings case-insensitively), in stored order.
+# 'month' matches the YYYY-MM of the list's date field; None filters are ignored.
+def _filter_query(listName: str, filters: Dict[str, Any]) -> Query:
+    return Query(listName, And(*(Eq(field, value) for field, value in filters.items() if value is not None)))
+
+
+def _partition_key(record: dict, dateField: str) -> str:
+    month = month_of(record.get(dateField))
+    if month and len(month) == 7 and month[:4].isdigit() and month[4] == '-' and month[5:].isdigit():
+        return month
+    return UNDATED
+
+
+# Manifest entry of a partition: how many records, the id range to look in and the month's
+# rollup cells ({category: {currency: [cents, count]}})
+def _partition_entry(records: List[dict], listName: str) -> Dict[str, Any]:
+    ids = [record.get('id') for record in records if isinstance(record.get('id'), (int, float))]
+    months = rollup.build(listName, records)['months']
+    return {'count': len(records), 'min_id': min(ids, default=None), 'max_id': max(ids, default=None),
+            'totals': next(iter(months.values()), {})}
+
+
+def _widen_partition(partitions: Dict[str, Dict[str, Any]], month: str, record_id: Any) -> None:
+    entry = partitions.setdefault(month, {'count': 0, 'min_id': None, 'max_id': None})
+    entry['count'] += 1
+    if isinstance(record_id, (int, float)):
+        entry['min_id'] = record_id if entry['min_id'] is None else min(entry['min_id'], record_id)
+        entry['max_id'] = record_id if entry['max_id'] is None else max(entry['max_id'], record_id)
+
+
+# Stamps of every file a backend may keep the ledger in (the data file or directory, the journal, a
+# SQLite WAL, the partition manifest); any write through any backend or process changes it
+def data_stamp(filename: str) -> tuple:
+    paths = [filename, os.path.splitext(filename)[0] + '.journal', filename + '-wal', os.path.join(filename, 'manifest.json')]
+    return tuple(_file_stamp(path) for path in paths)
+
+
+# (mtime, size, inode) of a file, None when it doesn't exist
+def _file_stamp(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+# Write a JSON file through a temp file + rename so a crash never leaves it half-written
+def _atomic_write_json(path: str, data: Any) -> None:
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as file:
+        serializer.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, path)
+
+
+# Apply row-level changes ({'op': 'insert'|'update', 'list', 'record'} or {'op': 'delete', 'list', 'id'}) to a document.
+# positions is an id -> position map per list to reuse and keep current; lists that lose records are dropped from it.
+# changed(listName, old, new) is called for every record that goes in or out, so secondary indexes can follow.
+def apply_ops(data: Dict[str, Any], ops: List[dict], positions: Optional[Dict[str, Dict[Any, int]]] = None,
+              changed: Optional[Callable[[str, Optional[dict], Optional[dict]], None]] = None) -> None:
+    # id -> position maps are only built for lists that see an update or delete
+    if positions is None:
+        positions = {}
+    deleted = set()
+    for entry in ops:
+        listName = entry['list']
+        items = data.setdefault(listName, [])
+        if entry['op'] == 'insert':
+            items.append(entry['record'])
+            _bump_sequence(data, listName, [entry['record']])
+            if listName in positions:
+                positions[listName].setdefault(entry['record'].get('id'), len(items) - 1)
+            rollup.changed(data, listName, None, entry['record'])
+            if changed is not None:
+                changed(listName, None, entry['record'])
+            continue
+        if listName not in positions:
+            positions[listName] = _index_ids(items)
+        index = positions[listName]
+        if entry['op'] == 'update' and entry['record'].get('id') in index:
+            position = index[entry['record']['id']]
+            old, items[position] = items[position], entry['record']
+            rollup.changed(data, listName, old, entry['record'])
+            if changed is not None:
+                changed(listName, old, entry['record'])
+        elif entry['op'] == 'delete' and entry['id'] in index:
+            position = index.pop(entry['id'])
+            old, items[position] = items[position], None
+            deleted.add(listName)
+            rollup.changed(data, listName, old, None)
+            if changed is not None:
+                changed(listName, old, None)
+    for listName in deleted:
+        data[listName] = [item for item in data[listName] if item is not None]
+        positions.pop(listName, None)
+
+
+def _check_list(listName: str) -> None:
+    # List names end up in SQL statements, so only the known ones are allowed
+    if listName not in LIST_NAMES:
+        raise KeyError(listName)
+
+
+# The original data.json layout — one JSON document rewritten on every change
+class JsonStorage():
+    def __init__(self, filename: str = 'data.json') -> None:
+        self.filename = filename
+        # Parsed document kept while the file's (mtime, size, inode) stays the same
+        self._cache: Optional[tuple] = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # id -> position per list and secondary indexes per list and field,
+        # valid for the document object in _indexed only
+        self._index: Dict[str, Dict[Any, int]] = {}
+        self._secondary: Dict[str, Dict[str, Any]] = {}
+        self._columns: Dict[str, Any] = {}
+        self._indexed: Optional[Dict[str, Any]] = None
+        # Shared while reading the file, exclusive around every change (CLI.core.locks)
+        self._file_lock = FileLock(filename + '.lock')
+
+    # Identity of the file on disk; any write by anyone changes it
+    def _stamp(self) -> Optional[tuple]:
+        return _file_stamp(self.filename)
+
+    # The cached document if the file hasn't changed since it was parsed
+    def _cached(self) -> Optional[Dict[str, Any]]:
+        if self._cache is not None and self._cache[0] is not None and self._cache[0] == self._stamp():
+            return self._cache[1]
+        return None
+
+    # Drop the cached document so the next load re-reads the file
+    def invalidate(self) -> None:
+        self._cache = None
+
+    def cache_stats(self) -> Dict[str, int]:
+        return {'hits': self.cache_hits, 'misses': self.cache_misses}
+
+    # How often taking the file lock had to wait for another reader/writer, and for how long
+    def lock_stats(self) -> Dict[str, float]:
+        return self._file_lock.stats()
+
+    # Indexes belong to one document object; a different one (re-read or saved whole) starts without any
+    def _bind(self, data: Dict[str, Any]) -> None:
+        if self._indexed is not data:
+            self._index = {}
+            self._secondary = {}
+            self._columns = {}
+            self._indexed = data
+
+    # The loaded document and the id -> position map of one of its lists, built once per document
+    def _positions(self, listName: str) -> tuple:
+        data = self._load()
+        self._bind(data)
+        if listName not in self._index:
+            self._index[listName] = _index_ids(data.get(listName, []))
+        return data, self._index[listName]
+
+    # Read the whole document, resetting the file if it is missing or corrupt. This is the cached
+    # document itself; everything handed to callers goes through load() / records(), which copy it
+    def _load(self) -> Dict[str, Any]:
+        data = self._cached()
+        if data is not None:
+            self.cache_hits += 1
+            return data
+        self.cache_misses += 1
+        # Stamp before reading so a write racing the read only causes an extra miss
+        stamp = self._stamp()
+        try:
+            with self._file_lock.shared(), open(self.filename, 'rb') as file:
+                data = normalize_document(serializer.load(file))
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._file_lock.exclusive():
+                # Another process may have written a good file meanwhile; only reset one that is still bad
+                if self._stamp() != stamp:
+                    return self._load()
+                self.save(empty_document())
+            # What save() wrote and cached: the normalized document, with its sequences and rollups
+            return self._cache[1]
+        self._cache = (stamp, data)
+        return data
+
+    # Overwrite the whole document and keep it as the cached copy
+    @_exclusive
+    def save(self, data: Dict[str, Any]) -> None:
+        # The caller may have reordered or replaced lists, so positions and rollups are rebuilt
+        self._indexed = None
+        self._write(normalize_document(data, rebuild=True))
+
+    # Callers hold the exclusive lock; temp file + rename, so readers see the old or the new document, never half of one
+    def _write(self, data: Dict[str, Any]) -> None:
+        try:
+            _atomic_write_json(self.filename, data)
+        except BaseException:
+            # Callers may have mutated the cached document before a failed write
+            self.invalidate()
+            raise
+        self._cache = (self._stamp(), data)
+
+    # A copy of the document; changing its lists doesn't touch the cache or the indexes
+    def load(self) -> Dict[str, Any]:
+        return _copy_document(self._load())
+
+    def records(self, listName: str) -> List[dict]:
+        return _copy_records(self._load().get(listName, []))
+
+    # From the cached document if it is current, otherwise streamed from the file without
+    # parsing the other lists; a streamed read is not cached
+    def iter_records(self, listName: str) -> Iterator[dict]:
+        data = self._cached()
+        if data is not None:
+            self.cache_hits += 1
+            return map(_copy_record, data.get(listName, []))
+        return self._stream(listName)
+
+    def _stream(self, listName: str) -> Iterator[dict]:
+        streamed = False
+        try:
+            for record in _stream_list(self.filename, listName, self._file_lock):
+                streamed = True
+                yield record
+        except ValueError:
+            # A file that is bad before the first record gets what every other read gets from _load();
+            # one that breaks later can't, since part of the list has already been handed out
+            if streamed:
+                raise
+            yield from self.records(listName)
+
+    def get(self, listName: str, record_id: int) -> Optional[dict]:
+        data, index = self._positions(listName)
+        position = index.get(record_id)
+        return None if position is None else _copy_record(data[listName][position])
+
+    def count(self, listName: str) -> int:
+        return len(self._load().get(listName, []))
+
+    def next_id(self, listName: str) -> int:
+        return _sequences(self._load()).get(listName, 0) + 1
+
+    def insert(self, listName: str, record: dict) -> None:
+        self.insert_many(listName, [record])
+
+    # Keep the secondary indexes of a list in step with a record going out (old) and/or in (new)
+    def _changed(self, listName: str, old: Optional[dict], new: Optional[dict]) -> None:
+        # The columnar view is rebuilt in one go the next time it is asked for
+        self._columns.pop(listName, None)
+        for index in self._secondary.get(listName, {}).values():
+            if old is not None:
+                index.remove(old)
+            if new is not None:
+                index.add(new)
+
+    # Apply changes to the cached document, keeping every index built for it current
+    def _apply(self, data: Dict[str, Any], ops: List[dict]) -> None:
+        self._bind(data)
+        apply_ops(data, ops, self._index, self._changed)
+
+    # The secondary index of one field of a list, built the first time the field is filtered on
+    def _field_index(self, listName: str, items: List[dict], field: str) -> Any:
+        indexes = self._secondary.setdefault(listName, {})
+        if field not in indexes:
+            dateField = DATE_FIELDS.get(listName)
+            if field == 'month':
+                indexes[field] = FieldIndex(dateField, items, key=month_of)
+            elif field == dateField:
+                indexes[field] = DateIndex(field, items)
+            else:
+                indexes[field] = FieldIndex(field, items)
+        return indexes[field]
+
+    # Run a query (CLI.core.query), narrowing candidates through the indexes its plan can use
+    def query(self, query: Query) -> List[dict]:
+        data, positions = self._positions(query.listName)
+        items = data.get(query.listName, [])
+        dateField = DATE_FIELDS.get(query.listName)
+        # Indexes hold ids, so lists with id-less records (the recurring ones) are scanned
+        if None in positions:
+            return _copy_records(execute(query, items, dateField))
+        return _copy_records(execute(query, items, dateField, positions, lambda field: self._field_index(query.listName, items, field)))
+
+    def select(self, listName: str, filters: Dict[str, Any]) -> List[dict]:
+        return self.query(_filter_query(listName, filters))
+
+    # Columnar (NumPy) view of expenses or income, kept until the list changes; the whole
+    # list is kept even with a month hint, since mask(month=) on it is as cheap as a rebuild
+    def columns(self, listName: str, month: Optional[str] = None) -> Any:
+        data = self._load()
+        self._bind(data)
+        if listName not in self._columns:
+            from CLI.core.columns import Columns
+            self._columns[listName] = Columns(listName, data.get(listName, []))
+        return self._columns[listName]
+
+    # Month x category totals of expenses or income (CLI.core.rollup). From the cached document
+    # if it is current, otherwise read off the front of the file without parsing the lists
+    def rollup(self, listName: str) -> Dict[str, Any]:
+        data = self._cached()
+        if data is None:
+            stored = _read_rollups(self.filename, self._file_lock)
+            if isinstance(stored, dict) and isinstance(stored.get(listName), dict):
+                return stored[listName]
+            # A file written before rollups existed: loading it builds them
+            data = self._load()
+        else:
+            self.cache_hits += 1
+        return rollup.copy(data[rollup.ROLLUP_KEY][listName])
+
+    def insert_many(self, listName: str, records: List[dict]) -> None:
+        self.apply([{'op': 'insert', 'list': listName, 'record': record} for record in records])
+
+    def update(self, listName: str, record: dict) -> bool:
+        return self.update_many(listName, [record]) > 0
+
+    # Replace stored records by id, returns how many were found
+    @_exclusive
+    def update_many(self, listName: str, records: List[dict]) -> int:
+        data, index = self._positions(listName)
+        found = [record for record in records if record.get('id') in index]
+        if found:
+            self._apply(data, [{'op': 'update', 'list': listName, 'record': record} for record in found])
+            self._write(data)
+        return len(found)
+
+    def delete(self, listName: str, record_id: int) -> bool:
+        return len(self.delete_many(listName, [record_id])) > 0
+
+    # Remove every record whose id is given, returns the ids that were found
+    @_exclusive
+    def delete_many(self, listName: str, record_ids: List[int]) -> List[int]:
+        data, index = self._positions(listName)
+        found = list(dict.fromkeys(record_id for record_id in record_ids if record_id in index))
+        if not found:
+            return []
+        self._apply(data, [{'op': 'delete', 'list': listName, 'id': record_id} for record_id in found])
+        self._write(data)
+        return found
+
+    # Apply a list of row-level changes with a single rewrite
+    @_exclusive
+    def apply(self, ops: List[dict]) -> None:
+        if not ops:
+            return
+        data = self._load()
+        _claim_ids(_sequences(data), ops)
+        self._apply(data, ops)
+        self._write(data)
+
+
+# data.json snapshot plus an append-only data.journal of row-level changes
+class JournalStorage(JsonStorage):
+    def __init__(self, filename: str = 'data.json', max_journal_bytes: int = 1_000_000,
+                 max_journal_entries: int = 1000, background: bool = True) -> None:
+        super().__init__(filename)
+        self.journal = os.path.splitext(filename)[0] + '.journal'
+        self.max_journal_bytes = max_journal_bytes
+        self.max_journal_entries = max_journal_entries
+        self.background = background
+        # Last sequence number applied, and how many journal lines are pending compaction
+        self._seq: Optional[int] = None
+        self._entries = 0
+        self._lock = threading.RLock()
+        self._compactor: Optional[threading.Thread] = None
+
+    # Both files take part in the cache stamp
+    def _stamp(self) -> Optional[tuple]:
+        snapshot = super()._stamp()
+        try:
+            st = os.stat(self.journal)
+            journal = (st.st_mtime_ns, st.st_size, st.st_ino)
+        except FileNotFoundError:
+            journal = None
+        return None if snapshot is None and journal is None else (snapshot, journal)
+
+    # Snapshot plus every journal entry newer than it
+    def _load(self) -> Dict[str, Any]:
+        with self._lock:
+            data = self._cached()
+            if data is not None and self._seq is not None:
+                self.cache_hits += 1
+                return data
+        # The file lock always comes before the thread lock, so the two can't deadlock
+        with self._file_lock.shared(), self._lock:
+            data = self._cached()
+            if data is not None and self._seq is not None:
+                self.cache_hits += 1
+                return data
+            self.cache_misses += 1
+            stamp = self._stamp()
+            try:
+                with open(self.filename, 'rb') as file:
+                    snapshot = serializer.load(file)
+            except FileNotFoundError:
+                snapshot = {}
+            except json.JSONDecodeError:
+                # A corrupt snapshot can't be trusted; start over from the journal alone
+                snapshot = {'_journal_seq': 0}
+            snapshot_seq = snapshot.pop('_journal_seq', 0) if isinstance(snapshot, dict) else 0
+            data = normalize_document(snapshot)
+            entries = [entry for entry in self._read_journal() if entry['seq'] > snapshot_seq]
+            apply_ops(data, entries)
+            self._seq = entries[-1]['seq'] if entries else snapshot_seq
+            self._entries = len(entries)
+            self._cache = (stamp, data)
+            return data
+
+    # The snapshot can only be streamed while no journal entries sit on top of it
+    def iter_records(self, listName: str) -> Iterator[dict]:
+        if self._cached() is None and os.path.exists(self.journal) and os.path.getsize(self.journal) > 0:
+            return iter(self.records(listName))
+        return super().iter_records(listName)
+
+    # The snapshot's rollups only hold while no journal entries sit on top of it
+    def rollup(self, listName: str) -> Dict[str, Any]:
+        if self._cached() is None and os.path.exists(self.journal) and os.path.getsize(self.journal) > 0:
+            return rollup.copy(self._load()[rollup.ROLLUP_KEY][listName])
+        return super().rollup(listName)
+
+    # Whole-document save: a fresh snapshot that supersedes the journal
+    def save(self, data: Dict[str, Any]) -> None:
+        self._indexed = None
+        self._snapshot(normalize_document(data, rebuild=True))
+
+    def _snapshot(self, data: Dict[str, Any]) -> None:
+        with self._file_lock.exclusive() as upgraded, self._lock:
+            # After a non-atomic lock upgrade the seq may be behind another process's appends
+            if upgraded:
+                self.invalidate()
+            if self._seq is None or upgraded:
+                self._load()
+            try:
+                _atomic_write_json(self.filename, {**data, '_journal_seq': self._seq})
+                open(self.journal, 'w').close()
+            except BaseException:
+                self.invalidate()
+                raise
+            self._entries = 0
+            self._cache = (self._stamp(), data)
+
+    def _read_journal(self) -> List[dict]:
+        entries = []
+        good = 0
+        try:
+            with open(self.journal, 'rb') as file:
+                for line in file:
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError('torn line')
+                        entries.append(serializer.loads(line))
+                    except ValueError:
+                        # Only the last line can be torn by a crash mid-append; cut it off
+                        # so the next append doesn't get glued onto it
+                        file.close()
+                        os.truncate(self.journal, good)
+                        break
+                    good += len(line)
+        except FileNotFoundError:
+            pass
+        return entries
+
+    # Append change lines in one write, then compact if the journal got too big
+    def _append(self, entries: List[dict]) -> None:
+        if not entries:
+            return
+        with self._file_lock.exclusive() as upgraded, self._lock:
+            # Another process may have appended since; reload so seq numbers carry on from its last one
+            if upgraded:
+                self.invalidate()
+            data = self._cached()
+            if self._seq is None or data is None:
+                data = self._load()
+            _claim_ids(_sequences(data), entries)
+            cached = self._cached()
+            stamped = []
+            for entry in entries:
+                self._seq += 1
+                stamped.append({'seq': self._seq, **entry})
+            try:
+                with open(self.journal, 'ab') as file:
+                    file.write(b''.join(serializer.dumps(entry) + b'\n' for entry in stamped))
+                    file.flush()
+                    os.fsync(file.fileno())
+            except BaseException:
+                self.invalidate()
+                raise
+            self._entries += len(entries)
+            if cached is not None:
+                self._apply(cached, stamped)
+                self._cache = (self._stamp(), cached)
+            else:
+                self.invalidate()
+        if self._entries >= self.max_journal_entries or os.path.getsize(self.journal) >= self.max_journal_bytes:
+            self._schedule_compaction()
+
+    def _schedule_compaction(self) -> None:
+        if not self.background:
+            self.compact()
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, name='journal-compactor', daemon=True)
+        self._compactor.start()
+
+    # Fold the journal into a fresh snapshot; the seq stored in it makes a crash halfway harmless
+    def compact(self) -> None:
+        with self._file_lock.exclusive(), self._lock:
+            self._snapshot(self._load())
+
+    def insert_many(self, listName: str, records: List[dict]) -> None:
+        self._append([{'op': 'insert', 'list': listName, 'record': record} for record in records])
+
+    @_exclusive
+    def update_many(self, listName: str, records: List[dict]) -> int:
+        index = self._positions(listName)[1]
+        found = [record for record in records if record.get('id') in index]
+        self._append([{'op': 'update', 'list': listName, 'record': record} for record in found])
+        return len(found)
+
+    @_exclusive
+    def delete_many(self, listName: str, record_ids: List[int]) -> List[int]:
+        index = self._positions(listName)[1]
+        found = list(dict.fromkeys(record_id for record_id in record_ids if record_id in index))
+        self._append([{'op': 'delete', 'list': listName, 'id': record_id} for record_id in found])
+        return found
+
+    # Changes are already journal entries, so a batch is one append
+    def apply(self, ops: List[dict]) -> None:
+        self._append(ops)
+
+
+# expenses and income in one JSON file per YYYY-MM plus a small manifest; the other lists share one file:
+#   directory/
+#     manifest.json          per-month count and id range of each partition, and the id sequences
+#     other.json             budget, subscriptions, goals, recurring lists, assets, liabilities
+#     expenses/2024-03.json  one month of expenses (income/ likewise)
+class PartitionedStorage():
+    def __init__(self, directory: str = 'data') -> None:
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self.other_path = os.path.join(directory, 'other.json')
+        os.makedirs(directory, exist_ok=True)
+        # path -> [stamp, parsed content, id -> position or None] for every file read so far
+        self._files: Dict[str, list] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # One lock for the whole directory: the manifest and its partitions change together
+        self._file_lock = FileLock(os.path.join(directory, '.lock'))
+
+    def invalidate(self) -> None:
+        self._files = {}
+
+    def cache_stats(self) -> Dict[str, int]:
+        return {'hits': self.cache_hits, 'misses': self.cache_misses}
+
+    def lock_stats(self) -> Dict[str, float]:
+        return self._file_lock.stats()
+
+    def _part_path(self, listName: str, month: str) -> str:
+        return os.path.join(self.directory, listName, f'{month}.json')
+
+    # Parsed content of one file, re-read only when its stamp changed (a missing file stays its default)
+    def _read(self, path: str, default: Callable[[], Any]) -> Any:
+        stamp = _file_stamp(path)
+        cached = self._files.get(path)
+        if cached is not None and cached[0] == stamp:
+            self.cache_hits += 1
+            return cached[1]
+        self.cache_misses += 1
+        try:
+            with self._file_lock.shared(), open(path, 'rb') as file:
+                content = serializer.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            content = default()
+        self._files[path] = [stamp, content, None]
+        return content
+
+    def _write(self, path: str, content: Any) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _atomic_write_json(path, content)
+        self._files[path] = [_file_stamp(path), content, None]
+
+    def _manifest(self) -> Dict[str, Any]:
+        manifest = self._read(self.manifest_path, dict)
+        partitions = manifest.setdefault('partitions', {})
+        for name in PARTITIONED_LISTS:
+            partitions.setdefault(name, {})
+        _sequences(manifest)
+        return manifest
+
+    def _other(self) -> Dict[str, List[dict]]:
+        other = self._read(self.other_path, dict)
+        for name in LIST_NAMES:
+            if name not in PARTITIONED_LISTS:
+                other.setdefault(name, [])
+        return other
+
+    def _part(self, listName: str, month: str) -> List[dict]:
+        return self._read(self._part_path(listName, month), list)
+
+    def _part_positions(self, listName: str, month: str) -> Dict[Any, int]:
+        self._part(listName, month)
+        entry = self._files[self._part_path(listName, month)]
+        if entry[2] is None:
+            entry[2] = _index_ids(entry[1])
+        return entry[2]
+
+    # Partition keys of a list, oldest month first and undated last
+    def _months(self, listName: str) -> List[str]:
+        return sorted(self._manifest()['partitions'][listName], key=lambda month: (month == UNDATED, month))
+
+    # (month, position) of a record, looking only in partitions whose id range covers it
+    def _locate(self, listName: str, record_id: Any) -> Optional[tuple]:
+        if not isinstance(record_id, (int, float)):
+            return None
+        for month, entry in self._manifest()['partitions'][listName].items():
+            if entry['min_id'] is None or not entry['min_id'] <= record_id <= entry['max_id']:
+                continue
+            position = self._part_positions(listName, month).get(record_id)
+            if position is not None:
+                return month, position
+        return None
+
+    # Whole document, assembled from every partition
+    @_shared
+    def load(self) -> Dict[str, Any]:
+        data = {name: self.records(name) for name in LIST_NAMES}
+        data[SEQUENCE_KEY] = dict(self._manifest()[SEQUENCE_KEY])
+        return normalize_document(data)
+
+    # Split a whole document into partitions, rewriting only the ones whose records changed
+    @_exclusive
+    def save(self, data: Dict[str, Any]) -> None:
+        data = normalize_document(data)
+        manifest = self._manifest()
+        try:
+            for name in PARTITIONED_LISTS:
+                groups: Dict[str, List[dict]] = {}
+                for record in data[name]:
+                    groups.setdefault(_partition_key(record, DATE_FIELDS[name]), []).append(record)
+                partitions = manifest['partitions'][name]
+                for month in set(partitions) - set(groups):
+                    path = self._part_path(name, month)
+                    if os.path.exists(path):
+                        os.remove(path)
+                    self._files.pop(path, None)
+                    del partitions[month]
+                for month, records in groups.items():
+                    if month in partitions and self._part(name, month) == records:
+                        continue
+                    self._write(self._part_path(name, month), records)
+                    partitions[month] = _partition_entry(records, name)
+            self._write(self.other_path, {name: data[name] for name in LIST_NAMES if name not in PARTITIONED_LISTS})
+            manifest[SEQUENCE_KEY] = dict(data[SEQUENCE_KEY])
+            self._write(self.manifest_path, manifest)
+        except BaseException:
+            self.invalidate()
+            raise
+
+    def records(self, listName: str) -> List[dict]:
+        return _copy_records(self._records(listName))
+
+    # The cached records themselves, for reads inside this class
+    @_shared
+    def _records(self, listName: str) -> List[dict]:
+        if listName not in PARTITIONED_LISTS:
+            return list(self._other().get(listName, []))
+        return [record for month in self._months(listName) for record in self._part(listName, month)]
+
+    # One month in memory at a time; partitions read here are not cached
+    def iter_records(self, listName: str) -> Iterator[dict]:
+        if listName not in PARTITIONED_LISTS:
+            yield from self.records(listName)
+            return
+        for month in self._months(listName):
+            path = self._part_path(listName, month)
+            cached = self._files.get(path)
+            if cached is not None and cached[0] == _file_stamp(path):
+                yield from map(_copy_record, cached[1])
+                continue
+            try:
+                with self._file_lock.shared(), open(path, 'rb') as file:
+                    records = serializer.load(file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            yield from records
+
+    @_shared
+    def get(self, listName: str, record_id: int) -> Optional[dict]:
+        if listName not in PARTITIONED_LISTS:
+            return _copy_record(next((record for record in self._other().get(listName, []) if record.get('id') == record_id), None))
+        location = self._locate(listName, record_id)
+        return None if location is None else _copy_record(self._part(listName, location[0])[location[1]])
+
+    def count(self, listName: str) -> int:
+        if listName not in PARTITIONED_LISTS:
+            return len(self._other().get(listName, []))
+        return sum(entry['count'] for entry in self._manifest()['partitions'][listName].values())
+
+    def next_id(self, listName: str) -> int:
+        return self._manifest()[SEQUENCE_KEY].get(listName, 0) + 1
+
+    # Only the partitions inside the months the query's predicate allows are opened
+    @_shared
+    def query(self, query: Query) -> List[dict]:
+        listName = query.listName
+        dateField = DATE_FIELDS.get(listName)
+        if listName not in PARTITIONED_LISTS:
+            return _copy_records(execute(query, self._records(listName), dateField))
+        spans = None if query.where is None else query.where.months(dateField)
+        months = [month for month in self._months(listName) if spans is None or (month != UNDATED and month_in(month, spans))]
+        return _copy_records(execute(query, [record for month in months for record in self._part(listName, month)], dateField))
+
+    def select(self, listName: str, filters: Dict[str, Any]) -> List[dict]:
+        return self.query(_filter_query(listName, filters))
+
+    # With a month, the view holds just that partition
+    @_shared
+    def columns(self, listName: str, month: Optional[str] = None) -> Any:
+        from CLI.core.columns import Columns
+        if month is not None and listName in PARTITIONED_LISTS:
+            return Columns(listName, self._part(listName, month))
+        return Columns(listName, self._records(listName))
+
+    # Assembled from the manifest alone; only a partition written before rollups existed is opened
+    @_shared
+    def rollup(self, listName: str) -> Dict[str, Any]:
+        result = rollup.empty()
+        for month, entry in self._manifest()['partitions'][listName].items():
+            totals = entry.get('totals')
+            if totals is None:
+                totals = rollup.build(listName, self._part(listName, month))['months'].get(month, {})
+            if totals:
+                result['months'][month] = totals
+            result['rows'] += entry['count']
+        return result
+
+    def insert(self, listName: str, record: dict) -> None:
+        self.insert_many(listName, [record])
+
+    def insert_many(self, listName: str, records: List[dict]) -> None:
+        self.apply([{'op': 'insert', 'list': listName, 'record': record} for record in records])
+
+    def update(self, listName: str, record: dict) -> bool:
+        return self.update_many(listName, [record]) > 0
+
+    @_exclusive
+    def update_many(self, listName: str, records: List[dict]) -> int:
+        found = [record for record in records if self.get(listName, record.get('id')) is not None]
+        self.apply([{'op': 'update', 'list': listName, 'record': record} for record in found])
+        return len(found)
+
+    def delete(self, listName: str, record_id: int) -> bool:
+        return len(self.delete_many(listName, [record_id])) > 0
+
+    @_exclusive
+    def delete_many(self, listName: str, record_ids: List[int]) -> List[int]:
+        found = [record_id for record_id in dict.fromkeys(record_ids) if self.get(listName, record_id) is not None]
+        self.apply([{'op': 'delete', 'list': listName, 'id': record_id} for record_id in found])
+        return found
+
+    # Apply row-level changes, then write each touched partition once, other.json if needed, and the manifest
+    @_exclusive
+    def apply(self, ops: List[dict]) -> None:
+        if not ops:
+            return
+        manifest = self._manifest()
+        _claim_ids(manifest[SEQUENCE_KEY], ops)
+        otherOps = []
+        touched: Dict[tuple, None] = {}
+        try:
+            for entry in ops:
+                listName = entry['list']
+                if listName not in PARTITIONED_LISTS:
+                    otherOps.append(entry)
+                    continue
+                partitions = manifest['partitions'][listName]
+                record = entry.get('record')
+                if entry['op'] != 'insert':
+                    location = self._locate(listName, entry['id'] if entry['op'] == 'delete' else record.get('id'))
+                    if location is None:
+                        continue
+                    month, position = location
+                    touched[(listName, month)] = None
+                    if entry['op'] == 'update' and _partition_key(record, DATE_FIELDS[listName]) == month:
+                        self._part(listName, month)[position] = record
+                        continue
+                    # Deleted, or moved to another month: leave a hole that is dropped before writing
+                    old = self._part(listName, month)
+                    self._part_positions(listName, month).pop(old[position].get('id'), None)
+                    old[position] = None
+                    partitions[month]['count'] -= 1
+                    if entry['op'] == 'delete':
+                        continue
+                month = _partition_key(record, DATE_FIELDS[listName])
+                records = self._part(listName, month)
+                records.append(record)
+                self._part_positions(listName, month).setdefault(record.get('id'), len(records) - 1)
+                _widen_partition(partitions, month, record.get('id'))
+                _bump_sequence(manifest, listName, [record])
+                touched[(listName, month)] = None
+            if otherOps:
+                other = self._other()
+                # apply_ops keeps the sequences up to date, so hand it the manifest's
+                work = {**other, SEQUENCE_KEY: manifest[SEQUENCE_KEY]}
+                apply_ops(work, otherOps)
+                self._write(self.other_path, {name: work[name] for name in other})
+            for listName, month in touched:
+                records = [record for record in self._part(listName, month) if record is not None]
+                path = self._part_path(listName, month)
+                if records:
+                    self._write(path, records)
+                    manifest['partitions'][listName][month] = _partition_entry(records, listName)
+                else:
+                    if os.path.exists(path):
+                        os.remove(path)
+                    self._files.pop(path, None)
+                    manifest['partitions'][listName].pop(month, None)
+            self._write(self.manifest_path, manifest)
+        except BaseException:
+            # Cached partitions may hold changes that never reached the disk
+            self.invalidate()
+            raise
+
+
+# One table per list; each row keeps the record as JSON plus indexed id/date/category columns
+class SqliteStorage():
+    def __init__(self, filename: str = 'data.db') -> None:
+        self.filename = filename
+        with closing(self._connect()) as conn, conn:
+            for name in LIST_NAMES:
+                conn.execute(f'CREATE TABLE IF NOT EXISTS {name} (seq INTEGER PRIMARY KEY, id INTEGER, date TEXT, category TEXT, record TEXT NOT NULL)')
+                conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_id ON {name}(id)')
+                conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_date ON {name}(date)')
+                conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_category ON {name}(category)')
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {SEQUENCE_KEY} (list TEXT PRIMARY KEY, last_id INTEGER NOT NULL)')
+            self._create_rollups(conn)
+
+    # Month x category totals kept by triggers, so every write path (including plain SQL) keeps them
+    # current; a database from before the table gets it filled from its rows once
+    @staticmethod
+    def _create_rollups(conn: sqlite3.Connection) -> None:
+        table = rollup.ROLLUP_KEY
+        existed = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (list TEXT, month TEXT, category TEXT, currency TEXT, '
+                     'cents INTEGER NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (list, month, category, currency))')
+        for name in rollup.ROLLUP_FIELDS:
+            add = (f"INSERT INTO {table} (list, month, category, currency, cents, count) VALUES ('{name}', {', '.join(_rollup_cell(name, 'NEW'))}, 1) "
+                   'ON CONFLICT(list, month, category, currency) DO UPDATE SET cents = cents + excluded.cents, count = count + 1;')
+            month, category, currency, cents = _rollup_cell(name, 'OLD')
+            remove = (f'UPDATE {table} SET cents = cents - {cents}, count = count - 1 '
+                      f"WHERE list = '{name}' AND month = {month} AND category = {category} AND currency = {currency}; "
+                      f"DELETE FROM {table} WHERE list = '{name}' AND count <= 0;")
+            conn.execute(f'CREATE TRIGGER IF NOT EXISTS {name}_rollup_insert AFTER INSERT ON {name} BEGIN {add} END')
+            conn.execute(f'CREATE TRIGGER IF NOT EXISTS {name}_rollup_update AFTER UPDATE ON {name} BEGIN {remove} {add} END')
+            conn.execute(f'CREATE TRIGGER IF NOT EXISTS {name}_rollup_delete AFTER DELETE ON {name} BEGIN {remove} END')
+            if not existed:
+                month, category, currency, cents = _rollup_cell(name, name)
+                conn.execute(f"INSERT INTO {table} (list, month, category, currency, cents, count) "
+                             f"SELECT '{name}', {month}, {category}, {currency}, SUM({cents}), COUNT(*) FROM {name} GROUP BY 2, 3, 4")
+
+    # SQLite reads rows on demand, so there is no document cache to manage
+    def invalidate(self) -> None:
+        pass
+
+    def cache_stats(self) -> Dict[str, int]:
+        return {'hits': 0, 'misses': 0}
+
+    # SQLite does its own locking
+    def lock_stats(self) -> Dict[str, float]:
+        return {'acquired': 0, 'contended': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+
+    # Streamlit reruns the script on different threads, so connect per operation
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.filename)
+
+    @staticmethod
+    def _row(listName: str, record: dict) -> tuple:
+        date = record.get(DATE_FIELDS.get(listName, ''), None)
+        category = record.get(CATEGORY_FIELDS[listName], None)
+        return (record.get('id'), None if date is None else str(date), None if category is None else str(category), serializer.dumps(record).decode())
+
+    # Raise a list's sequence to the largest id among the inserted records
+    @staticmethod
+    def _bump_sequence(conn: sqlite3.Connection, listName: str, records: List[dict]) -> None:
+        conn.execute(f'INSERT INTO {SEQUENCE_KEY} (list, last_id) VALUES (?, ?) '
+                     'ON CONFLICT(list) DO UPDATE SET last_id = MAX(last_id, excluded.last_id)', (listName, _max_id(records)))
+
+    def load(self) -> Dict[str, Any]:
+        with closing(self._connect()) as conn:
+            data = {name: [serializer.loads(row[0]) for row in conn.execute(f'SELECT record FROM {name} ORDER BY seq')] for name in LIST_NAMES}
+            data[SEQUENCE_KEY] = dict(conn.execute(f'SELECT list, last_id FROM {SEQUENCE_KEY}').fetchall())
+        return normalize_document(data)
+
+    # Replace every table (and the id sequences) with the given document in one transaction
+    def save(self, data: Dict[str, Any]) -> None:
+        data = normalize_document(data)
+        with closing(self._connect()) as conn, conn:
+            for name in LIST_NAMES:
+                conn.execute(f'DELETE FROM {name}')
+                conn.executemany(f'INSERT INTO {name} (id, date, category, record) VALUES (?,?,?,?)', [self._row(name, record) for record in data[name]])
+            conn.execute(f'DELETE FROM {SEQUENCE_KEY}')
+            conn.executemany(f'INSERT INTO {SEQUENCE_KEY} (list, last_id) VALUES (?, ?)', [(name, data[SEQUENCE_KEY][name]) for name in LIST_NAMES])
+
+    def records(self, listName: str) -> List[dict]:
+        _check_list(listName)
+        with closing(self._connect()) as conn:
+            return [serializer.loads(row[0]) for row in conn.execute(f'SELECT record FROM {listName} ORDER BY seq')]
+
+    # Rows are decoded as the cursor reaches them, so the list is never held whole
+    def iter_records(self, listName: str) -> Iterator[dict]:
+        _check_list(listName)
+        with closing(self._connect()) as conn:
+            for row in conn.execute(f'SELECT record FROM {listName} ORDER BY seq'):
+                yield serializer.loads(row[0])
+
+    def get(self, listName: str, record_id: int) -> Optional[dict]:
+        _check_list(listName)
+        with closing(self._connect()) as conn:
+            row = conn.execute(f'SELECT record FROM {listName} WHERE id = ? ORDER BY seq LIMIT 1', (record_id,)).fetchone()
+        return serializer.loads(row[0]) if row else None
+
+    def count(self, listName: str) -> int:
+        _check_list(listName)
+        with closing(self._connect()) as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM {listName}').fetchone()[0]
+
+    # SQL expression for a field and whether it is the date column; date, month and category use the column indexes
+    def _column(self, listName: str, field: str) -> tuple:
+        if field == 'month' or field == DATE_FIELDS.get(listName):
+            return ('date', True)
+        if field == CATEGORY_FIELDS[listName]:
+            return ('category', False)
+        if field == 'id':
+            return ('id', False)
+        # Field names are spliced into the JSON path, so only plain names are allowed
+        if field.isidentifier():
+            return (f"json_extract(record, '$.{field}')", False)
+        raise KeyError(field)
+
+    # The same query as JsonStorage.query, translated to one SELECT with ORDER BY / LIMIT / OFFSET
+    def query(self, query: Query) -> List[dict]:
+        listName = query.listName
+        _check_list(listName)
+        sql, params = f'SELECT record FROM {listName}', []
+        if query.where is not None:
+            clause, params = query.where.sql(lambda field: self._column(listName, field))
+            sql += f' WHERE {clause}'
+        if query.sort is None:
+            sql += ' ORDER BY seq'
+        else:
+            expr = 'substr(date, 1, 7)' if query.sort == 'month' else self._column(listName, query.sort)[0]
+            direction = 'DESC' if query.descending else 'ASC'
+            # Missing values last either way, then case-insensitive, ties by id (as execute() sorts)
+            sql += f' ORDER BY ({expr} IS NULL), {expr} COLLATE NOCASE {direction}, id {direction}'
+        if query.limit is not None or query.offset:
+            sql += ' LIMIT ? OFFSET ?'
+            params = params + [-1 if query.limit is None else query.limit, query.offset]
+        with closing(self._connect()) as conn:
+            return [serializer.loads(row[0]) for row in conn.execute(sql, params)]
+
+    def select(self, listName: str, filters: Dict[str, Any]) -> List[dict]:
+        return self.query(_filter_query(listName, filters))
+
+    # Read from the table the triggers keep; months x categories rows, never the records
+    def rollup(self, listName: str) -> Dict[str, Any]:
+        result = rollup.empty()
+        with closing(self._connect()) as conn:
+            for month, category, currency, cents, count in conn.execute(
+                    f'SELECT month, category, currency, cents, count FROM {rollup.ROLLUP_KEY} WHERE list = ?', (listName,)):
+                result['months'].setdefault(month, {}).setdefault(category, {})[currency] = [cents, count]
+                result['rows'] += count
+        return result
+
+    # Built from the table on every call; there is no document to tie a cached copy to.
+    # With a month only that month's rows are read
+    def columns(self, listName: str, month: Optional[str] = None) -> Any:
+        from CLI.core.columns import Columns
+        if month is None:
+            return Columns(listName, self.records(listName))
+        return Columns(listName, self.query(Query(listName, Eq('month', month))))
+
+    # Largest id a list has handed out; MAX(id) is answered from the id index and covers
+    # databases written before the sequences table
+    @staticmethod
+    def _top(conn: sqlite3.Connection, listName: str) -> int:
+        top = conn.execute(f'SELECT MAX(COALESCE((SELECT last_id FROM {SEQUENCE_KEY} WHERE list = ?), 0), '
+                           f'COALESCE((SELECT MAX(id) FROM {listName}), 0))', (listName,)).fetchone()[0]
+        return int(top)
+
+    def next_id(self, listName: str) -> int:
+        _check_list(listName)
+        with closing(self._connect()) as conn:
+            return self._top(conn, listName) + 1
+
+    def insert(self, listName: str, record: dict) -> None:
+        self.insert_many(listName, [record])
+
+    def insert_many(self, listName: str, records: List[dict]) -> None:
+        _check_list(listName)
+        self.apply([{'op': 'insert', 'list': listName, 'record': record} for record in records])
+
+    def update(self, listName: str, record: dict) -> bool:
+        return self.update_many(listName, [record]) > 0
+
+    def update_many(self, listName: str, records: List[dict]) -> int:
+        _check_list(listName)
+        updated = 0
+        with closing(self._connect()) as conn, conn:
+            for record in records:
+                record_id, date, category, body = self._row(listName, record)
+                updated += conn.execute(f'UPDATE {listName} SET date = ?, category = ?, record = ? WHERE id = ?', (date, category, body, record_id)).rowcount
+        return updated
+
+    def delete(self, listName: str, record_id: int) -> bool:
+        _check_list(listName)
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(f'DELETE FROM {listName} WHERE id = ?', (record_id,)).rowcount > 0
+
+    def delete_many(self, listName: str, record_ids: List[int]) -> List[int]:
+        _check_list(listName)
+        found = []
+        with closing(self._connect()) as conn, conn:
+            for record_id in dict.fromkeys(record_ids):
+                if conn.execute(f'DELETE FROM {listName} WHERE id = ?', (record_id,)).rowcount > 0:
+                    found.append(record_id)
+        return found
+
+    # Apply a list of row-level changes in one transaction; BEGIN IMMEDIATE takes the write lock
+    # before the sequences are read, so ids are claimed the same way as in the JSON backends
+    def apply(self, ops: List[dict]) -> None:
+        if not ops:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.execute('BEGIN IMMEDIATE')
+            inserted = {entry['list'] for entry in ops if entry['op'] == 'insert'}
+            for listName in inserted:
+                _check_list(listName)
+            _claim_ids({listName: self._top(conn, listName) for listName in inserted}, ops)
+            for entry in ops:
+                listName = entry['list']
+                _check_list(listName)
+                if entry['op'] == 'insert':
+                    conn.execute(f'INSERT INTO {listName} (id, date, category, record) VALUES (?,?,?,?)', self._row(listName, entry['record']))
+                    self._bump_sequence(conn, listName, [entry['record']])
+                elif entry['op'] == 'update':
+                    record_id, date, category, body = self._row(listName, entry['record'])
+                    conn.execute(f'UPDATE {listName} SET date = ?, category = ?, record = ? WHERE id = ?', (date, category, body, record_id))
+                elif entry['op'] == 'delete':
+                    conn.execute(f'DELETE FROM {listName} WHERE id = ?', (entry['id'],))
+
+
+# Working copy used by ExpenseTracker.batch(): changes stay in memory until commit()
+class BatchStorage():
+    def __init__(self, base: Any) -> None:
+        self.base = base
+        # Lists are read from the base the first time the batch touches them, so a batch that changes
+        # one list never reads the others (on SQLite or partitioned storage, their tables or files)
+        self.data: Dict[str, Any] = {}
+        self._sequences: Dict[str, int] = {}
+        # Lists the batch changed; everything else is still answered by the base
+        self._changed: set = set()
+        self.ops: List[dict] = []
+        self.replaced = False
+        self._positions: Dict[str, Dict[Any, int]] = {}
+        # Steps that take changes back, kept from the first savepoint() on
+        self._undo: Optional[List[Callable[[], None]]] = None
+
+    def _items(self, listName: str) -> List[dict]:
+        if listName not in self.data:
+            self.data[listName] = [] if self.replaced else self.base.records(listName)
+        return self.data[listName]
+
+    def _index(self, listName: str) -> Dict[Any, int]:
+        if listName not in self._positions:
+            self._positions[listName] = _index_ids(self._items(listName))
+        return self._positions[listName]
+
+    def _sequence(self, listName: str) -> int:
+        if listName not in self._sequences:
+            self._sequences[listName] = self.base.next_id(listName) - 1
+        return self._sequences[listName]
+
+    def _remember(self, step: Callable[[], None]) -> None:
+        if self._undo is not None:
+            self._undo.append(step)
+
+    # Mark the working copy; rollback_to() takes back everything done after it and keeps the rest
+    def savepoint(self) -> tuple:
+        if self._undo is None:
+            self._undo = []
+        return len(self._undo), len(self.ops), dict(self._sequences), set(self._changed)
+
+    def rollback_to(self, savepoint: tuple) -> None:
+        steps, ops, self._sequences, self._changed = savepoint
+        while len(self._undo) > steps:
+            self._undo.pop()()
+        del self.ops[ops:]
+        self._positions = {}
+
+    def invalidate(self) -> None:
+        self.base.invalidate()
+
+    def cache_stats(self) -> Dict[str, int]:
+        return self.base.cache_stats()
+
+    def lock_stats(self) -> Dict[str, float]:
+        return self.base.lock_stats()
+
+    # The whole document: the base's, with the lists, sequences and rollups the batch changed
+    def load(self) -> Dict[str, Any]:
+        data = dict(self.data) if self.replaced else {**self.base.load(), **self.data}
+        data[SEQUENCE_KEY] = {**data.get(SEQUENCE_KEY, {}), **self._sequences}
+        data[rollup.ROLLUP_KEY] = {**data.get(rollup.ROLLUP_KEY, {}),
+                                   **{name: rollup.build(name, self.data[name]) for name in self._changed if name in rollup.ROLLUP_FIELDS}}
+        return _copy_document(data)
+
+    # A whole-document save inside a batch replaces the working copy; commit() then saves it as is
+    def save(self, data: Dict[str, Any]) -> None:
+        previous = (self.data, self.ops, self.replaced)
+        self.data = normalize_document(data)
+        self._sequences = dict(self.data[SEQUENCE_KEY])
+        self._changed = set(LIST_NAMES)
+        self.ops = []
+        self.replaced = True
+        self._positions = {}
+        self._remember(lambda: self._restore(*previous))
+
+    def _restore(self, data: Dict[str, Any], ops: List[dict], replaced: bool) -> None:
+        self.data, self.ops, self.replaced = data, ops, replaced
+
+    def records(self, listName: str) -> List[dict]:
+        if listName not in self.data:
+            return self.base.records(listName)
+        return _copy_records(self.data[listName])
+
+    def iter_records(self, listName: str) -> Iterator[dict]:
+        if listName not in self.data:
+            return self.base.iter_records(listName)
+        return map(_copy_record, self.data[listName])
+
+    def get(self, listName: str, record_id: int) -> Optional[dict]:
+        if listName not in self._changed:
+            return self.base.get(listName, record_id)
+        position = self._index(listName).get(record_id)
+        return None if position is None else _copy_record(self._items(listName)[position])
+
+    def count(self, listName: str) -> int:
+        if listName not in self.data:
+            return self.base.count(listName)
+        return len(self.data[listName])
+
+    # An unchanged list is queried through the base (its indexes or SQL); a changed one is scanned
+    def query(self, query: Query) -> List[dict]:
+        if query.listName not in self._changed:
+            return self.base.query(query)
+        return _copy_records(execute(query, self._items(query.listName), DATE_FIELDS.get(query.listName)))
+
+    def select(self, listName: str, filters: Dict[str, Any]) -> List[dict]:
+        return self.query(_filter_query(listName, filters))
+
+    def columns(self, listName: str, month: Optional[str] = None) -> Any:
+        if listName not in self._changed:
+            return self.base.columns(listName, month)
+        from CLI.core.columns import Columns
+        return Columns(listName, self._items(listName))
+
+    # The base's rollup until the batch changes the list, then rebuilt from the working copy
+    def rollup(self, listName: str) -> Dict[str, Any]:
+        if listName not in self._changed:
+            return self.base.rollup(listName)
+        return rollup.build(listName, self._items(listName))
+
+    def next_id(self, listName: str) -> int:
+        return self._sequence(listName) + 1
+
+    def insert(self, listName: str, record: dict) -> None:
+        self.insert_many(listName, [record])
+
+    def insert_many(self, listName: str, records: List[dict]) -> None:
+        items = self._items(listName)
+        self._changed.add(listName)
+        size = len(items)
+        self._remember(lambda: items.__delitem__(slice(size, None)))
+        index = self._positions.get(listName)
+        for record in records:
+            items.append(record)
+            if index is not None:
+                index.setdefault(record.get('id'), len(items) - 1)
+            self.ops.append({'op': 'insert', 'list': listName, 'record': record})
+        top = _max_id(records)
+        if top > self._sequence(listName):
+            self._sequences[listName] = top
+
+    def update(self, listName: str, record: dict) -> bool:
+        return self.update_many(listName, [record]) > 0
+
+    def update_many(self, listName: str, records: List[dict]) -> int:
+        items = self._items(listName)
+        index = self._index(listName)
+        self._changed.add(listName)
+        updated = 0
+        for record in records:
+            position = index.get(record.get('id'))
+            if position is None:
+                continue
+            old, items[position] = items[position], record
+            self._remember(lambda position=position, old=old: items.__setitem__(position, old))
+            updated += 1
+            self.ops.append({'op': 'update', 'list': listName, 'record': record})
+        return updated
+
+    def delete(self, listName: str, record_id: int) -> bool:
+        return len(self.delete_many(listName, [record_id])) > 0
+
+    def delete_many(self, listName: str, record_ids: List[int]) -> List[int]:
+        index = self._index(listName)
+        found = list(dict.fromkeys(record_id for record_id in record_ids if record_id in index))
+        if not found:
+            return []
+        wanted = set(found)
+        old = self._items(listName)
+        self.data[listName] = [item for item in old if not (isinstance(item, dict) and item.get('id') in wanted)]
+        self._remember(lambda: self.data.__setitem__(listName, old))
+        self._changed.add(listName)
+        self._positions.pop(listName, None)
+        self.ops.extend({'op': 'delete', 'list': listName, 'id': record_id} for record_id in found)
+        return found
+
+    def apply(self, ops: List[dict]) -> None:
+        for entry in ops:
+            if entry['op'] == 'delete':
+                self.delete(entry['list'], entry['id'])
+            elif entry['op'] == 'update':
+                self.update(entry['list'], entry['record'])
+            else:
+                self.insert(entry['list'], entry['record'])
+
+    # Write everything to the base storage in one go
+    def commit(self) -> None:
+        if self.replaced:
+            self.base.save({**self.data, SEQUENCE_KEY: dict(self._sequences)})
+        else:
+            self.base.apply(self.ops)
+
+
+# Pick the storage backend: 'json', 'journal' or 'sqlite', or from the file name when kind is None
+def open_storage(filename: str, kind: Optional[str] = None) -> Any:
+    if kind is None:
+        if filename.endswith(('/', os.sep)) or os.path.isdir(filename):
+            kind = 'partitioned'
+        else:
+            kind = 'sqlite' if filename.lower().endswith(SQLITE_EXTENSIONS) else 'json'
+    if kind == 'partitioned':
+        return PartitionedStorage(filename.rstrip('/' + os.sep) or filename)
+    if kind == 'sqlite':
+        return SqliteStorage(filename)
+    if kind == 'journal':
+        return JournalStorage(filename)
+    if kind == 'json':
+        return JsonStorage(filename)
+    raise ValueError(f'Unknown storage kind: {kind}')
+
+
+# One-shot copy of an existing data.json into another backend (picked from dest unless kind is given)
+def migrate_json(json_path: str, dest: str, kind: Optional[str] = None) -> Dict[str, Any]:
+    if not os.path.exists(json_path):
+        return {'success': False, 'message': f'{json_path} not found'}
+    try:
+        with open(json_path, 'rb') as file:
+            data = normalize_document(serializer.load(file))
+    except json.JSONDecodeError as e:
+        return {'success': False, 'message': f'{json_path} is not valid JSON: {e}'}
+    open_storage(dest, kind).save(data)
+    total = sum(len(data[name]) for name in LIST_NAMES)
+    return {'success': True, 'message': f'Migrated {total} records from {json_path} to {dest}'}
+
+
+def migrate_json_to_sqlite(json_path: str, db_path: str) -> Dict[str, Any]:
+    return migrate_json(json_path, db_path, 'sqlite')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    result = migrate_json(sys.argv[1], sys.argv[2])
+    print(result['message'])
+    sys.exit(0 if result['success'] else 1)
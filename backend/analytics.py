@@ -4,15 +4,25 @@ from datetime import date, datetime, timedelta
 from typing import Callable, Optional
 
 
-def forecast_spending(expenses: list, base_currency: str = 'USD') -> dict:
-    """Linear-trend forecast of monthly spend per category."""
+def forecast_spending(expenses: list, base_currency: str = 'USD', convert_fn: Optional[Callable] = None) -> dict:
+    """Linear-trend forecast of monthly spend per category.
+
+    Expenses in other currencies are skipped unless convert_fn(amount, from, to, date) is given,
+    in which case each is converted at its own date.
+    """
     monthly: dict = defaultdict(lambda: defaultdict(float))
     for e in expenses:
-        if e.get('currency', '').upper() != base_currency.upper():
-            continue
         try:
             month = e['date'][:7]
-            monthly[month][e.get('tags', 'Other')] += e['price']
+            price = e['price']
+            if e.get('currency', '').upper() != base_currency.upper():
+                if not convert_fn:
+                    continue
+                result = convert_fn(price, e.get('currency', ''), base_currency, e['date'])
+                if not result.get('success'):
+                    continue
+                price = result['rate']
+            monthly[month][e.get('tags', 'Other')] += price
         except (KeyError, TypeError):
             continue
 
@@ -131,13 +141,17 @@ def net_worth_snapshot(
     convert_fn: Optional[Callable] = None,
     base_currency: str = 'USD',
 ) -> dict:
-    """Aggregate net-worth across all data sources, optionally converting currencies."""
+    """Aggregate net-worth across all data sources, optionally converting currencies.
 
-    def to_base(amount: float, currency: str) -> float:
+    convert_fn(amount, from, to) is also passed the record's date for income and expenses,
+    so those convert at the rate of the day they happened.
+    """
+
+    def to_base(amount: float, currency: str, on: Optional[str] = None) -> float:
         if not currency or currency.upper() == base_currency.upper():
             return amount
         if convert_fn:
-            result = convert_fn(amount, currency, base_currency)
+            result = convert_fn(amount, currency, base_currency, on) if on else convert_fn(amount, currency, base_currency)
             if result.get('success'):
                 return result['rate']
         return amount
@@ -149,8 +163,8 @@ def net_worth_snapshot(
     assets = data.get('assets', [])
     liabilities = data.get('liabilities', [])
 
-    total_income = sum(to_base(i['amount'], i.get('currency', base_currency)) for i in income)
-    total_expenses = sum(to_base(e['price'], e.get('currency', base_currency)) for e in expenses)
+    total_income = sum(to_base(i['amount'], i.get('currency', base_currency), i.get('date')) for i in income)
+    total_expenses = sum(to_base(e['price'], e.get('currency', base_currency), e.get('date')) for e in expenses)
     monthly_sub_burden = sum(
         to_base(float(s['price']), s.get('currency', base_currency)) for s in subscriptions
     )
@@ -350,16 +364,26 @@ def goal_progress(goals: list) -> dict:
     return {'success': True, 'goals': results}
 
 
-def spending_by_category(expenses: list, month: Optional[str] = None) -> dict:
-    """Aggregate expenses by category, optionally filtered to a single month (YYYY-MM)."""
+def spending_by_category(expenses: list, month: Optional[str] = None, rollup=None) -> dict:
+    """Aggregate expenses by category, optionally filtered to a single month (YYYY-MM).
+
+    Pass the tracker's expense rollup (tracker.rollup('expenses')) to read the totals from it
+    instead of scanning expenses.
+    """
     totals: dict = defaultdict(float)
     counts: dict = defaultdict(int)
-    for e in expenses:
-        if month and not e.get('date', '').startswith(month):
-            continue
-        cat = e.get('tags', 'Other')
-        totals[cat] += e.get('price', 0)
-        counts[cat] += 1
+    if rollup is not None:
+        for cat, total in rollup.by_category(month=month or None).items():
+            totals[cat or 'Other'] += total
+        for cat, count in rollup.counts_by_category(month=month or None).items():
+            counts[cat or 'Other'] += count
+    else:
+        for e in expenses:
+            if month and not e.get('date', '').startswith(month):
+                continue
+            cat = e.get('tags', 'Other')
+            totals[cat] += e.get('price', 0)
+            counts[cat] += 1
     grand_total = sum(totals.values())
     result = []
     for cat in sorted(totals, key=lambda c: totals[c], reverse=True):
@@ -409,14 +433,20 @@ def savings_rate_history(expenses: list, income: list) -> dict:
     return {'success': True, 'history': history}
 
 
-def budget_utilization(expenses: list, budget: list, month: Optional[str] = None) -> dict:
-    """Return per-category budget utilization for a given month."""
+def budget_utilization(expenses: list, budget: list, month: Optional[str] = None, rollup=None) -> dict:
+    """Return per-category budget utilization for a given month.
+
+    With the tracker's expense rollup the month's spend comes from it and expenses is not read.
+    """
     if month is None:
         month = date.today().strftime('%Y-%m')
     spent: dict = defaultdict(float)
-    for e in expenses:
-        if e.get('date', '')[:7] == month:
-            spent[e.get('tags', 'Other')] += e.get('price', 0)
+    if rollup is not None:
+        spent.update(rollup.by_category(month=month))
+    else:
+        for e in expenses:
+            if e.get('date', '')[:7] == month:
+                spent[e.get('tags', 'Other')] += e.get('price', 0)
     result = []
     for b in budget:
         cat = b.get('category', '')
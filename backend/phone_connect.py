@@ -17,7 +17,7 @@ Bot commands (same on both platforms):
   /balance — quick income vs expense balance
 """
 import argparse
-import json
+import heapq
 import logging
 import os
 import sys
@@ -38,7 +38,7 @@ except ImportError:
     except ImportError:
         tomllib = None  # type: ignore[assignment]
 
-from CLI.core.core_stuff import ExpenseTracker
+from CLI.core.core_stuff import ExpenseTracker, load_config
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s  %(levelname)s  %(message)s")
 log = logging.getLogger(__name__)
@@ -55,13 +55,7 @@ def _load_toml_config() -> dict:
 
 def _load_bot_config() -> dict:
     """Load runtime config saved by the Streamlit UI."""
-    path = _ROOT / ".bot_config.json"
-    if path.exists():
-        try:
-            return json.loads(path.read_text())
-        except Exception:
-            pass
-    return {}
+    return load_config(str(_ROOT / ".bot_config.json"))
 
 
 def _get_token(platform: str) -> str:
@@ -91,15 +85,12 @@ def _get_data_file() -> str:
 # ── Shared command logic ───────────────────────────────────────────────────────
 
 def _summary_text(tracker: ExpenseTracker) -> str:
-    data = tracker.open_file()["data"]
-    expenses = data.get("expenses", [])
-    income = data.get("income", [])
-
-    total_exp = sum(e.get("price", 0) for e in expenses)
-    total_inc = sum(i.get("amount", 0) for i in income)
+    # Totals come from the stored rollups (no NumPy, no pass over the records)
+    total_exp = tracker.rollup("expenses").total()
+    total_inc = tracker.rollup("income").total()
     balance = total_inc - total_exp
 
-    recent = sorted(expenses, key=lambda x: x.get("date", ""), reverse=True)[:5]
+    recent = heapq.nlargest(5, tracker.iter_records("expenses"), key=lambda x: x.get("date", ""))
     lines = [
         f"  • {e.get('purchased','?')} — {e.get('price',0):.2f} {e.get('currency','').upper()} [{e.get('tags','?')}]"
         for e in recent
@@ -116,13 +107,10 @@ def _summary_text(tracker: ExpenseTracker) -> str:
 
 
 def _balance_text(tracker: ExpenseTracker) -> str:
-    data = tracker.open_file()["data"]
-    expenses = data.get("expenses", [])
-    income = data.get("income", [])
     current_month = datetime.now().strftime("%Y-%m")
 
-    month_exp = sum(e.get("price", 0) for e in expenses if e.get("date", "").startswith(current_month))
-    month_inc = sum(i.get("amount", 0) for i in income if i.get("date", "").startswith(current_month))
+    month_exp = tracker.rollup("expenses").total(month=current_month)
+    month_inc = tracker.rollup("income").total(month=current_month)
 
     return (
         f"💳 This Month ({current_month})\n"
@@ -133,19 +121,13 @@ def _balance_text(tracker: ExpenseTracker) -> str:
 
 
 def _budget_text(tracker: ExpenseTracker) -> str:
-    data = tracker.open_file()["data"]
-    budgets = data.get("budget", [])
-    expenses = data.get("expenses", [])
+    budgets = tracker.view_all_budget().get("data", [])
 
     if not budgets:
         return "ℹ️ No budgets set. Add budgets in the app first."
 
     current_month = datetime.now().strftime("%Y-%m")
-    month_exp = [e for e in expenses if e.get("date", "").startswith(current_month)]
-    cat_totals: dict = {}
-    for e in month_exp:
-        cat = e.get("tags", "Other")
-        cat_totals[cat] = cat_totals.get(cat, 0) + e.get("price", 0)
+    cat_totals = tracker.rollup("expenses").by_category(month=current_month)
 
     lines = [f"💼 Budget Status — {current_month}"]
     for b in budgets:
@@ -4,7 +4,6 @@ Uses st.navigation() so the entire app lives in this one file.
 Deploy this file (or the published/ directory) to Streamlit Cloud.
 """
 import datetime as _dt
-import json
 import os
 import sys
 
@@ -21,7 +20,7 @@ for _p in (_ROOT, _BACKEND, _HERE):
     if _p not in sys.path:
         sys.path.insert(0, _p)
 
-from CLI.core.core_stuff import ExpenseTracker  # noqa: E402
+from CLI.core.core_stuff import ExpenseTracker, load_config, save_config  # noqa: E402
 
 # ── Cloud endpoints ────────────────────────────────────────────────────────────
 CLOUD_BACKEND = "https://expense-backend-690527435721.us-central1.run.app"
@@ -123,11 +122,17 @@ def _api(endpoint: str, payload: dict, token: str = None, timeout: int = 30):
 
 
 def _export_json() -> bytes:
-    return json.dumps(_get_tracker().open_file()['data'], indent=2).encode()
+    return _get_tracker().export_json()
+
+
+# Bytes of an exported list (fmt: csv or pdf), None if the export failed; kept by the tracker until the
+# data changes, so a rerun doesn't export again
+def _export_bytes(listName: str, fmt: str):
+    return _get_tracker().export_bytes(listName, fmt)
 
 
 def _import_json(raw: bytes):
-    _get_tracker().write_file(json.loads(raw))
+    _get_tracker().import_json(raw)
     _sync()
 
 
@@ -146,16 +151,11 @@ def _cfg_path() -> str:
 
 
 def _load_cfg() -> dict:
-    p = _cfg_path()
-    try:
-        return json.loads(open(p).read()) if os.path.exists(p) else {}
-    except Exception:
-        return {}
+    return load_config(_cfg_path())
 
 
 def _save_cfg(cfg: dict):
-    with open(_cfg_path(), 'w') as f:
-        json.dump(cfg, f, indent=2)
+    save_config(_cfg_path(), cfg)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -516,13 +516,12 @@ def page_dashboard():
             st.divider()
         if not items:
             st.info('No expenses found.' if not search else f'No results for "{search}".')
-        t = _get_tracker()
-        res = t.export_to_csv('expenses','/tmp/pub_exp.csv')
-        if res['success']:
-            st.download_button('Export CSV', res['data'].to_csv(index=False).encode(),'expenses.csv','text/csv')
-        pdf = t.export_to_pdf('expenses','/tmp/pub_exp.pdf')
-        if pdf['success']:
-            st.download_button('Export PDF', pdf['data'],'expenses.pdf','application/pdf')
+        csv_bytes = _export_bytes('expenses','csv')
+        if csv_bytes is not None:
+            st.download_button('Export CSV', csv_bytes,'expenses.csv','text/csv')
+        pdf_bytes = _export_bytes('expenses','pdf')
+        if pdf_bytes is not None:
+            st.download_button('Export PDF', pdf_bytes,'expenses.pdf','application/pdf')
 
     # ── Income list ────────────────────────────────────────────────────────────
     with tab_inc:
@@ -540,10 +539,9 @@ def page_dashboard():
             st.divider()
         if not items:
             st.info('No income found.' if not search else f'No results for "{search}".')
-        t = _get_tracker()
-        res = t.export_to_csv('income','/tmp/pub_inc.csv')
-        if res['success']:
-            st.download_button('Export CSV', res['data'].to_csv(index=False).encode(),'income.csv','text/csv')
+        csv_bytes = _export_bytes('income','csv')
+        if csv_bytes is not None:
+            st.download_button('Export CSV', csv_bytes,'income.csv','text/csv')
 
     # ── Subscriptions ──────────────────────────────────────────────────────────
     with tab_sub:
@@ -679,11 +677,10 @@ def page_monthly():
 
     st.divider(); st.subheader('Export')
     c1,c2 = st.columns(2)
-    t = _get_tracker()
-    r = t.export_to_csv('expenses','/tmp/pub_ms.csv')
-    if r['success']: c1.download_button('Expenses CSV', r['data'].to_csv(index=False).encode(),'expenses.csv','text/csv')
-    r = t.export_to_pdf('expenses','/tmp/pub_ms.pdf')
-    if r['success']: c2.download_button('Expenses PDF', r['data'],'expenses.pdf','application/pdf')
+    csv_bytes = _export_bytes('expenses','csv')
+    if csv_bytes is not None: c1.download_button('Expenses CSV', csv_bytes,'expenses.csv','text/csv')
+    pdf_bytes = _export_bytes('expenses','pdf')
+    if pdf_bytes is not None: c2.download_button('Expenses PDF', pdf_bytes,'expenses.pdf','application/pdf')
 
 
 def page_recurring():
@@ -950,13 +947,13 @@ def page_email():
     c1,c2 = st.columns([1,5])
     with c1:
         if st.button('Import Selected', type='primary', disabled=not sel):
-            t = _get_tracker(); ok = 0
-            for idx in sel:
-                row = edited.iloc[idx]
-                res = t.add_expenses(float(row['price']),str(row['purchased']),str(row['tags']),
-                                     str(row['currency']).lower(),str(row['date']),
-                                     results[idx].get('notes','Imported from email'))
-                if res.get('success'): ok += 1
+            t = _get_tracker()
+            bulk = t.add_expenses_many([
+                {'price': float(edited.iloc[idx]['price']), 'purchased': str(edited.iloc[idx]['purchased']),
+                 'tags': str(edited.iloc[idx]['tags']), 'currency': str(edited.iloc[idx]['currency']).lower(),
+                 'date': str(edited.iloc[idx]['date']), 'notes': results[idx].get('notes','Imported from email')}
+                for idx in sel])
+            ok = sum(1 for item in bulk['data'] if item['success'])
             if ok:
                 st.success(f'Imported {ok} expense(s).', icon='✅')
                 _sync(); st.session_state.pop('email_results',None); st.rerun()
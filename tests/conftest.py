@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+# The modules import each other as CLI.core.*, from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CLI.core.storage import open_storage  # noqa: E402
+
+BACKENDS = ('json', 'journal', 'sqlite', 'partitioned')
+FILE_NAMES = {'json': 'data.json', 'journal': 'data.json', 'sqlite': 'data.db', 'partitioned': 'data'}
+
+
+def expense(id, price, date='2024-01-15', tags='food', currency='usd', purchased='shop'):
+    return {'id': id, 'price': price, 'purchased': purchased, 'tags': tags, 'currency': currency, 'date': date, 'notes': ''}
+
+
+def income(id, amount, date='2024-01-01', source='job', currency='usd'):
+    return {'id': id, 'amount': amount, 'source': source, 'currency': currency, 'date': date}
+
+
+@pytest.fixture(params=BACKENDS)
+def kind(request):
+    return request.param
+
+
+@pytest.fixture
+def data_path(tmp_path, kind):
+    return str(tmp_path / FILE_NAMES[kind])
+
+
+# A fresh backend of every kind; open it again with reopen() to check what reached the disk
+@pytest.fixture
+def storage(data_path, kind):
+    return open_storage(data_path, kind)
+
+
+@pytest.fixture
+def reopen(data_path, kind):
+    return lambda: open_storage(data_path, kind)
@@ -0,0 +1,103 @@
+import pytest
+
+from CLI.core.core_stuff import ExpenseTracker
+from CLI.core.storage import BatchStorage
+
+from conftest import expense
+
+
+# A storage that records every read of a whole list or document
+class Reads():
+    def __init__(self, base):
+        self.base = base
+        self.reads = []
+
+    def __getattr__(self, name):
+        method = getattr(self.base, name)
+        if name not in ('load', 'records', 'iter_records'):
+            return method
+
+        def read(*args):
+            self.reads.append((name,) + args)
+            return method(*args)
+        return read
+
+
+@pytest.fixture
+def tracker(data_path, storage):
+    return ExpenseTracker(data_path, storage=storage)
+
+
+def add(tracker, price, date='2024-01-15'):
+    assert tracker.add_expenses(price, 'shop', 'food', 'usd', date, '')['success']
+
+
+def prices(storage):
+    return sorted(record['price'] for record in storage.records('expenses'))
+
+
+def test_nothing_is_written_until_commit(tracker, reopen):
+    with tracker.batch():
+        add(tracker, 1)
+        add(tracker, 2)
+        assert prices(reopen()) == []
+        assert prices(tracker.storage) == [1, 2]
+    assert prices(reopen()) == [1, 2]
+
+
+def test_an_exception_rolls_the_block_back(tracker, reopen):
+    add(tracker, 1)
+    with pytest.raises(RuntimeError):
+        with tracker.batch():
+            add(tracker, 2)
+            raise RuntimeError('stop')
+    assert prices(tracker.storage) == [1]
+    assert prices(reopen()) == [1]
+
+
+def test_rolling_back_a_nested_batch_keeps_the_outer_one(tracker, reopen):
+    tracker.begin()
+    add(tracker, 1)
+    tracker.begin()
+    add(tracker, 2)
+    assert tracker.rollback()['success']
+    assert prices(tracker.storage) == [1]
+    tracker.begin()
+    add(tracker, 3)
+    assert tracker.commit()['message'] == 'Nested batch joined the outer batch'
+    assert prices(reopen()) == []
+    assert tracker.commit()['success']
+    assert prices(reopen()) == [1, 3]
+    assert tracker.commit()['success'] is False
+    assert tracker.rollback()['success'] is False
+
+
+def test_a_batch_reads_only_the_lists_it_changes(storage, reopen):
+    storage.insert_many('expenses', [expense(1, 5), expense(2, 6)])
+    storage.insert('budget', {'id': 1, 'category': 'food', 'amount': 100})
+    base = Reads(storage)
+    batch = BatchStorage(base)
+    batch.insert('expenses', expense(batch.next_id('expenses'), 7))
+    batch.update('expenses', expense(1, 50))
+    assert batch.count('budget') == 1
+    assert batch.get('budget', 1)['amount'] == 100
+    assert batch.rollup('income')['rows'] == 0
+    batch.commit()
+    assert base.reads == [('records', 'expenses')]
+    assert prices(reopen()) == [6, 7, 50]
+
+
+def test_rolling_back_to_a_savepoint_keeps_what_came_before(storage, reopen):
+    storage.insert_many('expenses', [expense(1, 5), expense(2, 6)])
+    batch = BatchStorage(storage)
+    batch.insert('expenses', expense(3, 7))
+    savepoint = batch.savepoint()
+    batch.insert('expenses', expense(4, 8))
+    batch.update('expenses', expense(1, 50))
+    batch.delete('expenses', 2)
+    batch.save({'expenses': [expense(9, 1)]})
+    batch.rollback_to(savepoint)
+    assert batch.next_id('expenses') == 4
+    assert prices(batch) == [5, 6, 7]
+    batch.commit()
+    assert prices(reopen()) == [5, 6, 7]
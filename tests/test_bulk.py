@@ -0,0 +1,68 @@
+import pytest
+
+from CLI.core.core_stuff import ExpenseTracker
+
+from conftest import expense
+
+
+# A storage that records every call that writes
+class Writes():
+    def __init__(self, base):
+        self.base = base
+        self.writes = []
+
+    def __getattr__(self, name):
+        method = getattr(self.base, name)
+        if name not in ('save', 'insert', 'insert_many', 'update', 'update_many', 'delete', 'delete_many'):
+            return method
+
+        def write(*args):
+            self.writes.append(name)
+            return method(*args)
+        return write
+
+
+@pytest.fixture
+def storage_writes(storage):
+    return Writes(storage)
+
+
+@pytest.fixture
+def tracker(data_path, storage_writes):
+    return ExpenseTracker(data_path, storage=storage_writes)
+
+
+def new(price, date='2024-01-15', **fields):
+    return {'price': price, 'purchased': 'shop', 'tags': 'food', 'currency': 'usd', 'date': date, 'notes': '', **fields}
+
+
+def test_many_expenses_are_added_in_one_write(tracker, storage_writes, reopen):
+    result = tracker.add_expenses_many([new(1), new('abc'), new(2, '2024-02-01'), new(None)])
+    assert result['success']
+    assert [row['success'] for row in result['data']] == [True, False, True, False]
+    assert [row['id'] for row in result['data'] if row['success']] == [1, 2]
+    assert storage_writes.writes == ['insert_many']
+    assert [(record['id'], record['price']) for record in reopen().records('expenses')] == [(1, 1), (2, 2)]
+    assert tracker.add_many('nothing', [new(1)])['success'] is False
+
+
+def test_many_edits_are_applied_in_one_write(tracker, storage, storage_writes, reopen):
+    storage.insert_many('expenses', [expense(1, 5), expense(2, 6), expense(3, 7)])
+    result = tracker.edit_many('expenses', [{'id': 1, 'price': 50}, {'id': 3, 'tags': 'fun'}, {'id': 9, 'price': 1},
+                                            {'id': 1, 'notes': 'twice'}])
+    assert [row['success'] for row in result['data']] == [True, True, False, True]
+    assert storage_writes.writes == ['update_many']
+    stored = {record['id']: record for record in reopen().records('expenses')}
+    assert (stored[1]['price'], stored[1]['notes']) == (50, 'twice')
+    assert (stored[2]['price'], stored[3]['tags']) == (6, 'fun')
+
+
+def test_many_deletes_are_made_in_one_write(tracker, storage, storage_writes, reopen):
+    storage.insert_many('expenses', [expense(1, 5), expense(2, 6), expense(3, 7)])
+    result = tracker.delete_many('expenses', [1, 3, 9])
+    assert result['success']
+    assert result['data'] == [{'success': True, 'id': 1}, {'success': True, 'id': 3},
+                              {'success': False, 'id': 9, 'message': 'Not found'}]
+    assert storage_writes.writes == ['delete_many']
+    assert [record['id'] for record in reopen().records('expenses')] == [2]
+    assert tracker.delete_many('expenses', [9])['success'] is False
@@ -0,0 +1,57 @@
+import pytest
+
+from CLI.core.query import Eq, Query
+from CLI.core.storage import BatchStorage, JournalStorage, JsonStorage
+
+from conftest import expense
+
+
+@pytest.fixture(params=[JsonStorage, JournalStorage])
+def backend(request, tmp_path):
+    return lambda: request.param(str(tmp_path / 'data.json'))
+
+
+def test_repeat_loads_are_served_from_the_cache(backend):
+    storage = backend()
+    storage.insert('expenses', expense(1, 5))
+    storage.load()
+    hits = storage.cache_stats()['hits']
+    storage.load()
+    storage.records('expenses')
+    assert storage.cache_stats()['hits'] == hits + 2
+
+
+def test_a_write_by_someone_else_is_seen(backend):
+    storage = backend()
+    storage.insert('expenses', expense(1, 5))
+    assert storage.count('expenses') == 1
+    backend().insert('expenses', expense(2, 6))
+    assert [record['id'] for record in storage.records('expenses')] == [1, 2]
+
+
+def test_changing_what_load_returns_leaves_the_cache_alone(backend):
+    storage = backend()
+    storage.insert('expenses', expense(1, 5))
+    data = storage.load()
+    data['expenses'].append(expense(2, 6))
+    data['income'] = None
+    storage.records('expenses').clear()
+    assert [record['id'] for record in storage.records('expenses')] == [1]
+    assert storage.load()['income'] == []
+    assert storage.get('expenses', 2) is None
+
+
+# Dashboard rows and view_* results get edited in place; none of that may reach the storage without a write
+def test_changing_a_returned_record_changes_nothing_stored(storage):
+    storage.insert_many('expenses', [expense(1, 5), expense(2, 6)])
+    batch = BatchStorage(storage)
+    for source in (storage, batch):
+        source.records('expenses')[0]['price'] = 99
+        source.get('expenses', 1)['price'] = 99
+        next(iter(source.iter_records('expenses')))['price'] = 99
+        source.load()['expenses'][0]['price'] = 99
+        source.query(Query('expenses', Eq('id', 1)))[0]['price'] = 99
+        assert [record['price'] for record in source.records('expenses')] == [5, 6]
+        assert source.get('expenses', 1)['price'] == 5
+    batch.commit()
+    assert storage.get('expenses', 1)['price'] == 5
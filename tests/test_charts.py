@@ -0,0 +1,55 @@
+import pytest
+
+from CLI.core import charts
+from CLI.core.core_stuff import ExpenseTracker
+from CLI.core.storage import JsonStorage
+
+from conftest import expense
+
+pytest.importorskip('matplotlib')
+
+
+def test_small_totals_are_folded_into_other():
+    assert charts.top({'a': 5, 'b': 1, 'c': 3, 'd': 0.5}, 2) == {'a': 5, 'c': 3, charts.OTHER: 1.5}
+    assert charts.top({'a': 5}, 2) == {'a': 5}
+
+
+def test_equal_numbers_are_drawn_once():
+    cache = charts.ChartCache(max_entries=2)
+    first = charts.render('bar', {'expenses': {'food': 5, 'fun': 2.5}}, 'Expenses', cache=cache)
+    assert first.startswith(b'\x89PNG')
+    # The same values passed as other types hash the same
+    assert charts.render('bar', {'expenses': {'food': 5.0, 'fun': 2.50}}, 'Expenses', cache=cache) is first
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1}
+    charts.render('pie', {'expenses': {'food': 5}}, cache=cache)
+    charts.render('line', {'a': {'2024-01': 1}, 'b': {'2024-02': 2}}, fmt='svg', cache=cache)
+    # The least recently used chart went to make room
+    assert cache.stats()['entries'] == 2
+    charts.render('bar', {'expenses': {'food': 5, 'fun': 2.5}}, 'Expenses', cache=cache)
+    assert cache.stats()['misses'] == 4
+
+
+def test_bad_charts_are_refused():
+    with pytest.raises(ValueError):
+        charts.render('donut', {'a': {'x': 1}})
+    with pytest.raises(ValueError):
+        charts.render('bar', {'a': {'x': 1}}, fmt='gif')
+    with pytest.raises(ValueError):
+        charts.render('bar', {'a': {}})
+
+
+def test_tracker_charts_are_cached_until_the_totals_change(tmp_path, monkeypatch):
+    cache = charts.ChartCache()
+    monkeypatch.setattr(charts, 'CACHE', cache)
+    path = str(tmp_path / 'data.json')
+    tracker = ExpenseTracker(path, storage=JsonStorage(path))
+    tracker.storage.insert_many('expenses', [expense(1, 5), expense(2, 6, '2024-02-01', 'fun')])
+    image = tracker.create_graphs('expenses', 'pie')['data']
+    assert tracker.create_graphs('expenses', 'pie')['data'] is image
+    tracker.create_graphs('expenses', 'bar', group_by='month', filename=str(tmp_path / 'chart.png'))
+    assert (tmp_path / 'chart.png').read_bytes().startswith(b'\x89PNG')
+    tracker.add_expenses(1, 'shop', 'food', 'usd', '2024-01-20', '')
+    assert tracker.create_graphs('expenses', 'pie')['data'] is not image
+    assert cache.stats() == {'entries': 3, 'hits': 1, 'misses': 3}
+    assert tracker.create_graphs('income', 'pie')['success'] is False
+    assert tracker.create_graphs('expenses', 'donut')['success'] is False
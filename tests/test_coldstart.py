@@ -0,0 +1,34 @@
+import pytest
+
+from CLI.core import coldstart
+
+SAMPLE = '''import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        900 |     numpy.core
+import time:       200 |       1100 |   numpy
+import time:        50 |       1270 | CLI.core.core_stuff
+'''
+
+
+def test_importtime_lines_are_parsed():
+    assert coldstart._parse(SAMPLE) == [('_io', 120, 1), ('numpy.core', 900, 2), ('numpy', 1100, 1),
+                                        ('CLI.core.core_stuff', 1270, 0)]
+
+
+# The guard the cold-start check runs, one entry point at a time; entry points whose own packages
+# (rich, questionary, ...) aren't installed here are skipped like the check does
+@pytest.fixture(scope='module')
+def startup():
+    return coldstart._startup()
+
+
+@pytest.mark.parametrize('name', list(coldstart.ENTRY_POINTS))
+def test_each_entry_point_starts_within_budget_without_heavy_packages(name, startup):
+    statement, budget = coldstart.ENTRY_POINTS[name]
+    result = coldstart.measure(statement, runs=3, startup=startup)
+    if 'error' in result:
+        if 'ModuleNotFoundError' in result['error'] and 'CLI' not in result['error']:
+            pytest.skip(result['error'])
+        pytest.fail(result['error'])
+    assert result['heavy'] == []
+    assert result['ms'] < budget
@@ -0,0 +1,46 @@
+import pytest
+
+from CLI.core.columns import Columns, running_balance, total_of
+from CLI.core.core_stuff import ExpenseTracker
+
+from conftest import expense, income
+
+EXPENSES = [expense(1, 5.10, '2024-01-03'), expense(2, 0.20, '2024-01-31', 'fun'), expense(3, 7, '2024-03-01', 'food', 'EUR'),
+            expense(4, 'abc', 'not a date'), expense(5, 4.7, '2024-03-01', 'fun')]
+
+
+def test_totals_are_exact_in_cents():
+    columns = Columns('expenses', EXPENSES)
+    assert len(columns) == 5
+    assert columns.total() == 17.0
+    assert columns.total(month='2024-01') == 5.3
+    assert columns.total(currency='eur') == 7
+    assert columns.total(currency='gbp') == 0
+    assert columns.by_month() == {'2024-01': 5.3, '2024-03': 11.7}
+    assert columns.by_month(currency='usd') == {'2024-01': 5.3, '2024-03': 4.7}
+    assert columns.by_category() == {'food': 12.1, 'fun': 4.9}
+    assert columns.by_category(month='2024-03', currency='usd') == {'fun': 4.7}
+    assert total_of('expenses', iter(EXPENSES)) == 17.0
+
+
+def test_the_running_balance_moves_once_per_day():
+    rows = running_balance(Columns('income', [income(1, 100, '2024-01-31'), income(2, 50, '')]), Columns('expenses', EXPENSES))
+    assert rows == [{'date': '2024-01-03', 'change': -5.1, 'balance': -5.1},
+                    {'date': '2024-01-31', 'change': 99.8, 'balance': 94.7},
+                    {'date': '2024-03-01', 'change': -11.7, 'balance': 83.0}]
+    assert running_balance(Columns('income', []), Columns('expenses', [])) == []
+
+
+@pytest.fixture
+def tracker(data_path, storage):
+    storage.insert_many('expenses', EXPENSES)
+    return ExpenseTracker(data_path, storage=storage)
+
+
+# The view a backend hands out follows every write, and a month view holds at least that month
+def test_the_storage_view_follows_writes(tracker):
+    assert tracker.columns('expenses').total() == 17.0
+    tracker.add_expenses(3, 'shop', 'food', 'usd', '2024-03-02', '')
+    tracker.storage.delete('expenses', 1)
+    assert tracker.columns('expenses').by_month() == {'2024-01': 0.2, '2024-03': 14.7}
+    assert tracker.columns('expenses', month='2024-03').total(month='2024-03') == 14.7
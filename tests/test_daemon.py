@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from CLI.core.daemon import DaemonStorage, LedgerDaemon, _unix_sockets, connect_storage
+from CLI.core.query import Eq, Query, Range
+from CLI.core.storage import JsonStorage
+
+from conftest import expense
+
+pytestmark = pytest.mark.skipif(not _unix_sockets(), reason='the ledger daemon needs Unix domain sockets')
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    ledger = LedgerDaemon(str(tmp_path / 'data.json'))
+    calls = []
+    handle = ledger.handle
+    ledger.handle = lambda request: calls.append(request.get('call')) or handle(request)
+    ledger.calls = calls
+    thread = threading.Thread(target=ledger.serve_forever, daemon=True)
+    thread.start()
+    while not os.path.exists(ledger.path):
+        time.sleep(0.01)
+    yield ledger
+    ledger.shutdown()
+    thread.join()
+
+
+def test_clients_go_through_the_daemon(daemon):
+    client = connect_storage(daemon.filename)
+    assert isinstance(client, DaemonStorage)
+    client.insert_many('expenses', [expense(1, 5), expense(2, 6)])
+    assert [record['id'] for record in JsonStorage(daemon.filename).records('expenses')] == [1, 2]
+    assert client.get('expenses', 2)['price'] == 6
+
+
+def test_a_failed_write_leaves_the_rest_of_its_group(tmp_path):
+    ledger = LedgerDaemon(str(tmp_path / 'data.json'))
+    ledger.storage.insert_many('expenses', [expense(1, 1), expense(2, 2)])
+    # The second record of the first call isn't an object, so it fails after its first change
+    group = [('update_many', ['expenses', [expense(1, 99), 5]], Future()),
+             ('update_many', ['expenses', [expense(2, 7)]], Future())]
+    ledger._commit(group)
+    assert isinstance(group[0][2].exception(), AttributeError)
+    assert group[1][2].result() == 1
+    assert ledger.commits == 1
+    stored = {record['id']: record['price'] for record in JsonStorage(ledger.filename).records('expenses')}
+    assert stored == {1: 1, 2: 7}
+
+
+def test_a_group_commit_reads_the_ledger_once(tmp_path):
+    ledger = LedgerDaemon(str(tmp_path / 'data.json'))
+    ledger.storage.insert_many('expenses', [expense(1, 1), expense(2, 2)])
+    reads = []
+    records = ledger.storage.records
+    ledger.storage.records = lambda listName: reads.append(listName) or records(listName)
+    group = [('update_many', ['expenses', [expense(record_id % 2 + 1, record_id)]], Future()) for record_id in range(10)]
+    ledger._commit(group)
+    assert [future.result() for _, _, future in group] == [1] * 10
+    assert reads == ['expenses']
+
+
+def test_queries_run_in_the_daemon(daemon):
+    client = DaemonStorage(daemon.filename)
+    client.insert_many('expenses', [expense(1, 1, '2024-01-05'), expense(2, 2, '2024-02-05'), expense(3, 3, '2024-03-05')])
+    found = client.query(Query('expenses', Range('month', '2024-02', '2024-12') & ~Eq('id', 3)))
+    assert [record['id'] for record in found] == [2]
+    assert len(client.columns('expenses', '2024-01')) == 1
+    assert 'query' in daemon.calls
+    assert 'records' not in daemon.calls
+
+
+def test_without_a_daemon_the_file_is_used(tmp_path):
+    storage = connect_storage(str(tmp_path / 'data.json'))
+    assert not isinstance(storage, DaemonStorage)
@@ -0,0 +1,30 @@
+import pytest
+
+from CLI.core.core_stuff import ExpenseTracker
+
+from conftest import expense
+
+
+@pytest.fixture
+def tracker(data_path, storage):
+    return ExpenseTracker(data_path, storage=storage)
+
+
+def test_copies_are_grouped_and_all_but_the_oldest_removed(tracker, reopen):
+    copy = {**expense(4, 5), 'purchased': ' shop '}
+    tracker.storage.insert_many('expenses', [expense(1, 5), expense(2, 6), expense(3, 5), copy, expense(5, 6),
+                                             expense(6, 5, '2024-01-16')])
+    preview = tracker.check_for_duplicates('expenses', dryRun=True)
+    assert preview['data'] == {'groups': [[1, 3, 4], [2, 5]], 'removed': []}
+    assert tracker.storage.count('expenses') == 6
+    result = tracker.check_for_duplicates('expenses')
+    assert result['data']['removed'] == [3, 4, 5]
+    assert [record['id'] for record in reopen().records('expenses')] == [1, 2, 6]
+    assert tracker.check_for_duplicates('expenses')['success'] is False
+
+
+def test_the_compared_fields_can_be_chosen(tracker):
+    tracker.storage.insert_many('expenses', [expense(1, 5), expense(2, 5, tags='fun'), expense(3, 6, tags='fun')])
+    assert tracker.find_duplicates('expenses') == []
+    assert tracker.find_duplicates('expenses', ignore=['tags']) == [[1, 2]]
+    assert tracker.find_duplicates('expenses', keys=['tags']) == [[2, 3]]
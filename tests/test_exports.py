@@ -0,0 +1,80 @@
+import csv
+import io
+import sys
+
+import pytest
+
+from CLI.core.core_stuff import ExpenseTracker
+
+from conftest import expense
+
+
+@pytest.fixture
+def tracker(data_path, storage):
+    storage.insert_many('expenses', [expense(1, 5.5, '2024-01-03'), expense(2, 12, '2024-02-10', 'fun'),
+                                     expense(3, 7.25, '2024-03-01', 'food', 'eur')])
+    return ExpenseTracker(data_path, storage=storage)
+
+
+def rows(data):
+    return list(csv.DictReader(io.StringIO(data.decode())))
+
+
+def test_csv_export_streams_every_record(tracker, tmp_path):
+    result = tracker.export_to_csv('expenses', str(tmp_path / 'out.csv'))
+    assert result['success']
+    with open(result['data'], newline='') as file:
+        exported = list(csv.DictReader(file))
+    assert [(row['id'], row['price'], row['date']) for row in exported] == [
+        ('1', '5.5', '2024-01-03'), ('2', '12', '2024-02-10'), ('3', '7.25', '2024-03-01')]
+
+
+def test_csv_export_of_a_date_range(tracker, tmp_path):
+    result = tracker.export_to_csv('expenses', str(tmp_path / 'out.csv'), start='2024-02-01', end='2024-02-29')
+    with open(result['data'], newline='') as file:
+        assert [row['id'] for row in csv.DictReader(file)] == ['2']
+    assert tracker.export_to_csv('budget', str(tmp_path / 'out.csv'), start='2024-01-01')['success'] is False
+    assert tracker.export_to_csv('income', str(tmp_path / 'out.csv'))['success'] is False
+
+
+# Streamlit reruns the page on every click; the download buttons must not export again each time
+def test_export_bytes_are_kept_until_the_data_changes(tracker, monkeypatch):
+    calls = []
+    export = tracker.export_to_csv
+    monkeypatch.setattr(tracker, 'export_to_csv', lambda *args: calls.append(args) or export(*args))
+    first = tracker.export_bytes('expenses', 'csv')
+    assert tracker.export_bytes('expenses', 'csv') == first
+    assert len(calls) == 1
+    tracker.add_expenses(1, 'cafe', 'food', 'usd', '2024-03-02', '')
+    assert len(rows(tracker.export_bytes('expenses', 'csv'))) == 4
+    assert len(calls) == 2
+    # Inside a batch the changes aren't on disk yet, so nothing is served from or kept in the cache
+    with tracker.batch():
+        tracker.add_expenses(2, 'cafe', 'food', 'usd', '2024-03-03', '')
+        assert len(rows(tracker.export_bytes('expenses', 'csv'))) == 5
+    assert len(rows(tracker.export_bytes('expenses', 'csv'))) == 5
+
+
+def test_missing_packages_and_empty_lists_give_no_bytes(tracker, monkeypatch):
+    assert tracker.export_bytes('income', 'csv') is None
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    monkeypatch.setitem(sys.modules, 'openpyxl', None)
+    assert tracker.export_bytes('expenses', 'parquet') is None
+    assert tracker.export_bytes('expenses', 'xlsx') is None
+
+
+def test_parquet_export(tracker, tmp_path):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    result = tracker.export_to_parquet('expenses', str(tmp_path / 'out.parquet'))
+    table = parquet.read_table(result['data'])
+    assert table.column('price').to_pylist() == [5.5, 12.0, 7.25]
+    assert table.column('id').to_pylist() == [1, 2, 3]
+
+
+def test_xlsx_export(tracker, tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+    result = tracker.export_to_xlsx('expenses', str(tmp_path / 'out.xlsx'))
+    sheet = openpyxl.load_workbook(result['data'])['expenses']
+    values = list(sheet.values)
+    assert values[0][:2] == ('id', 'price')
+    assert [row[1] for row in values[1:]] == [5.5, 12, 7.25]
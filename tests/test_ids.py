@@ -0,0 +1,41 @@
+import json
+
+from CLI.core.core_stuff import ExpenseTracker
+from CLI.core.storage import JsonStorage
+
+from conftest import expense
+
+
+def test_deleted_ids_are_not_handed_out_again(storage, reopen):
+    storage.insert_many('expenses', [expense(1, 5), expense(2, 6)])
+    storage.delete('expenses', 2)
+    assert storage.next_id('expenses') == 3
+    assert reopen().next_id('expenses') == 3
+    assert storage.next_id('income') == 1
+
+
+def test_an_id_read_before_another_insert_is_renumbered(storage, reopen):
+    other = reopen()
+    record_id = storage.next_id('expenses')
+    other.insert('expenses', expense(other.next_id('expenses'), 5))
+    storage.insert('expenses', expense(record_id, 6))
+    assert sorted(record['id'] for record in reopen().records('expenses')) == [1, 2]
+
+
+def test_hand_edited_file_with_ids_past_the_counter(tmp_path):
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps({'expenses': [expense(40, 5), 'not a record', None], '_sequences': {'expenses': 3}}))
+    storage = JsonStorage(str(path))
+    assert storage.next_id('expenses') == 41
+    assert storage.get('expenses', 40)['price'] == 5
+    # Rows that aren't objects are kept and counted but add nothing to the totals
+    assert storage.rollup('expenses')['rows'] == 3
+
+
+def test_assign_id_takes_a_list_name_or_a_list(tmp_path):
+    tracker = ExpenseTracker(str(tmp_path / 'data.json'), storage=JsonStorage(str(tmp_path / 'data.json')))
+    assert tracker.assign_id([expense(4, 1), {'id': 'x'}, 'junk']) == 5
+    assert tracker.assign_id([]) == 1
+    tracker.storage.insert('expenses', expense(9, 1))
+    tracker.storage.delete('expenses', 9)
+    assert tracker.assign_id('expenses') == 10
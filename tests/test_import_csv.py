@@ -0,0 +1,53 @@
+import io
+
+import pytest
+
+from CLI.core.core_stuff import ExpenseTracker
+from CLI.core.storage import JsonStorage
+
+HEADER = 'id,price,purchased,tags,date,currency,notes\n'
+ROWS = [
+    '9,12.50,Grocer,food,2024-01-05,USD,\n',
+    '9,"1,200",Landlord,rent,2024-01-01T09:00,usd,January\n',
+    ',12.50,Grocer,food,2024-01-05,usd,\n',       # the first row again
+    ',abc,Grocer,food,2024-01-06,usd,\n',         # price isn't a number
+    ',3,Cafe,fun,05/01/2024,usd,\n',              # date isn't ISO
+    ',3,Cafe,,2024-01-07,usd,\n',                 # tags missing
+    ',4.25,Cafe,fun,2024-01-08,eur,\n',
+]
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    return ExpenseTracker(str(tmp_path / 'data.json'), storage=JsonStorage(str(tmp_path / 'data.json')))
+
+
+def test_rows_are_checked_deduplicated_and_written_per_chunk(tracker, tmp_path):
+    path = tmp_path / 'expenses.csv'
+    path.write_text(HEADER + ''.join(ROWS))
+    reports = []
+    result = tracker.import_from_csv('expenses', str(path), chunk_size=3, progress=reports.append)
+    report = result['data']
+    assert result['success']
+    assert (report['rows'], report['imported'], report['duplicates'], report['rejected']) == (7, 3, 1, 3)
+    assert [reject['line'] for reject in report['rejects']] == [5, 6, 7]
+    assert [progress['rows'] for progress in reports] == [3, 6, 7]
+    stored = tracker.storage.records('expenses')
+    # Ids are handed out fresh; the CSV's id column is ignored
+    assert [record['id'] for record in stored] == [1, 2, 3]
+    assert [(record['price'], record['date'], record['currency']) for record in stored] == [
+        (12.5, '2024-01-05', 'usd'), (1200.0, '2024-01-01', 'usd'), (4.25, '2024-01-08', 'eur')]
+
+
+def test_rows_already_stored_are_skipped(tracker):
+    source = io.BytesIO((HEADER + ROWS[0]).encode('utf-8-sig'))
+    assert tracker.import_from_csv('expenses', source)['data']['imported'] == 1
+    source.seek(0)
+    assert tracker.import_from_csv('expenses', source)['data']['duplicates'] == 1
+    assert not source.closed
+    assert tracker.storage.count('expenses') == 1
+
+
+def test_unsupported_list_and_unreadable_file(tracker, tmp_path):
+    assert tracker.import_from_csv('nothing', 'x.csv')['success'] is False
+    assert tracker.import_from_csv('expenses', str(tmp_path / 'missing.csv'))['success'] is False
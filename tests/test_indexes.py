@@ -0,0 +1,55 @@
+import pytest
+
+from CLI.core.core_stuff import ExpenseTracker
+from CLI.core.indexes import DateIndex, FieldIndex, month_of
+
+from conftest import expense
+
+ROWS = [expense(1, 5, '2024-01-03', 'Food'), expense(2, 6, '2024-01-31', 'fun', 'eur'),
+        expense(3, 7, '2024-02-01', 'food'), expense(4, 8, '', 'food'), expense(5, 9, '2024-01-31', 'rent')]
+
+
+def test_a_field_index_folds_case_and_follows_changes():
+    index = FieldIndex('tags', ROWS)
+    assert index.lookup('FOOD') == {1, 3, 4}
+    index.remove(ROWS[0])
+    index.add({**ROWS[0], 'tags': 'fun'})
+    assert index.lookup('food') == {3, 4}
+    assert index.lookup('fun') == {1, 2}
+    assert index.lookup('travel') == set()
+    months = FieldIndex('date', ROWS, key=month_of)
+    assert months.lookup('2024-01') == {1, 2, 5}
+
+
+def test_a_date_index_finds_ranges_with_both_ends_included():
+    index = DateIndex('date', ROWS)
+    assert index.between('2024-01-03', '2024-01-31') == [1, 2, 5]
+    assert index.between(start='2024-02-01') == [3]
+    assert index.between(end='2024-01-03') == [4, 1]
+    assert index.lookup('2024-01-31') == {2, 5}
+    index.remove(ROWS[1])
+    index.add({**ROWS[1], 'date': '2024-03-01'})
+    assert index.between('2024-01-04', '2024-01-31') == [5]
+    assert index.between(start='2024-02-15') == [2]
+
+
+@pytest.fixture
+def tracker(data_path, storage):
+    storage.insert_many('expenses', ROWS)
+    return ExpenseTracker(data_path, storage=storage)
+
+
+def ids(result):
+    return sorted(record['id'] for record in result.get('data', []))
+
+
+# Filters go through the indexes on the JSON backends and through SQL on SQLite; the answers are the same
+def test_filtered_views_stay_right_across_writes(tracker):
+    assert ids(tracker.view_filtered_expenses(tags='food')) == [1, 3, 4]
+    assert ids(tracker.view_filtered_expenses(month='2024-01', tags='FOOD')) == [1]
+    assert ids(tracker.view_filtered_expenses(date='2024-01-31', currency='USD')) == [5]
+    tracker.edit_expenses(5, tags='food')
+    tracker.storage.delete('expenses', 1)
+    tracker.add_expenses(10, 'shop', 'food', 'usd', '2024-01-20', '')
+    assert ids(tracker.view_filtered_expenses(month='2024-01', tags='food')) == [5, 6]
+    assert tracker.view_filtered_expenses(tags='travel')['success'] is False
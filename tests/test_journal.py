@@ -0,0 +1,61 @@
+import os
+
+from CLI.core.storage import JournalStorage
+
+from conftest import expense
+
+
+def journal_storage(tmp_path, **kwargs):
+    return JournalStorage(str(tmp_path / 'data.json'), background=False, **kwargs)
+
+
+def test_changes_are_replayed_from_the_journal(tmp_path):
+    storage = journal_storage(tmp_path)
+    storage.insert_many('expenses', [expense(1, 5), expense(2, 6)])
+    storage.update('expenses', expense(2, 60))
+    storage.delete('expenses', 1)
+    assert os.path.getsize(storage.journal) > 0
+    stored = journal_storage(tmp_path)
+    assert [(record['id'], record['price']) for record in stored.records('expenses')] == [(2, 60)]
+
+
+def test_torn_last_line_is_cut_off(tmp_path):
+    storage = journal_storage(tmp_path)
+    storage.insert('expenses', expense(1, 5))
+    good = os.path.getsize(storage.journal)
+    # A crash in the middle of an append
+    with open(storage.journal, 'ab') as file:
+        file.write(b'{"seq": 2, "op": "insert", "list": "expen')
+    stored = journal_storage(tmp_path)
+    assert [record['id'] for record in stored.records('expenses')] == [1]
+    assert os.path.getsize(storage.journal) == good
+    # The next append starts on a line of its own
+    stored.insert('expenses', expense(2, 6))
+    assert [record['id'] for record in journal_storage(tmp_path).records('expenses')] == [1, 2]
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path):
+    storage = journal_storage(tmp_path, max_journal_entries=3)
+    for record_id in range(1, 5):
+        storage.insert('expenses', expense(record_id, record_id))
+    assert os.path.getsize(storage.journal) < os.path.getsize(storage.filename)
+    assert [record['id'] for record in journal_storage(tmp_path).records('expenses')] == [1, 2, 3, 4]
+
+
+def test_crash_before_the_journal_is_emptied_replays_nothing_twice(tmp_path):
+    storage = journal_storage(tmp_path)
+    storage.insert_many('expenses', [expense(1, 5), expense(2, 6)])
+    with open(storage.journal, 'rb') as file:
+        lines = file.read()
+    storage.compact()
+    # The snapshot was written but the process died before truncating the journal
+    with open(storage.journal, 'wb') as file:
+        file.write(lines)
+    assert [record['id'] for record in journal_storage(tmp_path).records('expenses')] == [1, 2]
+
+
+def test_save_supersedes_the_journal(tmp_path):
+    storage = journal_storage(tmp_path)
+    storage.insert('expenses', expense(1, 5))
+    storage.save({'expenses': [expense(7, 1)]})
+    assert [record['id'] for record in journal_storage(tmp_path).records('expenses')] == [7]
@@ -0,0 +1,58 @@
+import io
+import json
+
+import pytest
+
+from CLI.core import jsonstream
+from CLI.core.jsonstream import iter_list, read_first
+from CLI.core.storage import JsonStorage
+
+from conftest import expense
+
+DOCUMENT = {'_rollups': {'expenses': {'rows': 2}}, 'income': [{'id': 1, 'notes': 'a ] , } b'}],
+            'expenses': [expense(1, 12.5), expense(2, 100000.25, purchased='x' * 50)], 'budget': []}
+
+
+@pytest.fixture(params=[4, 7, 1 << 16])
+def chunk_size(request, monkeypatch):
+    monkeypatch.setattr(jsonstream, 'CHUNK_SIZE', request.param)
+
+
+def stream(document, listName):
+    return list(iter_list(io.StringIO(document), listName))
+
+
+# Tiny windows cut values, numbers and separators at every possible place
+def test_one_list_is_read_through_any_window(chunk_size):
+    for indent in (None, 2):
+        text = json.dumps(DOCUMENT, indent=indent)
+        for listName in ('expenses', 'income', 'budget'):
+            assert stream(text, listName) == DOCUMENT[listName]
+        assert stream(text, 'goals') == []
+        assert read_first(io.StringIO(text), '_rollups') == DOCUMENT['_rollups']
+        assert read_first(io.StringIO(text), 'income') is None
+    assert stream('{}', 'expenses') == []
+
+
+def test_a_truncated_or_corrupt_document_raises(chunk_size):
+    text = json.dumps(DOCUMENT)
+    cut = text.index('100000.25') + 3
+    with pytest.raises(ValueError):
+        stream(text[:cut], 'expenses')
+    with pytest.raises(ValueError):
+        stream(text.replace('"budget"', 'budget'), 'goals')
+    # What comes after the list asked for is never read
+    assert stream(text[:text.index('"budget"')], 'expenses') == DOCUMENT['expenses']
+
+
+def test_a_storage_stream_never_hands_out_part_of_a_list(tmp_path):
+    path = tmp_path / 'data.json'
+    storage = JsonStorage(str(path))
+    storage.insert_many('expenses', [expense(1, 5), expense(2, 6)])
+    text = path.read_text()
+    path.write_text(text[:text.rindex('"price"')])
+    with pytest.raises(ValueError):
+        list(JsonStorage(str(path)).iter_records('expenses'))
+    # Bad from the start, the file is read like any other unreadable one: as an empty document
+    path.write_text('not json')
+    assert list(JsonStorage(str(path)).iter_records('expenses')) == []
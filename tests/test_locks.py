@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from CLI.core import locks
+from CLI.core.locks import FileLock
+from CLI.core.storage import open_storage
+
+pytestmark = pytest.mark.skipif(locks.fcntl is None, reason='no flock() on this platform')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Runs in another thread; returns the event set once `hold` got the lock
+def taken(hold):
+    done = threading.Event()
+
+    def run():
+        with hold():
+            done.set()
+    threading.Thread(target=run, daemon=True).start()
+    return done
+
+
+def test_readers_share_and_a_writer_waits(tmp_path):
+    lock = FileLock(str(tmp_path / 'data.json.lock'))
+    with lock.shared():
+        assert taken(lock.shared).wait(5)
+        writer = taken(lock.exclusive)
+        assert not writer.wait(0.2)
+    assert writer.wait(5)
+    assert lock.stats()['contended'] >= 1
+    assert lock.stats()['max_wait_seconds'] > 0
+
+
+def test_the_lock_is_reentrant_and_reports_an_upgrade(tmp_path):
+    lock = FileLock(str(tmp_path / 'data.json.lock'))
+    with lock.exclusive() as upgraded:
+        assert upgraded is False
+        with lock.shared(), lock.exclusive() as upgraded:
+            assert upgraded is False
+    with lock.shared():
+        with lock.exclusive() as upgraded:
+            assert upgraded is True
+            assert not taken(lock.shared).wait(0.2)
+        # Back to shared: other readers get in again
+        assert taken(lock.shared).wait(5)
+
+
+ADD = '''
+import sys
+sys.path.insert(0, {root!r})
+from CLI.core.storage import open_storage
+storage = open_storage({path!r}, {kind!r})
+for i in range({count}):
+    storage.insert('expenses', {{'id': storage.next_id('expenses'), 'price': i, 'purchased': 'shop', 'tags': 'food',
+                                 'currency': 'usd', 'date': '2024-01-15', 'notes': ''}})
+'''
+
+
+# Each process reads the next id and writes under the lock; without it, adds overwrite each other
+@pytest.mark.parametrize('kind', ['json', 'journal'])
+def test_processes_adding_at_once_lose_nothing(tmp_path, kind):
+    path = str(tmp_path / 'data.json')
+    script = ADD.format(root=ROOT, path=path, kind=kind, count=25)
+    workers = [subprocess.Popen([sys.executable, '-c', script]) for _ in range(4)]
+    assert [worker.wait(120) for worker in workers] == [0] * 4
+    records = open_storage(path, kind).records('expenses')
+    assert len(records) == 100
+    assert sorted(record['id'] for record in records) == list(range(1, 101))
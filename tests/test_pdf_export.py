@@ -0,0 +1,41 @@
+import re
+
+import pytest
+
+from CLI.core.core_stuff import ExpenseTracker
+from CLI.core.storage import JsonStorage
+
+from conftest import expense
+
+pytest.importorskip('reportlab')
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    path = str(tmp_path / 'data.json')
+    tracker = ExpenseTracker(path, storage=JsonStorage(path))
+    tracker.storage.insert_many('expenses', [expense(i, i, f'2024-0{1 + i % 2}-15', purchased='x' * (i * 10)) for i in range(1, 26)])
+    return tracker
+
+
+def pages(result):
+    return int(re.search(r'(\d+) pages', result['message']).group(1))
+
+
+# The first page gives three rows to the title; the rest take rows_per_page each
+def test_rows_are_drawn_a_page_at_a_time(tracker, tmp_path):
+    result = tracker.export_to_pdf('expenses', str(tmp_path / 'out.pdf'), rows_per_page=10)
+    assert result['success']
+    assert '(25 rows, 3 pages)' in result['message']
+    with open(result['data'], 'rb') as file:
+        data = file.read()
+    assert data.startswith(b'%PDF') and data.count(b'/Type /Page\n') == 3
+
+
+def test_columns_date_range_and_subtotals(tracker, tmp_path):
+    result = tracker.export_to_pdf('expenses', str(tmp_path / 'out.pdf'), columns=['date', 'price'], subtotals=True,
+                                   rows_per_page=10, start='2024-02-01')
+    assert '(13 rows, 3 pages)' in result['message']
+    assert pages(tracker.export_to_pdf('expenses', str(tmp_path / 'out.pdf'))) == 1
+    assert tracker.export_to_pdf('income', str(tmp_path / 'out.pdf'))['success'] is False
+    assert tracker.export_to_pdf('expenses', str(tmp_path / 'out.pdf'), start='2025-01-01')['success'] is False
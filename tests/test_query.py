@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from CLI.core.query import Eq, In, Prefix, Query, Range, dump_query, load_query
+
+from conftest import expense
+
+QUERIES = [
+    Eq('tags', 'FOOD'),
+    In('currency', ['eur', 'gbp']),
+    Range('month', '2024-02', '2024-04'),
+    Range('date', '2024-03-10', '2024-05-01', include_low=False),
+    Range('price', low=50) & ~Eq('tags', 'rent'),
+    Prefix('purchased', 'amaz') | Eq('month', '2024-06'),
+    Prefix('date', '2024-0') & In('tags', ['food', 'fun']),
+]
+
+
+def ledger():
+    chooser = random.Random(7)
+    return [expense(record_id, round(chooser.uniform(1, 100), 2),
+                    f'2024-{chooser.randint(1, 8):02d}-{chooser.randint(1, 28):02d}',
+                    chooser.choice(['food', 'fun', 'rent', None]), chooser.choice(['usd', 'EUR', 'gbp']),
+                    chooser.choice(['Amazon', 'amazing cafe', 'grocer', 'landlord']))
+            for record_id in range(1, 301)]
+
+
+# What the query means, checked record by record
+def expected(where, records):
+    return [record['id'] for record in records if where.test(record, 'date')]
+
+
+@pytest.mark.parametrize('where', QUERIES)
+def test_every_backend_finds_the_same_records(storage, where):
+    records = ledger()
+    storage.insert_many('expenses', records)
+    found = storage.query(Query('expenses', where))
+    assert sorted(record['id'] for record in found) == sorted(expected(where, records))
+
+
+def test_sorted_pages(storage):
+    records = ledger()
+    storage.insert_many('expenses', records)
+    where = Range('month', '2024-03', '2024-05')
+    ordered = sorted((record for record in records if where.test(record, 'date')), key=lambda record: (record['date'], record['id']))
+    page = storage.query(Query('expenses', where, sort='date', limit=10, offset=5))
+    assert [record['date'] for record in page] == [record['date'] for record in ordered[5:15]]
+    newest = storage.query(Query('expenses', where, sort='date', descending=True, limit=3))
+    assert [record['date'] for record in newest] == [record['date'] for record in ordered[::-1][:3]]
+
+
+@pytest.mark.parametrize('where', QUERIES)
+def test_sent_queries_mean_the_same(where):
+    records = ledger()
+    query = load_query(dump_query(Query('expenses', where, sort='price', limit=20)))
+    assert expected(query.where, records) == expected(where, records)
+    assert (query.sort, query.limit) == ('price', 20)
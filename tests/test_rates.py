@@ -0,0 +1,103 @@
+import math
+from datetime import date, timedelta
+
+import pytest
+
+from CLI.core.core_stuff import ExpenseTracker
+from CLI.core.rates import MAX_GAP_DAYS, HistoricalRates, RateError, RateProvider
+from CLI.core.storage import JsonStorage
+
+from conftest import expense
+
+LAST_DAY = date(2024, 3, 8)
+
+
+@pytest.fixture
+def history(tmp_path):
+    table = HistoricalRates(str(tmp_path / 'fx.npz'))
+    # Friday and the Thursday before it, per EUR
+    table.merge({'2024-03-07': {'USD': 1.05, 'GBP': 0.85}, LAST_DAY: {'USD': 1.10, 'GBP': 0.86}})
+    return table
+
+
+# Latest rates without the network; fail=True makes every fetch fail like a lost connection
+class FakeProvider(RateProvider):
+    def __init__(self, **kwargs):
+        super().__init__(cache_file=None, **kwargs)
+        self.fail = False
+
+    def _fetch(self, base):
+        self.fetches += 1
+        if self.fail:
+            raise RateError('Could not connect to the Conversion API')
+        return {'USD': 2.0, 'EUR': 1.0, 'GBP': 1.5}
+
+
+def test_a_day_uses_its_own_rates_or_the_last_business_day_before_it(history):
+    assert history.rate('eur', 'usd', '2024-03-07') == pytest.approx(1.05)
+    assert history.rate('gbp', 'usd', LAST_DAY) == pytest.approx(1.10 / 0.86)
+    assert history.rate('eur', 'usd', LAST_DAY + timedelta(days=2)) == pytest.approx(1.10)
+    assert history.rate('eur', 'usd', '2024-03-06') is None
+    assert history.rate('eur', 'jpy', LAST_DAY) is None
+
+
+def test_no_rate_past_the_end_of_the_table(history):
+    assert history.rate('eur', 'usd', LAST_DAY + timedelta(days=MAX_GAP_DAYS)) == pytest.approx(1.10)
+    assert history.rate('eur', 'usd', LAST_DAY + timedelta(days=MAX_GAP_DAYS + 1)) is None
+    rates = history.rates_many(['EUR', 'EUR', 'GBP'], [LAST_DAY, LAST_DAY + timedelta(days=400), '2024-03-07'], 'usd')
+    assert rates[0] == pytest.approx(1.10)
+    assert math.isnan(rates[1])
+    assert rates[2] == pytest.approx(1.05 / 0.85)
+
+
+def test_dates_past_the_table_convert_at_the_latest_rate(history):
+    provider = FakeProvider(history=history)
+    assert provider.rate('eur', 'usd', LAST_DAY) == pytest.approx(1.10)
+    assert provider.rate('eur', 'usd', LAST_DAY + timedelta(days=30)) == 2.0
+    converted = provider.convert_many([1, 1], ['eur', 'eur'], 'usd', [LAST_DAY, LAST_DAY + timedelta(days=30)])
+    assert list(converted) == pytest.approx([1.10, 2.0])
+
+
+def test_saved_table_loads_back(history, tmp_path):
+    history.save()
+    loaded = HistoricalRates(str(tmp_path / 'fx.npz'))
+    assert len(loaded) == 2
+    assert loaded.span() == (date(2024, 3, 7), LAST_DAY)
+    assert loaded.rate('usd', 'gbp', LAST_DAY) == pytest.approx(0.86 / 1.10)
+
+
+def test_one_fetch_per_base_currency_while_fresh():
+    provider = FakeProvider()
+    provider.convert_many([1, 2, 3], ['eur', 'eur', 'usd'], 'gbp')
+    provider.rate('eur', 'usd')
+    assert provider.fetches == 2
+
+
+def test_a_failed_fetch_is_remembered():
+    provider = FakeProvider(failure_ttl=60)
+    provider.fail = True
+    for _ in range(3):
+        with pytest.raises(RateError):
+            provider.rate('eur', 'usd')
+    assert provider.fetches == 1
+
+
+def test_an_expired_table_is_used_while_the_api_is_down():
+    provider = FakeProvider(ttl=0, failure_ttl=60)
+    assert provider.rate('eur', 'usd') == 2.0
+    provider.fail = True
+    assert provider.rate('eur', 'usd') == 2.0
+    assert provider.rate('eur', 'usd') == 2.0
+    assert provider.fetches == 2
+
+
+def test_stored_prices_convert_at_their_dates_or_the_latest_rate(history, tmp_path):
+    tracker = ExpenseTracker(str(tmp_path / 'data.json'), storage=JsonStorage(str(tmp_path / 'data.json')))
+    tracker.rates = FakeProvider(history=history)
+    undated = expense(2, 10, currency='EUR')
+    del undated['date']
+    tracker.storage.insert_many('expenses', [expense(1, 10, LAST_DAY.isoformat(), currency='eur'), undated,
+                                             expense(3, 5, currency='usd'), expense(4, 5, currency='USD')])
+    assert tracker.convert_prices_to_currency('USD')['success']
+    stored = {record['id']: (record['price'], record['currency']) for record in tracker.storage.records('expenses')}
+    assert stored == {1: (11.0, 'usd'), 2: (20.0, 'usd'), 3: (5, 'usd'), 4: (5, 'USD')}
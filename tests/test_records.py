@@ -0,0 +1,49 @@
+import pytest
+
+from CLI.core.core_stuff import ExpenseTracker
+from CLI.core.records import Expense, Income, decode, encode
+
+from conftest import expense
+
+
+def test_a_record_writes_back_what_was_read():
+    stored = {'id': 7, 'price': '5.50', 'purchased': 'shop', 'tags': 'food', 'date': '2024-01-15', 'currency': 'USD',
+              'notes': '', 'receipt': 'r.png'}
+    item = Expense.from_dict(stored)
+    assert (item.price, item.currency, item.extra) == (5.5, 'usd', {'receipt': 'r.png'})
+    assert item.to_dict() == {**stored, 'price': 5.5, 'currency': 'usd'}
+    assert list(item.to_dict()) == list(stored)
+    assert not hasattr(item, '__dict__')
+    assert Income.from_dict({'id': 1, 'amount': 10, 'source': 'job', 'date': '2024-01-01'}).currency == 'usd'
+
+
+def test_bad_records_are_refused():
+    with pytest.raises(ValueError):
+        Expense.from_dict({'id': 1, 'price': 5, 'purchased': 'shop', 'tags': 'food', 'currency': 'usd'})
+    with pytest.raises(ValueError):
+        Expense.from_dict({**expense(1, 5), 'price': 'abc'})
+    with pytest.raises(ValueError):
+        Expense.from_dict({**expense(1, 5), 'price': True})
+
+
+def test_a_decoded_list_shares_repeated_strings():
+    rows = [expense(i, i, ''.join(['2024-01-', '15']), ''.join(['fo', 'od'])) for i in range(1, 4)]
+    decoded = decode('expenses', rows)
+    assert decoded[0].tags is decoded[2].tags
+    assert decoded[0].date is decoded[1].date
+    assert encode(decoded) == rows
+
+
+@pytest.fixture
+def tracker(data_path, storage):
+    return ExpenseTracker(data_path, storage=storage)
+
+
+def test_typed_records_in_and_out_of_the_tracker(tracker):
+    result = tracker.add_many('expenses', [Expense(price=5, purchased='shop', tags='food', date='2024-01-15', currency='EUR')])
+    assert result['success']
+    typed = tracker.typed_records('expenses')['data']
+    assert typed == [Expense(id=1, price=5, purchased='shop', tags='food', date='2024-01-15', currency='eur')]
+    assert tracker.typed_records('recurring_expenses')['success'] is False
+    tracker.storage.insert('expenses', {**expense(2, 5), 'price': 'abc'})
+    assert tracker.typed_records('expenses')['success'] is False
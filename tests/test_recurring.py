@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+
+from CLI.core.recurring import RecurringDetector, normalize_merchant
+
+from conftest import expense
+
+
+def monthly(first_id, purchased, prices, start=date(2024, 1, 3), tags='subscriptions', currency='usd'):
+    return [expense(first_id + i, price, (start + timedelta(days=30 * i)).isoformat(), tags, currency, purchased)
+            for i, price in enumerate(prices)]
+
+
+def test_merchant_names_ignore_case_punctuation_and_order_numbers():
+    assert normalize_merchant('Netflix.com #4411') == normalize_merchant('netflix com') == 'netflix com'
+    assert normalize_merchant('7-11') == '7 11'
+
+
+def test_a_monthly_charge_is_found_through_a_small_price_change():
+    rows = monthly(1, 'Netflix.com #1', [9.99, 9.99, 10.29, 10.29])
+    found = RecurringDetector().detect(rows)
+    assert len(found) == 1
+    assert found[0]['occurrences'] == 4
+    assert found[0]['frequency_days'] == 30
+    assert found[0]['last_date'] == '2024-04-02'
+    assert found[0]['next_expected_date'] == '2024-05-02'
+    assert found[0]['category'] == 'subscriptions'
+
+
+def test_unrelated_or_irregular_rows_are_not_recurring():
+    rows = monthly(1, 'Gym', [30, 30])
+    rows += monthly(10, 'Gym', [30, 30, 30], currency='eur')[:2]
+    rows += [expense(20, 5, day, 'food', 'usd', 'Cafe') for day in ('2024-01-01', '2024-01-02', '2024-04-20')]
+    # Three rows a month apart, but at very different prices
+    rows += monthly(30, 'Store', [5, 50, 500])
+    assert RecurringDetector().detect(rows) == []
+
+
+def test_only_changed_groups_are_recomputed(tmp_path):
+    state = str(tmp_path / 'recurring.json')
+    rows = monthly(1, 'Netflix', [9.99] * 3) + monthly(10, 'Spotify', [11.99] * 3)
+    first = RecurringDetector(state).detect(rows)
+    detector = RecurringDetector(state)
+    assert detector.detect(rows) == first
+    assert (detector.recomputed, detector.reused) == (0, 2)
+    rows += monthly(20, 'Spotify', [11.99], start=date(2024, 4, 2))
+    found = detector.detect(rows)
+    assert (detector.recomputed, detector.reused) == (1, 1)
+    assert [series['occurrences'] for series in found if series['purchased'] == 'spotify'] == [4]
+    # Other settings start over
+    other = RecurringDetector(state, min_occurrences=4)
+    assert [series['purchased'] for series in other.detect(rows)] == ['spotify']
+    assert other.reused == 0
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from CLI.core import rollup
+from CLI.core.core_stuff import ExpenseTracker
+from CLI.core.storage import JsonStorage
+
+from conftest import expense, income
+
+
+def assert_current(storage):
+    for name in ('expenses', 'income'):
+        assert storage.rollup(name) == rollup.build(name, storage.records(name))
+
+
+def fill(storage):
+    storage.insert_many('expenses', [expense(1, 5.5, '2024-01-03'), expense(2, 12, '2024-02-10', 'fun'),
+                                     expense(3, 7.25, '', 'food', 'EUR'), expense(4, 1.1, '2024-01-30', None)])
+    storage.insert('income', income(1, 1000))
+
+
+def test_rollups_follow_every_write(storage, reopen):
+    fill(storage)
+    assert_current(storage)
+    storage.update('expenses', expense(2, 15, '2024-03-01', 'food'))
+    storage.delete_many('expenses', [1, 4])
+    storage.apply([{'op': 'insert', 'list': 'expenses', 'record': expense(5, 2, '2024-03-09')}])
+    assert_current(storage)
+    data = storage.load()
+    data['expenses'].append(expense(6, 9, '2023-12-24'))
+    storage.save(data)
+    assert_current(storage)
+    assert_current(reopen())
+
+
+def test_totals_by_month_and_category(storage):
+    fill(storage)
+    totals = rollup.Rollup('expenses', storage.rollup('expenses'))
+    assert totals.total(currency='usd') == pytest.approx(18.6)
+    assert totals.by_month(currency='usd') == {'2024-01': 6.6, '2024-02': 12.0}
+    assert totals.by_category(month='2024-01', currency='usd') == {'food': 5.5, '': 1.1}
+    assert totals.count() == 4
+
+
+def test_a_returned_rollup_is_not_the_stored_one(storage):
+    fill(storage)
+    storage.rollup('expenses')['months'].clear()
+    assert_current(storage)
+
+
+def test_json_document_starts_with_the_rollups(tmp_path):
+    path = tmp_path / 'data.json'
+    fill(JsonStorage(str(path)))
+    assert next(iter(json.loads(path.read_text()))) == rollup.ROLLUP_KEY
+
+
+def test_hand_edited_lists_rebuild_the_rollups(tmp_path):
+    path = tmp_path / 'data.json'
+    fill(JsonStorage(str(path)))
+    document = json.loads(path.read_text())
+    document['expenses'] = document['expenses'][:1]
+    path.write_text(json.dumps(document))
+    # Read without the records the stored totals are trusted; loading the document catches the edit
+    storage = JsonStorage(str(path))
+    storage.load()
+    assert_current(storage)
+
+
+def test_bookkeeping_stays_out_of_exports_and_imports_are_rebuilt(data_path, storage, reopen):
+    tracker = ExpenseTracker(data_path, storage=storage)
+    fill(storage)
+    assert not [key for key in tracker.open_file()['data'] if key.startswith('_')]
+    exported = json.loads(tracker.export_json())
+    assert not [key for key in exported if key.startswith('_')]
+    exported[rollup.ROLLUP_KEY] = {'expenses': {'rows': 4, 'months': {'1999-01': {'x': {'usd': [999900, 4]}}}}}
+    tracker.import_json(json.dumps(exported).encode())
+    assert_current(reopen())
+    assert tracker.rollup('expenses').total(currency='usd') == pytest.approx(18.6)
+
+
+def test_write_file_keeps_the_id_counters(data_path, storage):
+    tracker = ExpenseTracker(data_path, storage=storage)
+    fill(storage)
+    data = tracker.open_file()['data']
+    data['expenses'] = [record for record in data['expenses'] if record['id'] != 4]
+    tracker.write_file(data)
+    assert storage.next_id('expenses') == 5
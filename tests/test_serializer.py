@@ -0,0 +1,41 @@
+import io
+import json
+import math
+
+import pytest
+
+from CLI.core import serializer
+from CLI.core.jsonstream import iter_list
+
+from conftest import expense
+
+DOCUMENT = {'expenses': [expense(1, 5.5), expense(2, 12, '2024-02-10', 'café ☕')], 'income': [], 'n': None}
+
+
+@pytest.fixture(params=list(serializer.BACKENDS))
+def backend(request, monkeypatch):
+    loads, dumps = serializer.BACKENDS[request.param]
+    monkeypatch.setattr(serializer, '_loads', loads)
+    monkeypatch.setattr(serializer, '_dumps', dumps)
+
+
+def test_every_backend_writes_what_json_reads(backend):
+    for indent in (False, True):
+        data = serializer.dumps(DOCUMENT, indent)
+        assert isinstance(data, bytes)
+        assert json.loads(data) == DOCUMENT
+        assert serializer.loads(data) == serializer.loads(data.decode()) == DOCUMENT
+        # The data file is streamed a list at a time as well as read whole
+        assert list(iter_list(io.StringIO(data.decode()), 'expenses')) == DOCUMENT['expenses']
+    file = io.BytesIO()
+    serializer.dump(DOCUMENT, file)
+    file.seek(0)
+    assert serializer.load(file) == DOCUMENT
+
+
+def test_input_only_json_handles_falls_back_to_it(backend):
+    # NaN as the json module writes it, in files saved before a fast encoder was installed
+    assert math.isnan(serializer.loads(b'{"x": NaN}')['x'])
+    assert serializer.loads(serializer.dumps({'big': 2 ** 70}))['big'] == 2 ** 70
+    with pytest.raises(json.JSONDecodeError):
+        serializer.loads(b'{"expenses": [')
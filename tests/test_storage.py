@@ -0,0 +1,75 @@
+import os
+
+from CLI.core.storage import LIST_NAMES, open_storage
+
+from conftest import BACKENDS, FILE_NAMES, expense, income
+
+
+def by_id(records):
+    return sorted(records, key=lambda record: record['id'])
+
+
+# The same changes through any backend
+def scenario(storage):
+    storage.insert_many('expenses', [expense(1, 5.5, '2024-01-03'), expense(2, 12, '2024-02-10', 'fun'),
+                                     expense(3, 7.25, '', 'food', 'eur')])
+    storage.insert('income', income(1, 1000))
+    storage.update('expenses', expense(2, 15, '2024-03-01', 'fun'))
+    storage.delete('expenses', 1)
+    storage.apply([{'op': 'insert', 'list': 'expenses', 'record': expense(storage.next_id('expenses'), 3, '2024-01-20')},
+                   {'op': 'update', 'list': 'income', 'record': income(1, 1200)}])
+
+
+def test_fresh_backend_is_an_empty_document(storage):
+    data = storage.load()
+    for name in LIST_NAMES:
+        assert data[name] == []
+
+
+def test_changes_reach_the_disk(storage, reopen):
+    scenario(storage)
+    stored = reopen()
+    assert [(record['id'], record['price']) for record in by_id(stored.records('expenses'))] == [(2, 15), (3, 7.25), (4, 3)]
+    assert stored.get('expenses', 2)['date'] == '2024-03-01'
+    assert stored.get('expenses', 1) is None
+    assert stored.records('income')[0]['amount'] == 1200
+    assert stored.count('expenses') == 3
+
+
+def test_backends_agree(tmp_path):
+    results = {}
+    for kind in BACKENDS:
+        folder = tmp_path / kind
+        folder.mkdir()
+        storage = open_storage(str(folder / FILE_NAMES[kind]), kind)
+        scenario(storage)
+        results[kind] = {name: by_id(storage.records(name)) for name in ('expenses', 'income')}
+    assert all(result == results['json'] for result in results.values())
+
+
+def test_save_replaces_every_list(storage, reopen):
+    scenario(storage)
+    storage.save({'expenses': [expense(10, 1)], 'budget': [{'id': 1, 'category': 'food', 'amount': 100}]})
+    stored = reopen()
+    assert [record['id'] for record in stored.records('expenses')] == [10]
+    assert stored.records('income') == []
+    assert stored.records('budget')[0]['amount'] == 100
+
+
+def test_update_and_delete_of_missing_ids(storage):
+    storage.insert('expenses', expense(1, 5))
+    assert storage.update('expenses', expense(99, 5)) is False
+    assert storage.delete('expenses', 99) is False
+    assert storage.delete_many('expenses', [1, 99, 1]) == [1]
+
+
+def test_partitioned_backend_keeps_one_file_per_month(tmp_path):
+    storage = open_storage(str(tmp_path / 'data') + '/')
+    storage.insert_many('expenses', [expense(1, 1, '2024-01-03'), expense(2, 2, '2024-02-10'), expense(3, 3, 'someday')])
+    assert sorted(os.listdir(tmp_path / 'data' / 'expenses')) == ['2024-01.json', '2024-02.json', 'undated.json']
+    # Moving a record to another month moves it to that month's file
+    storage.update('expenses', expense(1, 1, '2024-02-20'))
+    february = [record['id'] for record in open_storage(str(tmp_path / 'data')).records('expenses') if record['date'].startswith('2024-02')]
+    assert sorted(february) == [1, 2]
+    assert open_storage(str(tmp_path / 'data')).count('expenses') == 3
+